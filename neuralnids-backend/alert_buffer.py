@@ -0,0 +1,116 @@
+import os
+import threading
+from collections import deque
+
+from eve_decode import event_type_of, loads
+
+BLOCK_SIZE = 64 * 1024
+# Give up after scanning this many bytes backwards, so a log with few alerts
+# does not turn one request into a scan of the whole file
+MAX_SCAN_BYTES = 64 * 1024 * 1024
+# Top-level EVE keys summarize_alert reads
+SUMMARY_FIELDS = ("timestamp", "src_ip", "dest_ip", "proto", "alert")
+
+
+def summarize_alert(data):
+    # Fields the dashboard shows for an alert
+    return {
+        "timestamp": data.get("timestamp"),
+        "src_ip": data.get("src_ip"),
+        "dest_ip": data.get("dest_ip"),
+        "protocol": data.get("proto"),
+        "signature": data.get("alert", {}).get("signature"),
+        "severity": data.get("alert", {}).get("severity")
+    }
+
+
+def iter_lines_reversed(path, block_size=BLOCK_SIZE, max_bytes=MAX_SCAN_BYTES):
+    """
+    Yield complete lines (bytes, newest first) by reading fixed-size blocks
+    backwards from the end of the file. A trailing line without a newline is
+    still being written by Suricata and is skipped.
+    """
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        end = position = f.tell()
+        buffer = b""
+        partial_dropped = False
+        while position > 0 and end - position < max_bytes:
+            read_size = min(block_size, position)
+            position -= read_size
+            f.seek(position)
+            buffer = f.read(read_size) + buffer
+            if not partial_dropped:
+                newline = buffer.rfind(b"\n")
+                if newline == -1:
+                    continue
+                buffer = buffer[:newline]
+                partial_dropped = True
+            lines = buffer.split(b"\n")
+            # lines[0] may be the tail of a line that starts in an earlier block
+            buffer = lines[0]
+            for line in reversed(lines[1:]):
+                if line:
+                    yield line
+        if position == 0 and partial_dropped and buffer:
+            yield buffer
+
+
+def read_recent_alerts(path, limit=200):
+    # Newest `limit` alerts, oldest first; only candidate alert lines are decoded
+    alerts = []
+    if not os.path.exists(path):
+        return alerts
+    for line in iter_lines_reversed(path):
+        # Skip non-alert lines on their raw event_type, without parsing them
+        event_type = event_type_of(line)
+        if event_type is not None and event_type != "alert":
+            continue
+        try:
+            data = loads(line)
+        except ValueError:
+            continue
+        if isinstance(data, dict) and data.get("event_type") == "alert":
+            alerts.append(summarize_alert(data))
+            if len(alerts) >= limit:
+                break
+    alerts.reverse()
+    return alerts
+
+
+class RecentAlertBuffer:
+    """
+    In-memory ring buffer of the newest alert summaries.
+
+    Seeded once from the tail of eve.json and then kept current by the
+    background watcher, so /api/alerts and /api/locations never touch the file.
+    """
+
+    def __init__(self, maxlen=1000):
+        self._alerts = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+        self.primed = False
+
+    def __len__(self):
+        return len(self._alerts)
+
+    def seed(self, path):
+        alerts = read_recent_alerts(path, self._alerts.maxlen)
+        with self._lock:
+            # Anything the watcher appended meanwhile is newer than the file tail
+            pending = list(self._alerts)
+            self._alerts.clear()
+            self._alerts.extend(alerts)
+            self._alerts.extend(pending)
+            self.primed = True
+
+    def add(self, event):
+        summary = summarize_alert(event)
+        with self._lock:
+            self._alerts.append(summary)
+
+    def snapshot(self, limit=200):
+        with self._lock:
+            if limit >= len(self._alerts):
+                return list(self._alerts)
+            return list(self._alerts)[-limit:]
@@ -2,19 +2,27 @@ import eventlet
 eventlet.monkey_patch()
 
 import logwatcher
+import live_push
 from joblib import load
 import numpy as np
-from utils import preprocess_data, engineer_features
-from flask import Flask, jsonify, request, send_from_directory
+from flask import Flask, Response, jsonify, request, send_from_directory
 from flask_cors import CORS
 from flask_mail import Mail, Message
 from dotenv import load_dotenv
-from ml_predictor import predict_event
+from ml_predictor import predict_batch
+from model_registry import get_registry
+from alert_buffer import SUMMARY_FIELDS, RecentAlertBuffer, read_recent_alerts
+from eve_tailer import EveTailer, consume
+from geoip_cache import GeoLocator
+from ml_alert_store import MLAlertStore, ML_ALERT_DB, clamp_limit, parse_time
+from eve_decode import loads
 from flask_socketio import SocketIO
+import metrics
 import json
+import logging
 import os
+import time
 from collections import defaultdict, Counter
-import geoip2.database
 import pandas as pd
 
 app = Flask(__name__, static_folder="static", static_url_path="/")
@@ -22,6 +30,7 @@ CORS(app, resources={r"/api/*": {"origins": "*"}})  # Allow all origins for /api
 load_dotenv()
 EVE_LOG = "/var/log/suricata/eve.json"
 GEO_DB = "/home/cgarriv/geoipdb/GeoLite2-City_20250325/GeoLite2-City.mmdb"
+geo_locator = GeoLocator(GEO_DB)
 
 app.config["MAIL_SERVER"] = "smtp.gmail.com"
 app.config["MAIL_PORT"] = 587
@@ -33,34 +42,33 @@ mail = Mail(app)
 socket = SocketIO(app, cors_allowed_origins="*")
 
 
-# This function loads alerts from the Suricata EVE JSON log file
-# and returns a list of dictionaries (JSON Objects) containing
-# relevant information about each alert.
+# Newest alert summaries, kept current by the background watcher so the
+# dashboard endpoints never read eve.json themselves
+ALERT_BUFFER_SIZE = 1000
+recent_alerts = RecentAlertBuffer(ALERT_BUFFER_SIZE)
+
+# Score alerts inside this process instead of running ml_alert_watcher.py separately
+ML_SCORER_IN_APP = os.getenv("ML_SCORER_IN_APP", "0") == "1"
+
+# ML verdicts written by the scorer (this process or ml_alert_watcher.py)
+ml_alert_store = MLAlertStore(ML_ALERT_DB)
+
+# /api/predict batches: most events accepted per request, and rows per model call
+PREDICT_MAX_BATCH = int(os.getenv("PREDICT_MAX_BATCH", "10000"))
+# Largest request body read at all; bigger ones get a 413 before any parsing
+app.config["MAX_CONTENT_LENGTH"] = int(os.getenv("PREDICT_MAX_BYTES", str(64 * 1024 * 1024)))
+PREDICT_CHUNK_SIZE = 4096
+NDJSON_MIMETYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+
+# This function returns the most recent alerts from the Suricata EVE JSON log
+# as a list of dictionaries (JSON Objects) containing relevant information
+# about each alert. Served from the in-memory buffer once it is seeded;
+# before that, only the tail of eve.json is read (newest blocks first).
 def load_alerts(limit=200):
-    alerts = []
-    if not os.path.exists(EVE_LOG):
-        return alerts
-    with open(EVE_LOG, "r") as f:
-        lines = f.readlines()[-limit:]
-        # read each entry in eve.json and parse it
-        for line in lines:
-            try:
-                # parse the JSON entry and "convert" it to a dictionary
-                data = json.loads(line)
-                # if entry is an alert, extract relevant fields
-                if data.get("event_type") == "alert":
-                    alerts.append({
-                        "timestamp": data.get("timestamp"),
-                        "src_ip": data.get("src_ip"),
-                        "dest_ip": data.get("dest_ip"),
-                        "protocol": data.get("proto"),
-                        "signature": data.get("alert", {}).get("signature"),
-                        "severity": data.get("alert", {}).get("severity")
-                    })
-            # skip entry if it could not be parsed as JSON
-            except json.JSONDecodeError:
-                continue
-    return alerts
+    if recent_alerts.primed:
+        return recent_alerts.snapshot(limit)
+    return read_recent_alerts(EVE_LOG, limit)
 
 
 # define /api/alerts endpoint to return alerts in JSON format
@@ -80,30 +88,15 @@ def all_alerts():
 
 # This function iterates through the alerts loaded from the Suricata EVE JSON log file
 # and maps each source IP address to its geographical location using the GeoLite2 database.
+# Lookups go through the shared GeoLocator, so repeat attackers are served from its cache.
 def get_locations():
-    alerts = load_alerts()
-    # count occurrences of each source IP address in the alerts
-    ip_counts = Counter(a["src_ip"] for a in alerts if a.get("src_ip"))
-    # list to hold IP location data dictionaries
-    geo_data = []
     try:
-        reader = geoip2.database.Reader(GEO_DB)
-        # for each IP, get its location and add to geo_data list
-        for ip, count in ip_counts.items():
-            try:
-                response = reader.city(ip)
-                # add IP location dictionary to geo_data list
-                geo_data.append({
-                    "ip": ip,
-                    "lat": response.location.latitude,
-                    "lng": response.location.longitude,
-                    "count": count
-                })
-            except:
-                continue
-        reader.close()
+        # counts per source IP over the recent alerts, located in one batched lookup
+        # (live_push.push_geo_counts pushes changes to the same numbers)
+        geo_data = live_push.location_counts(load_alerts(), geo_locator)
     except Exception as e:
         print("GeoIP error:", e)
+        geo_data = []
     # return the list of IP location data dictionaries as JSON object
     return jsonify(geo_data)
 
@@ -180,107 +173,129 @@ def index():
 # --------------------------- ML PREDICTION API START --------------------------- #
 
 
-def predict_event(input_data):
-    """
-    Predict the occurrence of an event based on input data using a pre-trained model.
-
-    This function utilizes a pre-trained ensemble stacking model to predict whether an
-    event is an "Attack" or "Normal" based on the given input data. It applies a series
-    of steps including feature engineering, data preprocessing, and prediction threshold
-    comparison to generate the result. The output includes the final prediction, its
-    confidence score, and the corresponding label.
-
-    Parameters:
-        input_data (dict): Dictionary containing the input data for prediction. Each
-        key within the dictionary represents a feature used during model training.
-
-    Returns:
-        dict: A dictionary containing the following keys:
-            - "Prediction" (int): The predicted class label, where 1 represents "Attack"
-              and 0 represents "Normal".
-            - "Confidence" (float): The confidence score of the prediction within the range
-              [0, 1], rounded to four decimal places.
-            - "Label" (str): The corresponding label for the prediction, either "Attack"
-              or "Normal".
-    """
-    # Load model and threshold
-    model = load("models/ensemble_stacking_model.joblib")
-    with open("logs/optimal_threshold_stacking.txt") as f:
-        threshold = float(f.read().strip())
-
-    # Convert input to DataFrame
-    df = pd.DataFrame([input_data])
-
-    # Engineer features
-    df = engineer_features(df)
-
-    # Preprocess using selected features
-    X, _, _ = preprocess_data(df, selected_features_file="models/top25_features.txt")
-
-    # Predict
-    proba = model.predict_proba(X)[:, 1][0]
-    prediction = int(proba >= threshold)
-
-    return {
-        "Prediction": prediction,
-        "Confidence": round(proba, 4),
-        "Label": "Attack" if prediction == 1 else "Normal"
+def _read_ndjson(stream, max_items):
+    # Parse an NDJSON body line by line; None once it holds more than max_items events
+    records = []
+    for line in stream:
+        if not line.strip():
+            continue
+        if len(records) >= max_items:
+            return None
+        records.append(loads(line))
+    return records
+
+
+def _stream_predictions(records, parse_seconds):
+    # Score in chunks and yield one NDJSON result per record, then a timing summary line
+    started = time.perf_counter()
+    score_seconds = 0.0
+    for i in range(0, len(records), PREDICT_CHUNK_SIZE):
+        chunk = records[i:i + PREDICT_CHUNK_SIZE]
+        chunk_start = time.perf_counter()
+        # predict_batch reports a failed chunk as one error result per event
+        results = predict_batch(pd.DataFrame(chunk))
+        score_seconds += time.perf_counter() - chunk_start
+        yield "".join(json.dumps(result) + "\n" for result in results)
+    timing = {
+        "count": len(records),
+        "parse_ms": round(parse_seconds * 1000, 3),
+        "score_ms": round(score_seconds * 1000, 3),
+        "total_ms": round((parse_seconds + time.perf_counter() - started) * 1000, 3),
     }
+    logging.getLogger("app").info("/api/predict scored %(count)d event(s) in %(total_ms).1f ms", timing)
+    yield json.dumps({"timing": timing}) + "\n"
+
 
 @app.route("/api/predict", methods=["GET", "POST"])
 def predict():
     """
-    Handles prediction requests via HTTP GET and POST methods. This endpoint can be
-    used to fetch information or to send a JSON object for prediction purposes.
+    Handles prediction requests via HTTP GET and POST methods.
 
-    Parameters:
-        None
+    POST accepts:
+        - a JSON object: one event, answered with one JSON result (as before);
+        - a JSON array of events, or an NDJSON body (Content-Type
+          application/x-ndjson, one event per line): scored as one batch with
+          the resident model and answered as an NDJSON stream with one result
+          per event, in order, followed by a {"timing": {...}} line giving the
+          count and the parse/score/total milliseconds for the request.
 
-    Returns:
-        dict: JSON response. For GET, returns informational message. For POST,
-        returns the prediction results or relevant error messages.
+    Batches larger than PREDICT_MAX_BATCH events, and bodies larger than
+    MAX_CONTENT_LENGTH bytes, are rejected with 413. A body that does not
+    parse is a 400 "Invalid JSON", and an empty one (no body, an empty
+    object or array, or NDJSON without events) is a 400 in either format.
 
-    Raises:
-        Exception: Raises an error with a status of 500 if there is an unhandled
-        exception during the prediction process.
+    Returns:
+        Response: For GET, an informational message. For POST, the prediction
+        result(s) or an error message (400 for bad input, 500 on failure).
     """
     if request.method == "GET":
-        return jsonify({"info": "Send a POST request with JSON data to get a prediction."})
+        return jsonify({"info": "POST a JSON event, a JSON array of events or NDJSON "
+                                "(application/x-ndjson) to get predictions.",
+                        "max_batch": PREDICT_MAX_BATCH})
+    parse_start = time.perf_counter()
+    # Only parsing errors are the client's fault; scoring failures are reported per event or as a 500
     try:
-        event = request.get_json()
-        if not event:
-            return jsonify({"Error": "No JSON data provided"}), 400
-
-        result = predict_event(event)
-        return jsonify(result), 200
-    except Exception as e:
-        print("Prediction error:", e)
-        return jsonify({"error": str(e)}), 500
+        if request.mimetype in NDJSON_MIMETYPES:
+            records = _read_ndjson(request.stream, PREDICT_MAX_BATCH)
+            if records is None:
+                return jsonify({"Error": f"Batch larger than {PREDICT_MAX_BATCH} events"}), 413
+        else:
+            body = request.get_data(cache=False)
+            records = loads(body) if body.strip() else None
+    except ValueError as e:
+        return jsonify({"Error": f"Invalid JSON: {e}"}), 400
+
+    if not records:
+        return jsonify({"Error": "No JSON data provided"}), 400
+    if request.mimetype not in NDJSON_MIMETYPES:
+        if isinstance(records, dict):
+            result = predict_batch(pd.DataFrame([records]))[0]
+            return jsonify(result), 500 if "Error" in result else 200
+        if not isinstance(records, list):
+            return jsonify({"Error": "Expected a JSON object or array"}), 400
+        if len(records) > PREDICT_MAX_BATCH:
+            return jsonify({"Error": f"Batch larger than {PREDICT_MAX_BATCH} events"}), 413
+    for index, record in enumerate(records):
+        if not isinstance(record, dict):
+            return jsonify({"Error": f"Event {index} is not a JSON object"}), 400
+    parse_seconds = time.perf_counter() - parse_start
+
+    return Response(_stream_predictions(records, parse_seconds), mimetype="application/x-ndjson")
+
+@app.errorhandler(413)
+def request_too_large(e):
+    return jsonify({"Error": f"Request body larger than {app.config['MAX_CONTENT_LENGTH']} bytes"}), 413
 
 @app.route("/api/ml_alerts")
 def get_ml_alerts():
     """
-    Handles the retrieval of machine learning alerts by reading
-    and processing a JSONL file containing recent alerts. The
-    function extracts the most recent 200 alerts and converts
-    their JSON representation into Python objects before
-    returning them as a JSON response.
+    Handles the retrieval of machine learning alerts from the ML alert
+    store. By default the most recent 200 alerts are returned; a time
+    range can be requested with the optional ``since`` / ``until`` query
+    parameters (epoch seconds or ``YYYY-MM-DDTHH:MM:SS``) and the row
+    count capped with ``limit`` (clamped to 1..MAX_QUERY_ROWS of the store).
 
     Raises
     ------
     Exception
-        If there is an error opening or reading the file containing ML alerts.
+        If there is an error querying the ML alert store.
 
     Returns
     -------
     flask.Response
-        A JSON response containing a list of the most recent ML alerts.
+        A JSON response containing a list of ML alerts, oldest first.
     """
     enriched_alerts = []
     try:
-        with open("logs/ml_alerts.jsonl", "r") as f:
-            for line in f.readlines()[-200:]:  # limit to recent alerts
-                enriched_alerts.append(json.loads(line))
+        limit = clamp_limit(request.args.get("limit", 200))
+        since = parse_time(request.args.get("since"))
+        until = parse_time(request.args.get("until"))
+        if since is not None or until is not None:
+            enriched_alerts = ml_alert_store.between(since, until, limit)
+        else:
+            enriched_alerts = ml_alert_store.latest(limit)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid query: {e}"}), 400
     except Exception as e:
         print("[!] Could not load ML alerts:", e)
     return jsonify(enriched_alerts)
@@ -288,10 +303,9 @@ def get_ml_alerts():
 @app.route("/api/live-alerts")
 def live_alerts():
     """
-    Fetches the last 5 live machine learning alert logs from a JSON Lines (JSONL) file and returns them as a JSON response.
+    Fetches the last 5 live machine learning alerts from the ML alert store and returns them as a JSON response.
 
-    This function reads data from a local JSONL file `logs/ml_alerts.jsonl` and extracts up to 5 most recent
-    alerts. If any error occurs during the file reading or processing, the function will log the error message
+    If any error occurs while querying the store, the function will log the error message
     and return an empty JSON array with a status code of 500.
 
     Returns:
@@ -299,13 +313,21 @@ def live_alerts():
         JSON array is returned along with a HTTP 500 status code.
     """
     try:
-        with open("logs/ml_alerts.jsonl", "r") as f:
-            lines = f.readlines()
-            alerts = [json.loads(line.strip()) for line in lines if line.strip()]
-        return jsonify(alerts[-5:])  # only return last 10
+        return jsonify(ml_alert_store.latest(5))
     except Exception as e:
         print(f"[X] Error loading ML alerts: {e}")
         return jsonify([]), 500
+
+
+@app.route("/metrics")
+def prometheus_metrics():
+    """
+    Prometheus text-format metrics: per-stage latency histograms, EVE read/skip/
+    parse-error counters, subscriber queue depths and drops, tail lag, model
+    load time and GeoIP cache hit ratio. Metrics exported by the standalone
+    ML watcher (see metrics.write_textfile) are merged in.
+    """
+    return Response(metrics.render(metrics.METRICS_DIR), content_type=metrics.CONTENT_TYPE)
     
 
 # --------------------------- ML PREDICTION API END --------------------------- #
@@ -333,6 +355,34 @@ def handle_connect():
 
 if __name__ == "__main__":
     #app.run(host="0.0.0.0", port=5000, debug=True)
-    socket.start_background_task(logwatcher.watcher, socket)
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper(), format="[%(levelname)s] %(message)s")
+    try:
+        get_registry().get()  # load the model up front instead of on the first request
+    except Exception as e:
+        print("[!] Model not loaded at startup:", e)
+    recent_alerts.seed(EVE_LOG)
+
+    # One tailer reads and decodes eve.json; each consumer gets its own bounded queue
+    tailer = EveTailer(EVE_LOG)
+    metrics.watch_tailer(tailer, "app")
+    metrics.watch_registry(get_registry())
+    metrics.watch_geoip(geo_locator)
+    socket.start_background_task(logwatcher.watcher, socket, tailer.subscribe("socketio", event_types=["alert"],
+                                                                             fields=logwatcher.WATCHER_FIELDS))
+    socket.start_background_task(consume, tailer.subscribe("alert_buffer", event_types=["alert"], fields=SUMMARY_FIELDS),
+                                 recent_alerts.add)
+    # Dashboards get ML verdicts and map count changes pushed instead of polling for them
+    socket.start_background_task(live_push.push_geo_counts, socket, load_alerts, geo_locator)
+    socket.start_background_task(live_push.push_ml_verdicts, socket, ml_alert_store)
+    if ML_SCORER_IN_APP:
+        import ml_alert_watcher
+        socket.start_background_task(
+            ml_alert_watcher.score_events,
+            tailer.subscribe("ml_scorer", maxsize=ml_alert_watcher.ML_QUEUE_SIZE,
+                            event_types=ml_alert_watcher.ML_EVENT_TYPES),
+            store=ml_alert_store,
+            workers=0  # worker processes do not mix with eventlet; use the standalone watcher for those
+        )
+    socket.start_background_task(tailer.run)
     socket.run(app, host="0.0.0.0", port=5000, debug=True)
     
@@ -0,0 +1,95 @@
+"""
+engineer_features on a large frame: the old row-wise implementation vs the
+column-wise one in utils, plus a check that both produce the same columns.
+
+Run from neuralnids-backend/:
+    python benchmarks/bench_engineer_features.py              # 1M rows
+    python benchmarks/bench_engineer_features.py --rows 100000
+"""
+import argparse
+import contextlib
+import io
+import os
+import socket
+import struct
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import engineer_features  # noqa: E402
+
+STATES = ['FIN', 'INT', 'CON', 'REQ', 'RST', 'ECO', 'CLO', 'ACC', 'PAR', 'URN']
+PROTOS = ['tcp', 'udp', 'icmp', 'arp', 'ospf']
+
+
+def legacy_engineer_features(df):
+    # utils.engineer_features before vectorization, kept verbatim for comparison
+    ip_cols = ['src_ip', 'dst_ip']
+    for col in ip_cols:
+        if col in df.columns:
+            df[col] = df[col].apply(lambda x: struct.unpack("!I", socket.inet_aton(x))[0] if isinstance(x, str) else 0)
+    if 'proto' in df.columns:
+        df['protocol_category'] = df['proto'].map({'tcp': 1, 'udp': 2, 'icmp': 3}).fillna(0)
+    if 'sbytes' in df.columns and 'dbytes' in df.columns:
+        df['byte_ratio'] = df.apply(lambda row: row['sbytes'] / (row['dbytes'] + 1e-5), axis=1)
+    if 'spkts' in df.columns and 'dpkts' in df.columns:
+        df['packet_ratio'] = df.apply(lambda row: row['spkts'] / (row['dpkts'] + 1e-5), axis=1)
+    if 'spkts' in df.columns and 'dpkts' in df.columns:
+        df['total_pkts'] = df['spkts'] + df['dpkts']
+    if 'state' in df.columns:
+        df['flags_combined'] = df['state'].astype(str).apply(lambda x: sum([ord(c) for c in x]))
+    return df
+
+
+def make_frame(rows, distinct_ips, rng):
+    ip_pool = np.array([
+        f"{rng.integers(1, 224)}.{rng.integers(0, 256)}.{rng.integers(0, 256)}.{rng.integers(1, 255)}"
+        for _ in range(distinct_ips)
+    ], dtype=object)
+    return pd.DataFrame({
+        'src_ip': ip_pool[rng.integers(0, distinct_ips, rows)],
+        'dst_ip': ip_pool[rng.integers(0, distinct_ips, rows)],
+        'proto': np.array(PROTOS, dtype=object)[rng.integers(0, len(PROTOS), rows)],
+        'state': np.array(STATES, dtype=object)[rng.integers(0, len(STATES), rows)],
+        'sbytes': rng.integers(0, 1_000_000, rows),
+        'dbytes': rng.integers(0, 1_000_000, rows),
+        'spkts': rng.integers(0, 5_000, rows),
+        'dpkts': rng.integers(0, 5_000, rows),
+    })
+
+
+def timed(fn, df):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        out = fn(df)
+    return out, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--distinct-ips", type=int, default=50_000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    df = make_frame(args.rows, args.distinct_ips, rng)
+    print(f"[+] Frame: {len(df):,} rows, {args.distinct_ips:,} distinct IPs")
+
+    new, new_s = timed(engineer_features, df.copy())
+    old, old_s = timed(legacy_engineer_features, df.copy())
+
+    for col in ['src_ip', 'dst_ip', 'protocol_category', 'byte_ratio', 'packet_ratio', 'total_pkts', 'flags_combined']:
+        if not np.allclose(old[col].to_numpy(dtype=np.float64), new[col].to_numpy(dtype=np.float64)):
+            print(f"[X] Mismatch in column {col}")
+
+    print(f"old (row-wise)    : {old_s:8.2f} s  ({args.rows / old_s:12,.0f} rows/s)")
+    print(f"new (column-wise) : {new_s:8.2f} s  ({args.rows / new_s:12,.0f} rows/s)")
+    print(f"[+] Speedup: {old_s / new_s:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+EVE line decoding: json.loads on every line (the old tailer) vs the raw
+event_type pre-filter plus the fastest installed JSON backend, for a
+consumer that wants some event types: alerts only (the dashboard
+subscribers) by default, or alerts and flows as the ML scorer subscribes
+(--event-types alert flow).
+
+When flows are wanted, their decode cost is also compared with pulling only
+the connection-window fields out of the raw line with a regex, the lighter
+path the scorer could take for flow records.
+
+Run from neuralnids-backend/:
+    python benchmarks/bench_eve_decode.py --lines 500000 --alert-ratio 0.02
+    python benchmarks/bench_eve_decode.py --event-types alert flow --flow-ratio 0.5
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from eve_decode import JSON_BACKEND, EveDecoder, loads  # noqa: E402
+from flow_window import connection_from_event  # noqa: E402
+
+# The fields connection_from_event reads, straight from the raw line
+_WINDOW_FIELD = re.compile(rb'"(src_ip|dest_ip|src_port|dest_port|app_proto)":("[^"]*"|\d+)')
+
+
+def make_lines(n, alert_ratio, rng, flow_ratio=None):
+    # flow_ratio: share of flow records; by default flows are one of the five
+    # other event types in turn
+    lines = []
+    other_types = ["flow", "dns", "tls", "http", "stats"]
+    for i in range(n):
+        draw = rng.random()
+        if draw < alert_ratio:
+            event_type = "alert"
+        elif flow_ratio is not None:
+            event_type = "flow" if draw < alert_ratio + flow_ratio else other_types[1 + i % 4]
+        else:
+            event_type = other_types[i % len(other_types)]
+        event = {
+            "timestamp": "2025-04-14T01:08:30.000000+0000",
+            "flow_id": int(rng.integers(1, 2**40)),
+            "event_type": event_type,
+            "src_ip": f"10.0.{i % 256}.{rng.integers(1, 255)}",
+            "src_port": int(rng.integers(1024, 65535)),
+            "dest_ip": "192.168.1.10",
+            "dest_port": 80,
+            "proto": "TCP",
+            "app_proto": "http",
+            "flow": {"pkts_toserver": 5, "pkts_toclient": 4, "bytes_toserver": 800, "bytes_toclient": 1200,
+                     "start": "2025-04-14T01:08:28.000000+0000", "end": "2025-04-14T01:08:30.000000+0000",
+                     "age": 2, "state": "closed", "reason": "timeout", "alerted": False},
+        }
+        if event_type == "flow":
+            event["tcp"] = {"tcp_flags": "1b", "tcp_flags_ts": "1b", "tcp_flags_tc": "1b", "syn": True,
+                            "fin": True, "psh": True, "ack": True, "state": "closed"}
+        if event["event_type"] == "alert":
+            event["alert"] = {"signature_id": 2100498, "signature": "GPL ATTACK_RESPONSE id check returned root",
+                              "severity": 2}
+        lines.append(json.dumps(event, separators=(",", ":")).encode())
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, default=500000)
+    parser.add_argument("--alert-ratio", type=float, default=0.02)
+    parser.add_argument("--flow-ratio", type=float, default=None, help="share of flow records (default 1/5 of the rest)")
+    parser.add_argument("--event-types", nargs="+", default=["alert"], help="event types the consumer wants")
+    args = parser.parse_args()
+
+    lines = make_lines(args.lines, args.alert_ratio, np.random.default_rng(42), args.flow_ratio)
+    wanted = set(args.event_types)
+
+    start = time.perf_counter()
+    old_kept = 0
+    for line in lines:
+        event = json.loads(line)
+        if event.get("event_type") in wanted:
+            old_kept += 1
+    old_s = time.perf_counter() - start
+
+    decoder = EveDecoder(event_types=args.event_types)
+    start = time.perf_counter()
+    new_kept = 0
+    for line in lines:
+        if decoder.decode(line) is not None:
+            new_kept += 1
+    new_s = time.perf_counter() - start
+
+    assert old_kept == new_kept, (old_kept, new_kept)
+    print(f"[+] {args.lines:,} lines, {new_kept:,} kept ({', '.join(args.event_types)}), backend={JSON_BACKEND}")
+    print(f"json.loads every line  : {old_s:8.3f} s  ({args.lines / old_s:12,.0f} lines/s)")
+    print(f"pre-filter + {JSON_BACKEND:<9} : {new_s:8.3f} s  ({args.lines / new_s:12,.0f} lines/s)  "
+          f"{old_s / new_s:6.1f}x")
+
+    if "flow" in wanted:
+        flows = [line for line in lines if b'"event_type":"flow"' in line]
+        start = time.perf_counter()
+        for line in flows:
+            connection_from_event(loads(line))
+        full_s = time.perf_counter() - start
+        start = time.perf_counter()
+        for line in flows:
+            dict(_WINDOW_FIELD.findall(line))
+        regex_s = time.perf_counter() - start
+        print(f"[+] {len(flows):,} flow records, per record:")
+        print(f"{JSON_BACKEND} decode + window key: {full_s / len(flows) * 1e6:8.2f} us  "
+              f"({full_s / new_s:.0%} of the subscriber's decode time)")
+        print(f"regex, window fields only: {regex_s / len(flows) * 1e6:8.2f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Suricata event -> feature row mapping: the old per-event build_feature_vector
+(re-reads the feature file, reverse-searches the mapping, one-row DataFrame)
+vs the CompiledFeatureMapper writing a whole batch into one matrix.
+
+Run from neuralnids-backend/:
+    python benchmarks/bench_feature_mapper.py --events 20000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from suricata_feature_adapter import (  # noqa: E402
+    SURICATA_TO_UNSW_MAPPING, CompiledFeatureMapper, flatten_suricata_alert, load_top_features
+)
+
+
+def legacy_build_feature_vector(suricata_event):
+    # suricata_feature_adapter.build_feature_vector before compilation, kept for comparison
+    flat_event = flatten_suricata_alert(suricata_event)
+    feature_row = {}
+    top_features = load_top_features()
+    for feature in top_features:
+        matched = None
+        for key, mapped_feature in SURICATA_TO_UNSW_MAPPING.items():
+            if mapped_feature == feature:
+                matched = key
+                break
+        if matched and matched in flat_event:
+            feature_row[feature] = flat_event[matched]
+        else:
+            feature_row[feature] = 0.0
+    return pd.DataFrame([feature_row])
+
+
+def make_events(n, rng):
+    events = []
+    for i in range(n):
+        events.append({
+            "timestamp": "2025-04-14T01:08:30.000000+0000",
+            "flow_id": int(rng.integers(1, 2**40)),
+            "event_type": "alert",
+            "src_ip": f"10.0.{i % 256}.{rng.integers(1, 255)}",
+            "src_port": int(rng.integers(1024, 65535)),
+            "dest_ip": "192.168.1.10",
+            "dest_port": 80,
+            "proto": "TCP",
+            "app_proto": "http",
+            "alert": {"signature_id": 2100498, "signature": "GPL ATTACK_RESPONSE id check returned root", "severity": 2},
+            "flow": {
+                "pkts_toserver": int(rng.integers(1, 100)),
+                "pkts_toclient": int(rng.integers(1, 100)),
+                "bytes_toserver": int(rng.integers(60, 100000)),
+                "bytes_toclient": int(rng.integers(60, 100000)),
+                "start": "2025-04-14T01:08:28.000000+0000",
+                "end": "2025-04-14T01:08:30.500000+0000",
+            },
+        })
+    return events
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=20000)
+    args = parser.parse_args()
+
+    events = make_events(args.events, np.random.default_rng(42))
+    features = load_top_features()
+
+    start = time.perf_counter()
+    for event in events:
+        legacy_build_feature_vector(event)
+    old_s = time.perf_counter() - start
+
+    mapper = CompiledFeatureMapper(features)
+    results = {}
+    for batch_size in (1, 64, 4096):
+        out = np.empty((batch_size, len(features)))
+        start = time.perf_counter()
+        for i in range(0, len(events), batch_size):
+            batch = events[i:i + batch_size]
+            mapper.transform(batch, out=out if len(batch) == batch_size else None)
+        results[batch_size] = time.perf_counter() - start
+
+    print(f"[+] {args.events:,} events, {len(features)} features")
+    print(f"old per-event          : {old_s:8.3f} s  ({args.events / old_s:12,.0f} events/s)")
+    for batch_size, seconds in results.items():
+        print(f"compiled batch={batch_size:<6}  : {seconds:8.3f} s  ({args.events / seconds:12,.0f} events/s)  "
+              f"{old_s / seconds:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
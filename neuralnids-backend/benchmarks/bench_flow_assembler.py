@@ -0,0 +1,109 @@
+"""
+Packet -> flow assembly: flow_assembler's sort-and-segment NumPy passes vs
+a per-packet dict of open flows, on synthetic TCP/UDP traffic (handshakes,
+replies, idle gaps that split flows). The two are checked to agree on the
+flow count and the per-flow packet/byte totals and duration.
+
+Run from neuralnids-backend/:
+    python benchmarks/bench_flow_assembler.py --packets 2000000 --flows 50000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flow_assembler import IDLE_TIMEOUT, assemble_flows  # noqa: E402
+
+
+def make_packets(n, flows, seed):
+    # Packets of `flows` client/server conversations spread over an hour
+    rng = np.random.default_rng(seed)
+    conv = rng.integers(0, flows, n)
+    client = (10 << 24) + rng.integers(1, 1 << 16, flows)
+    server = (192 << 24) + (168 << 16) + rng.integers(1, 1 << 8, flows)
+    cport = rng.integers(1024, 65535, flows)
+    sport = rng.choice([22, 53, 80, 443, 8080], flows)
+    proto = np.where(sport == 53, 17, 6)
+    ts = np.sort(rng.uniform(1700000000.0, 1700003600.0, n))
+    reply = rng.random(n) < 0.4
+    flags = np.where(proto[conv] == 6, np.where(reply, 0x18, 0x10), 0)
+    return pd.DataFrame({
+        "timestamp": ts,
+        "src_ip": np.where(reply, server[conv], client[conv]).astype(np.uint32),
+        "dst_ip": np.where(reply, client[conv], server[conv]).astype(np.uint32),
+        "protocol": proto[conv].astype(np.uint8),
+        "pkt_len": rng.integers(40, 1500, n).astype(np.uint16),
+        "sport": np.where(reply, sport[conv], cport[conv]).astype(np.uint16),
+        "dport": np.where(reply, cport[conv], sport[conv]).astype(np.uint16),
+        "tcp_flags": flags.astype(np.uint8),
+        "ttl": np.where(reply, 64, 128).astype(np.uint8),
+    })
+
+
+def dict_flows(packets, idle_timeout):
+    # Reference: walk the packets in time order, keeping a dict of open flows
+    open_flows = {}
+    done = []
+    rows = packets.sort_values("timestamp", kind="stable").itertuples(index=False)
+    for p in rows:
+        a, b = (p.src_ip, p.sport), (p.dst_ip, p.dport)
+        key = (min(a, b), max(a, b), p.protocol)
+        flow = open_flows.get(key)
+        if flow is not None and p.timestamp - flow["last"] > idle_timeout:
+            done.append(open_flows.pop(key))
+            flow = None
+        if flow is None:
+            flow = open_flows[key] = {"src": a, "first": p.timestamp, "last": p.timestamp,
+                                      "spkts": 0, "dpkts": 0, "sbytes": 0, "dbytes": 0}
+        flow["last"] = p.timestamp
+        if a == flow["src"]:
+            flow["spkts"] += 1
+            flow["sbytes"] += p.pkt_len
+        else:
+            flow["dpkts"] += 1
+            flow["dbytes"] += p.pkt_len
+    done.extend(open_flows.values())
+    return pd.DataFrame([{"dur": f["last"] - f["first"], "spkts": f["spkts"], "dpkts": f["dpkts"],
+                          "sbytes": f["sbytes"], "dbytes": f["dbytes"], "stime": f["first"]} for f in done])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--packets", type=int, default=1000000)
+    parser.add_argument("--flows", type=int, default=20000)
+    parser.add_argument("--idle-timeout", type=float, default=IDLE_TIMEOUT)
+    parser.add_argument("--reference-packets", type=int, default=300000,
+                        help="packets for the dict reference (it is slow)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    packets = make_packets(args.packets, args.flows, args.seed)
+    start = time.perf_counter()
+    flows = assemble_flows(packets, idle_timeout=args.idle_timeout, active_timeout=0, endpoints=True)
+    vec_s = time.perf_counter() - start
+    print(f"[+] {args.packets:,} packets -> {len(flows):,} flows")
+    print(f"sort-and-segment : {vec_s:8.3f} s  ({args.packets / vec_s:12,.0f} packets/s)")
+
+    sample = packets.iloc[:min(args.reference_packets, args.packets)]
+    start = time.perf_counter()
+    reference = dict_flows(sample, args.idle_timeout)
+    ref_s = time.perf_counter() - start
+    print(f"dict of flows    : {ref_s:8.3f} s  ({len(sample) / ref_s:12,.0f} packets/s)  "
+          f"on {len(sample):,} packets -> {(len(sample) / ref_s) and (args.packets / vec_s) / (len(sample) / ref_s):.1f}x")
+
+    check = assemble_flows(sample, idle_timeout=args.idle_timeout, active_timeout=0, endpoints=True)
+    columns = ["spkts", "dpkts", "sbytes", "dbytes"]
+    ours = check.sort_values(["stime"] + columns, kind="stable")[columns + ["dur"]].to_numpy(np.float64)
+    theirs = reference.sort_values(["stime"] + columns, kind="stable")[columns + ["dur"]].to_numpy(np.float64)
+    assert ours.shape == theirs.shape, (ours.shape, theirs.shape)
+    assert np.allclose(ours, theirs), "flow totals differ from the reference"
+    print(f"[+] Matches the reference on {len(check):,} flows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Model updates: continuing the deployed booster on new labeled samples
+(incremental_train.continue_training) vs a full retrain on all samples
+(incremental_train.full_retrain, and with --smote the old utils.train_model
+path), on synthetic data where the new samples move into an attack
+pattern the old ones rarely cover. The deployed model is trained through a
+frozen preprocessor fitted on the old samples, as updates require one.
+Reports wall-clock time and AUC on a holdout drawn from the new distribution.
+
+Run from neuralnids-backend/:
+    python benchmarks/bench_incremental_train.py --old-rows 1000000 --new-rows 50000
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from incremental_train import (continue_training, fit_preprocessor, full_retrain, holdout_auc,  # noqa: E402
+                               model_input, trees_of)
+
+
+def make_samples(rows, features, drift, seed):
+    # Two attack patterns; `drift` moves traffic into the second one, which the
+    # old samples rarely cover (a new campaign rather than relabeled traffic)
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(rows, features)).astype(np.float32)
+    X[:, 3] += drift
+    attack = (X[:, 0] + X[:, 1] * X[:, 2] + rng.normal(0, 0.3, rows) > 1.0) | ((X[:, 3] > 2.0) & (X[:, 4] > 0.5))
+    # Mapped rows, as labeled_frames returns them
+    return pd.DataFrame(X, columns=[f"f{i}" for i in range(features)]), attack.astype(np.int8)
+
+
+def timed(fn):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--old-rows", type=int, default=300000)
+    parser.add_argument("--new-rows", type=int, default=30000)
+    parser.add_argument("--holdout-rows", type=int, default=20000)
+    parser.add_argument("--features", type=int, default=24)
+    parser.add_argument("--drift", type=float, default=1.5)
+    parser.add_argument("--base-trees", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=100, help="most trees the update may add")
+    parser.add_argument("--smote", action="store_true", help="also time utils.train_model (SMOTE + fresh model)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    from xgboost import XGBClassifier
+
+    X_old, y_old = make_samples(args.old_rows, args.features, 0.0, args.seed)
+    X_new, y_new = make_samples(args.new_rows, args.features, args.drift, args.seed + 1)
+    X_val, y_val = make_samples(args.holdout_rows, args.features, args.drift, args.seed + 2)
+    print(f"[+] {args.old_rows:,} old + {args.new_rows:,} new samples, {args.features} features, "
+          f"holdout {args.holdout_rows:,}, {os.cpu_count()} cores")
+
+    pre, _ = timed(lambda: fit_preprocessor(X_old, list(X_old.columns)))
+    val = model_input(X_val, pre)
+    base, base_s = timed(lambda: XGBClassifier(n_estimators=args.base_trees, max_depth=8, learning_rate=0.05,
+                                               subsample=0.8, colsample_bytree=0.8, tree_method="hist",
+                                               n_jobs=os.cpu_count(), random_state=42).fit(model_input(X_old, pre),
+                                                                                           y_old))
+    print(f"deployed model     : AUC {holdout_auc(base, val, y_val):.4f}  ({base_s:6.1f} s to train)")
+
+    inc, inc_s = timed(lambda: continue_training(base, pre, X_new, y_new, X_val, y_val, args.rounds))
+    print(f"incremental        : AUC {holdout_auc(inc, val, y_val):.4f}  {inc_s:8.2f} s  "
+          f"(+{trees_of(inc) - args.base_trees} trees on {args.new_rows:,} samples)")
+
+    X_all, y_all = pd.concat([X_old, X_new], ignore_index=True), np.concatenate([y_old, y_new])
+    (full, full_pre), full_s = timed(lambda: full_retrain(base, pre, X_all, y_all, X_val, y_val))
+    print(f"full retrain (hist): AUC {holdout_auc(full, model_input(X_val, full_pre), y_val):.4f}  {full_s:8.2f} s  "
+          f"({trees_of(full)} trees on {len(y_all):,} samples)  -> incremental {full_s / inc_s:.1f}x faster")
+
+    if args.smote:
+        from utils import train_model
+        legacy, legacy_s = timed(lambda: train_model(model_input(X_all, pre), y_all, val, y_val))
+        print(f"train_model (SMOTE): AUC {holdout_auc(legacy, val, y_val):.4f}  {legacy_s:8.2f} s  "
+              f"-> incremental {legacy_s / inc_s:.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
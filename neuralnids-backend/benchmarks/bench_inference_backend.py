@@ -0,0 +1,73 @@
+"""
+Inference backends for the resident model: parity against the sklearn
+predict_proba reference and per-call latency at batch sizes 1, 64 and 4096.
+
+Run from neuralnids-backend/:
+    python benchmarks/bench_inference_backend.py
+    python benchmarks/bench_inference_backend.py --model models/ensemble_stacking_model.joblib --repeat 200
+"""
+import argparse
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+from joblib import load
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inference_backend import (  # noqa: E402
+    OnnxBackend, SklearnBackend, XGBoostBackend, is_xgboost_model, onnx_path_for, parity_check, parity_sample
+)
+
+BATCH_SIZES = (1, 64, 4096)
+
+
+def latency_ms(backend, X, repeat):
+    backend.predict_proba(X)  # warm-up
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        backend.predict_proba(X)
+        timings.append(time.perf_counter() - start)
+    return np.array(timings) * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="models/xgb_model_tuned.joblib")
+    parser.add_argument("--repeat", type=int, default=100)
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore")
+    model = load(args.model)
+    backends = [SklearnBackend(model)]
+    if is_xgboost_model(model):
+        backends.append(XGBoostBackend(model))
+    onnx_path = onnx_path_for(args.model)
+    if os.path.exists(onnx_path):
+        try:
+            backends.append(OnnxBackend(onnx_path))
+        except ImportError:
+            print("[!] onnxruntime is not installed, skipping the ONNX backend")
+
+    reference = backends[0]
+    X_parity = parity_sample(model, rows=4096)
+    print(f"[+] {args.model} ({type(model).__name__}, {X_parity.shape[1]} features)")
+    for backend in backends[1:]:
+        print(f"parity {backend.name:<8}: max |p - p_sklearn| = {parity_check(reference, backend, X_parity):.2e}")
+
+    rng = np.random.default_rng(0)
+    print(f"{'backend':<8} {'batch':>6} {'p50 ms':>10} {'p99 ms':>10} {'rows/s':>14}")
+    for batch_size in BATCH_SIZES:
+        X = rng.normal(size=(batch_size, X_parity.shape[1])).astype(np.float32)
+        for backend in backends:
+            ms = latency_ms(backend, X, args.repeat)
+            p50 = np.percentile(ms, 50)
+            print(f"{backend.name:<8} {batch_size:>6} {p50:10.3f} {np.percentile(ms, 99):10.3f} "
+                  f"{batch_size / (p50 / 1000.0):14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
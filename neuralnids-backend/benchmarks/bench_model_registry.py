@@ -0,0 +1,113 @@
+"""
+Per-event latency of predict_event before and after the resident model registry.
+
+"before" reproduces the old path: joblib.load + threshold file read on every event.
+"after" goes through ml_predictor.predict_event, which uses the shared registry.
+
+Without --model a synthetic XGBoost model over the feature list is trained
+into a temporary directory first (saved with its frozen preprocessor, as
+model_registry.save_model writes models), so the benchmark runs on a fresh
+checkout with no trained model.
+
+Run from neuralnids-backend/:
+    python benchmarks/bench_model_registry.py --events 200
+    python benchmarks/bench_model_registry.py --model models/xgb_model_tuned.joblib
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from joblib import load
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import model_registry  # noqa: E402
+from model_registry import ModelRegistry, read_features, read_threshold, save_model  # noqa: E402
+from utils import preprocess_data, engineer_features  # noqa: E402
+
+
+def sample_event(features, rng):
+    return {feat: float(rng.integers(0, 1000)) for feat in features}
+
+
+def synthetic_model(features, directory, rows=5000):
+    # An XGBoost model and its preprocessor trained on random events over `features`
+    from xgboost import XGBClassifier
+
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame([sample_event(features, rng) for _ in range(rows)])
+    y = (df[features[0]] + df[features[1]] > 1000).astype(int)
+    preprocessor_path = os.path.join(directory, "preprocessor.joblib")
+    X, _, _ = preprocess_data(engineer_features(df), for_training=False, selected_features=features,
+                              preprocessor_path=preprocessor_path)
+    model = XGBClassifier(n_estimators=100, max_depth=6, tree_method="hist").fit(X, y)
+    return save_model(model, os.path.join(directory, "model.joblib"), preprocessor_path)
+
+
+def legacy_predict(event, model_path, threshold_path, features_path):
+    # The pre-registry code path: everything is read from disk per event
+    model = load(model_path)
+    threshold = read_threshold(threshold_path)  # opens and reads the file, default if it is missing
+    df = engineer_features(pd.DataFrame([event]))
+    X, _, _ = preprocess_data(df, selected_features_file=features_path)
+    proba = model.predict_proba(X)[:, 1][0]
+    return int(proba >= threshold)
+
+
+def time_per_event(fn, events):
+    timings = []
+    for event in events:
+        start = time.perf_counter()
+        fn(event)
+        timings.append(time.perf_counter() - start)
+    return np.array(timings) * 1000.0
+
+
+def report(name, ms):
+    print(f"{name:<10} mean={ms.mean():8.3f} ms  p50={np.percentile(ms, 50):8.3f} ms  "
+          f"p99={np.percentile(ms, 99):8.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=100)
+    parser.add_argument("--model", default=None, help="trained model (default: train a synthetic one)")
+    parser.add_argument("--threshold", default=model_registry.THRESHOLD_PATH)
+    parser.add_argument("--features", default=model_registry.FEATURES_PATH)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    features = read_features(args.features)
+    events = [sample_event(features, rng) for _ in range(args.events)]
+    tmp = None
+    if args.model is None:
+        tmp = tempfile.TemporaryDirectory()
+        with contextlib.redirect_stdout(io.StringIO()):
+            args.model = synthetic_model(features, tmp.name)
+
+    # Point the shared registry at the requested files before predict_event uses it
+    model_registry._registry = ModelRegistry(args.model, args.threshold, args.features)
+    from ml_predictor import predict_event
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        legacy_predict(events[0], args.model, args.threshold, args.features)  # warm the page cache
+        before = time_per_event(lambda e: legacy_predict(e, args.model, args.threshold, args.features), events)
+        model_registry._registry.get()
+        after = time_per_event(predict_event, events)
+
+    print(f"[+] {args.events} events, model={args.model}")
+    report("before", before)
+    report("after", after)
+    print(f"[+] Speedup (mean): {before.mean() / after.mean():.1f}x")
+    if tmp is not None:
+        tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
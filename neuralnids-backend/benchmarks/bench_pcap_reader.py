@@ -0,0 +1,165 @@
+"""
+PCAP ingestion throughput: the old parse_pcap (dpkt objects and one dict per
+packet, then a DataFrame) vs pcap_reader's chunked columnar reader, on a
+synthetic capture with TCP, UDP, ICMP, IPv6, ARP and truncated frames.
+Reports packets/s, with --memory also the peak traced memory, and with
+--files the parallel directory reader over several copies of the capture.
+
+Run from neuralnids-backend/:
+    python benchmarks/bench_pcap_reader.py --packets 1000000
+    python benchmarks/bench_pcap_reader.py --pcapng --files 4 --workers 4
+"""
+import argparse
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import dpkt
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pcap_reader import PcapStats, iter_pcap, iter_pcaps, read_pcap  # noqa: E402
+
+
+def make_frames(rng, count=4096):
+    # A pool of distinct frames; the capture cycles through them
+    frames = []
+    for i in range(count):
+        kind = rng.random()
+        src = bytes([10, 0, i % 256, int(rng.integers(1, 255))])
+        dst = bytes([192, 168, 1, int(rng.integers(1, 255))])
+        if kind < 0.55:
+            l4 = dpkt.tcp.TCP(sport=int(rng.integers(1024, 65535)), dport=443, flags=dpkt.tcp.TH_ACK,
+                              data=b"x" * int(rng.integers(0, 1200)))
+            proto = dpkt.ip.IP_PROTO_TCP
+        elif kind < 0.85:
+            l4 = dpkt.udp.UDP(sport=int(rng.integers(1024, 65535)), dport=53, data=b"q" * 40)
+            proto = dpkt.ip.IP_PROTO_UDP
+        elif kind < 0.9:
+            l4 = dpkt.icmp.ICMP(type=8, data=dpkt.icmp.ICMP.Echo(id=1, seq=i))
+            proto = dpkt.ip.IP_PROTO_ICMP
+        else:
+            l4 = None
+        if l4 is not None:
+            ip = dpkt.ip.IP(src=src, dst=dst, p=proto, ttl=int(rng.integers(30, 255)), data=l4)
+            eth = dpkt.ethernet.Ethernet(src=b"\x00" * 6, dst=b"\x11" * 6, type=dpkt.ethernet.ETH_TYPE_IP, data=ip)
+            frame = bytes(eth)
+            if rng.random() < 0.01:
+                frame = frame[:20]  # truncated capture
+        elif kind < 0.95:
+            ip6 = dpkt.ip6.IP6(src=socket.inet_pton(socket.AF_INET6, "fe80::1"),
+                               dst=socket.inet_pton(socket.AF_INET6, "fe80::2"), nxt=17, hlim=64,
+                               data=dpkt.udp.UDP(sport=5353, dport=5353))
+            frame = bytes(dpkt.ethernet.Ethernet(type=dpkt.ethernet.ETH_TYPE_IP6, data=ip6))
+        else:
+            frame = bytes(dpkt.ethernet.Ethernet(type=dpkt.ethernet.ETH_TYPE_ARP, data=dpkt.arp.ARP()))
+        frames.append(frame)
+    return frames
+
+
+def write_capture(path, packets, pcapng, seed):
+    rng = np.random.default_rng(seed)
+    frames = make_frames(rng)
+    with open(path, "wb") as f:
+        writer = dpkt.pcapng.Writer(f) if pcapng else dpkt.pcap.Writer(f)
+        ts = 1700000000.0
+        for i in range(packets):
+            ts += 0.0001
+            writer.writepkt(frames[i % len(frames)], ts=ts)
+
+
+def legacy_parse(path, label):
+    # The previous utils.parse_pcap (pcap only)
+    records = []
+    with open(path, "rb") as f:
+        for ts, buf in dpkt.pcap.Reader(f):
+            try:
+                eth = dpkt.ethernet.Ethernet(buf)
+                if not isinstance(eth.data, dpkt.ip.IP):
+                    continue
+                ip = eth.data
+                records.append({
+                    "timestamp": ts,
+                    "src_ip": socket.inet_ntoa(ip.src),
+                    "dst_ip": socket.inet_ntoa(ip.dst),
+                    "protocol": ip.p,
+                    "pkt_len": ip.len,
+                    "label": label,
+                })
+            except Exception:
+                continue
+    return pd.DataFrame(records)
+
+
+def measure(fn, trace):
+    # Timed untraced; tracemalloc slows allocation-heavy code several times over,
+    # so the peak comes from a second, traced run
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    peak = 0
+    if trace:
+        tracemalloc.start()
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--packets", type=int, default=500000)
+    parser.add_argument("--pcapng", action="store_true", help="write the capture as pcapng")
+    parser.add_argument("--chunk-packets", type=int, default=65536)
+    parser.add_argument("--files", type=int, default=0, help="also read this many copies as a directory")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--memory", action="store_true", help="also measure peak traced memory")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, "bench.pcapng" if args.pcapng else "bench.pcap")
+        write_capture(path, args.packets, args.pcapng, args.seed)
+        size_mb = os.path.getsize(path) / 1e6
+        print(f"[+] {args.packets:,} packets, {size_mb:.1f} MB ({'pcapng' if args.pcapng else 'pcap'})")
+
+        def columnar():
+            stats = PcapStats()
+            return sum(len(chunk) for chunk in iter_pcap(path, args.chunk_packets, label=1, stats=stats)), stats
+
+        (rows, stats), new_s, new_peak = measure(columnar, args.memory)
+        print(f"chunked columnar   : {new_s:8.3f} s  ({args.packets / new_s:12,.0f} packets/s)  "
+              f"peak {new_peak / 1e6:8.1f} MB")
+        print(f"                     {stats}")
+
+        _, full_s, full_peak = measure(lambda: read_pcap(path, label=1), args.memory)
+        print(f"read_pcap (concat) : {full_s:8.3f} s  ({args.packets / full_s:12,.0f} packets/s)  "
+              f"peak {full_peak / 1e6:8.1f} MB")
+
+        if not args.pcapng:
+            old, old_s, old_peak = measure(lambda: legacy_parse(path, 1), args.memory)
+            assert len(old) == rows, (len(old), rows)
+            print(f"dict per packet    : {old_s:8.3f} s  ({args.packets / old_s:12,.0f} packets/s)  "
+                  f"peak {old_peak / 1e6:8.1f} MB  -> {old_s / new_s:.1f}x slower")
+
+        if args.files:
+            for i in range(1, args.files):
+                shutil.copy(path, os.path.join(directory, f"copy{i}{os.path.splitext(path)[1]}"))
+            start = time.perf_counter()
+            total = sum(stats.packets for _, _, stats in iter_pcaps([directory], args.workers))
+            elapsed = time.perf_counter() - start
+            print(f"directory x{args.files:<6} : {elapsed:8.3f} s  ({total / elapsed:12,.0f} packets/s)  "
+                  f"workers={args.workers or os.cpu_count()}")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
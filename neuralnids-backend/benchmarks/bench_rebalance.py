@@ -0,0 +1,129 @@
+"""
+Class rebalancing under a memory budget: full-matrix SMOTE (the old
+train_model step) vs rebalance.py's chunked_smote, undersample and weights
+modes, on a synthetic imbalanced training set.
+
+Each mode runs in a fresh process so its peak RSS is its own. Reported per
+mode: peak RSS growth while rebalancing (over the process with the data
+already loaded), peak RSS including training, rebalancing and training
+time, rows trained on, and recall / precision / AUC of the resulting
+XGBoost model on a holdout at the 0.5 threshold.
+
+Run from neuralnids-backend/:
+    python benchmarks/bench_rebalance.py --rows 2000000 --budget-mb 256
+"""
+import argparse
+import multiprocessing as mp
+import os
+import resource
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MODES = ["smote", "chunked_smote", "undersample", "weights"]
+
+
+def make_samples(rows, features, positive_rate, seed):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(rows, features)).astype(np.float32)
+    score = X[:, 0] + X[:, 1] * X[:, 2] + 0.5 * X[:, 3] + rng.normal(0, 0.5, rows)
+    return X, (score > np.quantile(score, 1 - positive_rate)).astype(np.int8)
+
+
+def peak_rss_mb():
+    # VmHWM (resettable, see reset_peak_rss); ru_maxrss where /proc is unavailable
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def reset_peak_rss():
+    # Linux: "5" resets the high-water mark to the current RSS, so data
+    # generation temporaries do not hide the rebalancing peak
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def run_mode(mode, args):
+    import contextlib
+    import io
+
+    # Imported up front so the one-off cost of loading imblearn/scipy is not counted as rebalancing memory
+    import imblearn.over_sampling  # noqa: F401
+    from sklearn.metrics import precision_score, recall_score, roc_auc_score
+    from xgboost import XGBClassifier
+
+    from rebalance import rebalance
+
+    X, y = make_samples(args.rows, args.features, args.positive_rate, args.seed)
+    X_val, y_val = make_samples(args.holdout_rows, args.features, args.positive_rate, args.seed + 1)
+    reset_peak_rss()
+    baseline = peak_rss_mb()
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        X_res, y_res, scale_pos_weight = rebalance(X, y, mode, args.budget_mb, seed=args.seed)
+    rebalance_s = time.perf_counter() - start
+    rebalance_peak = peak_rss_mb()
+
+    start = time.perf_counter()
+    model = XGBClassifier(n_estimators=args.trees, max_depth=8, learning_rate=0.1, tree_method="hist",
+                          n_jobs=os.cpu_count(), scale_pos_weight=scale_pos_weight, random_state=42)
+    model.fit(X_res, y_res)
+    train_s = time.perf_counter() - start
+
+    proba = model.predict_proba(X_val)[:, 1]
+    pred = (proba >= 0.5).astype(np.int8)
+    return {
+        "mode": mode,
+        "rows": len(y_res),
+        "rebalance_rss": rebalance_peak - baseline,
+        "peak_rss": peak_rss_mb(),
+        "rebalance_s": rebalance_s,
+        "train_s": train_s,
+        "recall": recall_score(y_val, pred),
+        "precision": precision_score(y_val, pred, zero_division=0),
+        "auc": roc_auc_score(y_val, proba),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--holdout-rows", type=int, default=100000)
+    parser.add_argument("--features", type=int, default=24)
+    parser.add_argument("--positive-rate", type=float, default=0.05)
+    parser.add_argument("--budget-mb", type=float, default=128, help="memory budget for the rebalancing modes")
+    parser.add_argument("--trees", type=int, default=100)
+    parser.add_argument("--modes", nargs="+", default=MODES)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    data_mb = args.rows * args.features * 4 / 2**20
+    print(f"[+] {args.rows:,} rows x {args.features} float32 ({data_mb:,.0f} MB), "
+          f"{args.positive_rate:.0%} attacks, budget {args.budget_mb:,.0f} MB, {os.cpu_count()} cores")
+    print(f"{'mode':<14}{'rows':>11}{'rebal RSS':>11}{'peak RSS':>10}{'rebal s':>9}{'train s':>9}"
+          f"{'recall':>8}{'precis.':>8}{'AUC':>8}")
+    ctx = mp.get_context("spawn")
+    for mode in args.modes:
+        # One process per mode, so no mode inherits another's heap or peak
+        with ctx.Pool(1) as pool:
+            r = pool.apply(run_mode, (mode, args))
+        print(f"{r['mode']:<14}{r['rows']:>11,}{r['rebalance_rss']:>9,.0f}MB{r['peak_rss']:>8,.0f}MB"
+              f"{r['rebalance_s']:>9.2f}{r['train_s']:>9.2f}{r['recall']:>8.3f}{r['precision']:>8.3f}"
+              f"{r['auc']:>8.4f}")
+
+
+if __name__ == "__main__":
+    main()
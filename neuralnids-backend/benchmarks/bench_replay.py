@@ -0,0 +1,292 @@
+"""
+End-to-end replay benchmark for the EVE -> ML verdict pipeline.
+
+A synthetic eve.json stream (see eve_generator.py) is appended to a temp
+file at the requested rate and burstiness while the real pipeline follows
+it: EveTailer (tail + parse), the ML scorer's de-duplication, connection
+window and micro-batching, fill_feature_matrix (feature), predict_batch
+(predict), MLAlertStore (persist) and a stand-in Socket.IO server that
+JSON-encodes the 'ml_verdicts' payload (emit).
+
+Everything runs offline: the model is a synthetic XGBoost classifier
+unless --model is given, and the store lives in the temp directory.
+Results are written as JSON; pass --compare to diff against an earlier run.
+
+Run from neuralnids-backend/:
+    python benchmarks/bench_replay.py --rate 5000 --duration 20 --alert-ratio 0.05
+    python benchmarks/bench_replay.py --burstiness 0.8 --compare benchmarks/results/replay-baseline.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import queue
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from joblib import dump
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from eve_generator import EveGenerator, schedule  # noqa: E402
+from eve_tailer import EveTailer  # noqa: E402
+from flow_dedup import FlowDeduper  # noqa: E402
+from flow_window import ConnectionWindow, event_window_counts  # noqa: E402
+from ml_alert_store import MLAlertStore  # noqa: E402
+from ml_alert_watcher import ML_EVENT_TYPES, MicroBatcher, fill_feature_matrix  # noqa: E402
+from model_registry import FEATURES_PATH, configure_registry, read_features  # noqa: E402
+
+STAGES = ["tail", "parse", "queue", "feature", "predict", "persist", "emit", "end_to_end"]
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+class TimedTailer(EveTailer):
+    # Stamps each published event with when its bytes were read and when it was decoded
+
+    def _read_lines(self):
+        lines = super()._read_lines()
+        self.read_at = time.perf_counter()
+        return lines
+
+    def publish(self, event):
+        event["_read_at"] = self.read_at
+        event["_parsed_at"] = time.perf_counter()
+        super().publish(event)
+
+
+class StandInSocket:
+    # Encodes payloads the way python-socketio does before handing them to the transport
+
+    def __init__(self):
+        self.emitted = 0
+        self.bytes = 0
+
+    def emit(self, name, payload):
+        self.bytes += len(json.dumps([name, payload]))
+        self.emitted += 1
+
+
+class StageTimes:
+    def __init__(self):
+        self.samples = {stage: [] for stage in STAGES}
+
+    def add(self, stage, seconds, count=1):
+        self.samples[stage].extend([seconds] * count)
+
+    def summary(self):
+        result = {}
+        for stage, values in self.samples.items():
+            if not values:
+                continue
+            ms = np.asarray(values) * 1000.0
+            result[stage] = {
+                "count": len(ms),
+                "mean_ms": round(float(ms.mean()), 4),
+                "p50_ms": round(float(np.percentile(ms, 50)), 4),
+                "p95_ms": round(float(np.percentile(ms, 95)), 4),
+                "p99_ms": round(float(np.percentile(ms, 99)), 4),
+            }
+        return result
+
+
+def synthetic_model(features, directory):
+    from xgboost import XGBClassifier
+
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(20000, len(features)))
+    y = (X[:, 0] + X[:, 1] * X[:, 2] > 0).astype(int)
+    model = XGBClassifier(n_estimators=200, max_depth=6, tree_method="hist").fit(X, y)
+    path = os.path.join(directory, "model.joblib")
+    dump(model, path)
+    return path
+
+
+def replay(path, lines, offsets, written_at):
+    # Append pre-encoded lines on schedule, in 5 ms ticks
+    start = time.perf_counter()
+    with open(path, "ab") as f:
+        i = 0
+        while i < len(lines):
+            now = time.perf_counter() - start
+            j = int(np.searchsorted(offsets, now, side="right"))
+            if j > i:
+                # Stamped before the write so the tailer can never see a line first
+                written_at[i:j] = time.perf_counter()
+                f.write(b"".join(lines[i:j]))
+                f.flush()
+                i = j
+            else:
+                time.sleep(min(0.005, max(0.0, offsets[i] - now)))
+    return time.perf_counter() - start
+
+
+def run(args):
+    features = read_features(args.features)
+    generator = EveGenerator(flows=args.flows, alert_ratio=args.alert_ratio, seed=args.seed)
+    n = int(args.rate * args.duration)
+    lines = list(generator.lines(n, step=1.0 / args.rate, extra=lambda i: {"bench_seq": i}))
+    offsets = schedule(n, args.rate, args.burstiness)
+    written_at = np.full(n, np.nan)
+
+    with tempfile.TemporaryDirectory() as directory:
+        eve_path = os.path.join(directory, "eve.json")
+        open(eve_path, "wb").close()
+        model_path = args.model or synthetic_model(features, directory)
+        configure_registry(model_path=model_path, features_path=args.features, preprocessor_path=None)
+        from ml_predictor import predict_batch
+        from model_registry import get_registry
+
+        store = MLAlertStore(os.path.join(directory, "ml_alerts.db"))
+        socket = StandInSocket()
+        times = StageTimes()
+        tailer = TimedTailer(eve_path, poll_interval=0.01, from_end=False)
+        subscription = tailer.subscribe("ml_scorer", maxsize=args.queue_size, event_types=ML_EVENT_TYPES)
+        quiet = contextlib.redirect_stdout(io.StringIO()) if not args.verbose else contextlib.nullcontext()
+
+        with quiet:
+            get_registry().get()
+            threading.Thread(target=tailer.run, daemon=True).start()
+            writer = {}
+            writer_thread = threading.Thread(
+                target=lambda: writer.update(seconds=replay(eve_path, lines, offsets, written_at)), daemon=True)
+            wall_start = time.perf_counter()
+            writer_thread.start()
+
+            seen_flows = FlowDeduper()
+            window = ConnectionWindow()
+            batcher = MicroBatcher(args.batch_size, args.max_wait)
+            last_id = 0
+            scored = 0
+            idle_since = None
+            last_done = wall_start
+
+            def flush(items):
+                nonlocal last_id, scored, last_done
+                events = [event for event, _ in items]
+                t0 = time.perf_counter()
+                matrix = fill_feature_matrix(events, features, [counts for _, counts in items])
+                df = pd.DataFrame(matrix, columns=features)
+                t1 = time.perf_counter()
+                results = predict_batch(df)
+                t2 = time.perf_counter()
+                store.append_many([{
+                    "timestamp": event["timestamp"], "label": result.get("Label"),
+                    "confidence": result.get("Probability"), "flow_id": event.get("flow_id"),
+                    "src_ip": event.get("src_ip"), "dest_ip": event.get("dest_ip"),
+                    "signature": event.get("alert", {}).get("signature"),
+                } for event, result in zip(events, results)])
+                t3 = time.perf_counter()
+                rows = store.since(last_id, len(events) + 1000)
+                if rows:
+                    last_id = rows[-1]["id"]
+                    socket.emit("ml_verdicts", rows)
+                t4 = time.perf_counter()
+                times.add("feature", t1 - t0)
+                times.add("predict", t2 - t1)
+                times.add("persist", t3 - t2)
+                times.add("emit", t4 - t3)
+                for event in events:
+                    times.add("end_to_end", t4 - written_at[event["bench_seq"]])
+                scored += len(events)
+                last_done = t4
+
+            while True:
+                if batcher.ready():
+                    flush(batcher.drain())
+                time_left = batcher.time_left()
+                try:
+                    event = subscription.get(timeout=0.05 if time_left is None else time_left)
+                except queue.Empty:
+                    if not writer_thread.is_alive() and not len(batcher):
+                        idle_since = idle_since or time.perf_counter()
+                        if time.perf_counter() - idle_since > 1.0:
+                            break
+                    continue
+                idle_since = None
+                dequeued = last_done = time.perf_counter()
+                seq = event["bench_seq"]
+                times.add("tail", event["_read_at"] - written_at[seq])
+                times.add("parse", event["_parsed_at"] - event["_read_at"])
+                times.add("queue", dequeued - event["_parsed_at"])
+                if event.get("event_type") == "flow":
+                    event_window_counts(window, event)
+                    continue
+                if seen_flows.seen(event.get("flow_id")):
+                    continue
+                counts = event_window_counts(window, event)
+                batcher.add((event, counts))
+            wall = last_done - wall_start
+            tailer.stop()
+        store.close()
+
+    alerts = sum(1 for line in lines if b'"event_type":"alert"' in line)
+    return {
+        "config": vars(args),
+        "host": {"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count()},
+        "events": n,
+        "alerts": alerts,
+        "scored": scored,
+        "write_seconds": round(writer.get("seconds", 0.0), 3),
+        "wall_seconds": round(wall, 3),
+        "events_per_second": round(tailer.lines_read / wall, 1),
+        "scored_per_second": round(scored / wall, 1),
+        "lines_skipped": tailer.lines_skipped,
+        "dropped": subscription.dropped,
+        "emitted_bytes": socket.bytes,
+        "stages": times.summary(),
+    }
+
+
+def print_report(result, baseline=None):
+    print(f"[+] {result['events']:,} events ({result['alerts']:,} alerts, {result['scored']:,} scored) "
+          f"in {result['wall_seconds']:.1f}s: {result['events_per_second']:,.0f} events/s, "
+          f"{result['scored_per_second']:,.0f} scored/s, {result['dropped']} dropped")
+    print(f"{'stage':<11} {'count':>8} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10}" + ("   p99 vs baseline" if baseline else ""))
+    for stage, s in result["stages"].items():
+        line = f"{stage:<11} {s['count']:>8} {s['p50_ms']:10.3f} {s['p95_ms']:10.3f} {s['p99_ms']:10.3f}"
+        old = (baseline or {}).get("stages", {}).get(stage)
+        if old and old["p99_ms"]:
+            line += f"   {(s['p99_ms'] / old['p99_ms'] - 1) * 100:+7.1f}%"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate", type=float, default=2000, help="average events per second")
+    parser.add_argument("--duration", type=float, default=10, help="seconds of traffic to replay")
+    parser.add_argument("--alert-ratio", type=float, default=0.05)
+    parser.add_argument("--flows", type=int, default=10000, help="distinct flows (cardinality)")
+    parser.add_argument("--burstiness", type=float, default=0.0, help="0 = steady, 0.9 = 10x bursts")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--max-wait", type=float, default=0.5)
+    parser.add_argument("--queue-size", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--model", default=None)
+    parser.add_argument("--features", default=FEATURES_PATH)
+    parser.add_argument("--output", default=None, help="results JSON (default benchmarks/results/replay-<time>.json)")
+    parser.add_argument("--compare", default=None, help="earlier results JSON to compare against")
+    parser.add_argument("--verbose", action="store_true", help="show the pipeline's own output")
+    args = parser.parse_args()
+
+    result = run(args)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+
+    output = args.output or os.path.join(RESULTS_DIR, time.strftime("replay-%Y%m%d-%H%M%S.json"))
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"[+] Results saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+ML scoring throughput: predict_batch in the watcher process vs a ScoringPool
+of N worker processes fed through shared-memory batch slots.
+
+Without --model a synthetic random forest is trained on random rows and
+saved to a temporary directory, so the benchmark runs anywhere; pass the
+deployed model for real numbers.
+
+Run from neuralnids-backend/:
+    python benchmarks/bench_scoring_pool.py --events 50000 --workers 1 2 4 8
+    python benchmarks/bench_scoring_pool.py --model models/ensemble_stacking_model.joblib
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+from joblib import dump
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import model_registry  # noqa: E402
+from model_registry import configure_registry, read_features  # noqa: E402
+from scoring_pool import ScoringPool, shard_of  # noqa: E402
+
+
+def make_events(n, rng):
+    return [{
+        "flow_id": int(rng.integers(1, 2**40)),
+        "event_type": "alert",
+        "src_ip": f"10.0.{i % 256}.{rng.integers(1, 255)}",
+        "dest_ip": "192.168.1.10",
+        "alert": {"signature": "GPL ATTACK_RESPONSE id check returned root"},
+    } for i in range(n)]
+
+
+def synthetic_model(features, directory, rng):
+    from sklearn.ensemble import RandomForestClassifier
+
+    X = rng.normal(size=(5000, len(features)))
+    y = (X[:, 0] + X[:, 1] > 0).astype(int)
+    model = RandomForestClassifier(n_estimators=200, max_depth=12, n_jobs=1, random_state=0).fit(X, y)
+    path = os.path.join(directory, "model.joblib")
+    dump(model, path)
+    return path
+
+
+def run_in_process(matrix, features, batch_size):
+    import pandas as pd
+    from ml_predictor import predict_batch
+
+    start = time.perf_counter()
+    for i in range(0, len(matrix), batch_size):
+        predict_batch(pd.DataFrame(matrix[i:i + batch_size], columns=features))
+    return time.perf_counter() - start
+
+
+def run_pool(events, matrix, features, batch_size, workers, registry_kwargs):
+    pool = ScoringPool(features, workers, batch_size, registry_kwargs=registry_kwargs).start()
+    scored = []
+
+    def on_result(items, results):
+        scored.append(len(results))
+
+    # Warm-up batch per worker so model loading is not timed
+    for worker in range(pool.workers):
+        slot, out = pool.acquire(worker, on_result)
+        out[:1] = matrix[:1]
+        pool.submit(worker, slot, [None])
+    while pool.pending():
+        pool.collect(on_result, timeout=1.0)
+    scored.clear()
+
+    shards = [[] for _ in range(pool.workers)]
+    for i, event in enumerate(events):
+        shards[shard_of(event, pool.workers)].append(i)
+
+    start = time.perf_counter()
+    for worker, rows in enumerate(shards):
+        for i in range(0, len(rows), batch_size):
+            batch = rows[i:i + batch_size]
+            slot, out = pool.acquire(worker, on_result)
+            out[:len(batch)] = matrix[batch]
+            pool.submit(worker, slot, batch)
+    while pool.pending():
+        pool.collect(on_result, timeout=1.0)
+    seconds = time.perf_counter() - start
+    pool.close()
+    assert sum(scored) == len(events), (sum(scored), len(events))
+    return seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=50000)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--model", default=None)
+    parser.add_argument("--features", default=model_registry.FEATURES_PATH)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    features = read_features(args.features)
+    events = make_events(args.events, rng)
+    matrix = rng.normal(size=(args.events, len(features)))
+
+    with tempfile.TemporaryDirectory() as directory:
+        model_path = args.model or synthetic_model(features, directory, rng)
+        registry_kwargs = {"model_path": model_path, "features_path": args.features,
+                           "preprocessor_path": None}
+        configure_registry(**registry_kwargs)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            model_registry.get_registry().get()
+            baseline = run_in_process(matrix, features, args.batch_size)
+        print(f"[+] {args.events:,} events, batch={args.batch_size}, model={args.model or 'synthetic forest'}, "
+              f"{os.cpu_count()} CPUs")
+        print(f"in-process         : {baseline:8.3f} s  ({args.events / baseline:10,.0f} events/s)")
+
+        for workers in args.workers:
+            with contextlib.redirect_stdout(io.StringIO()):
+                seconds = run_pool(events, matrix, features, args.batch_size, workers, registry_kwargs)
+            print(f"pool workers={workers:<5} : {seconds:8.3f} s  ({args.events / seconds:10,.0f} events/s)  "
+                  f"{baseline / seconds:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Training data loading: pd.read_csv with default dtypes + preprocess_data
+on every run vs training_data's typed chunked reader and the cached,
+memory-mapped feature matrix, on a synthetic UNSW-NB15 style CSV.
+Reports time and peak traced memory for each path.
+
+Run from neuralnids-backend/:
+    python benchmarks/bench_training_data.py --rows 1000000
+"""
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from training_data import load_training_matrix, read_csv_typed  # noqa: E402
+from utils import engineer_features, preprocess_data  # noqa: E402
+
+
+def write_csv(path, rows, seed):
+    rng = np.random.default_rng(seed)
+    spkts = rng.integers(1, 500, rows)
+    dpkts = rng.integers(0, 500, rows)
+    dur = rng.exponential(2.0, rows)
+    df = pd.DataFrame({
+        "id": np.arange(1, rows + 1),
+        "dur": dur,
+        "proto": rng.choice(["tcp", "udp", "icmp", "arp", "ospf"], rows, p=[0.6, 0.3, 0.05, 0.03, 0.02]),
+        "service": rng.choice(["-", "http", "dns", "ftp", "smtp", "ssh"], rows),
+        "state": rng.choice(["FIN", "INT", "CON", "REQ", "RST"], rows),
+        "spkts": spkts,
+        "dpkts": dpkts,
+        "sbytes": spkts * rng.integers(40, 1500, rows),
+        "dbytes": dpkts * rng.integers(40, 1500, rows),
+        "rate": (spkts + dpkts) / np.maximum(dur, 1e-6),
+        "sttl": rng.choice([31, 62, 254], rows),
+        "dttl": rng.choice([0, 29, 252], rows),
+        "sload": rng.exponential(1e6, rows),
+        "dload": rng.exponential(1e6, rows),
+        "sinpkt": rng.exponential(100.0, rows),
+        "tcprtt": rng.exponential(0.05, rows),
+        "synack": rng.exponential(0.03, rows),
+        "smean": rng.integers(40, 1500, rows),
+        "ct_srv_src": rng.integers(1, 60, rows),
+        "ct_dst_ltm": rng.integers(1, 60, rows),
+        "is_sm_ips_ports": (rng.random(rows) < 0.01).astype(int),
+        "attack_cat": rng.choice(["Normal", "Exploits", "Fuzzers", "DoS", "Generic"], rows),
+        "label": (rng.random(rows) < 0.45).astype(int),
+    })
+    df.to_csv(path, index=False)
+
+
+def measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = fn()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=500000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, "train.csv")
+        write_csv(path, args.rows, args.seed)
+        print(f"[+] {args.rows:,} rows, {os.path.getsize(path) / 1e6:,.1f} MB CSV")
+
+        plain, plain_s, plain_peak = measure(lambda: pd.read_csv(path))
+        typed, typed_s, typed_peak = measure(lambda: read_csv_typed(path))
+        print(f"read_csv (defaults)     : {plain_s:7.2f} s  peak {plain_peak / 1e6:8.1f} MB  "
+              f"frame {plain.memory_usage(deep=True).sum() / 1e6:8.1f} MB")
+        print(f"read_csv_typed (chunked): {typed_s:7.2f} s  peak {typed_peak / 1e6:8.1f} MB  "
+              f"frame {typed.memory_usage(deep=True).sum() / 1e6:8.1f} MB")
+        del plain, typed
+
+        _, every_s, every_peak = measure(lambda: preprocess_data(engineer_features(pd.read_csv(path))))
+        print(f"read + preprocess       : {every_s:7.2f} s  peak {every_peak / 1e6:8.1f} MB  (every run before)")
+
+        cache_dir = os.path.join(directory, "cache")
+        _, cold_s, cold_peak = measure(lambda: load_training_matrix([path], cache_dir=cache_dir))
+        print(f"cache build (cold)      : {cold_s:7.2f} s  peak {cold_peak / 1e6:8.1f} MB")
+        (X, y, _), warm_s, warm_peak = measure(lambda: load_training_matrix([path], cache_dir=cache_dir))
+        print(f"cache hit (memory-map)  : {warm_s:7.2f} s  peak {warm_peak / 1e6:8.1f} MB  "
+              f"matrix {X.shape[0]:,} x {X.shape[1]} {X.to_numpy().dtype}  -> {every_s / warm_s:,.0f}x")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
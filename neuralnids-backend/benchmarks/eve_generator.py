@@ -0,0 +1,151 @@
+"""
+Synthetic Suricata EVE stream generator.
+
+Produces eve.json lines (alerts, flow records and background dns/tls/http/
+stats events) over a fixed pool of flows whose popularity is skewed, so a
+few hosts account for most of the traffic as on a real sensor.
+
+Write a static file (e.g. for the bulk scorer or offline tests):
+    python benchmarks/eve_generator.py /tmp/eve.json --events 1000000 --alert-ratio 0.05
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+BACKGROUND_TYPES = ["dns", "tls", "http", "stats"]
+SIGNATURES = [
+    (2100498, "GPL ATTACK_RESPONSE id check returned root", 2),
+    (2013028, "ET POLICY curl User-Agent Outbound", 3),
+    (2001219, "ET SCAN Potential SSH Scan", 2),
+    (2019401, "ET SCAN Suspicious inbound to mySQL port 3306", 2),
+    (2024897, "ET USER_AGENTS Go HTTP Client User-Agent", 3),
+    (2009582, "ET SCAN NMAP -sS window 1024", 1),
+]
+SERVICES = [(80, "http", "TCP"), (443, "tls", "TCP"), (53, "dns", "UDP"), (22, "ssh", "TCP"),
+            (3306, "mysql", "TCP"), (25, "smtp", "TCP")]
+
+
+def _timestamp(when):
+    return when.strftime("%Y-%m-%dT%H:%M:%S.%f") + "+0000"
+
+
+class EveGenerator:
+    """
+    Builds EVE events over `flows` distinct flows.
+
+    alert_ratio is the share of alert events; of the rest, flow_ratio are
+    flow records (which feed the ct_* window) and the remainder background
+    event types the ML scorer does not subscribe to.
+    """
+
+    def __init__(self, flows=10000, alert_ratio=0.05, flow_ratio=0.5, seed=42):
+        self.rng = np.random.default_rng(seed)
+        self.alert_ratio = alert_ratio
+        self.flow_ratio = flow_ratio
+        rng = self.rng
+        self.flow_ids = rng.integers(1, 2**51, size=flows)
+        self.src_ips = [f"10.{a}.{b}.{c}" for a, b, c in rng.integers(0, 255, size=(flows, 3))]
+        self.dest_ips = [f"192.168.{a}.{b}" for a, b in rng.integers(0, 255, size=(flows, 2))]
+        self.src_ports = rng.integers(1024, 65535, size=flows)
+        self.services = rng.integers(0, len(SERVICES), size=flows)
+        self.signatures = rng.integers(0, len(SIGNATURES), size=flows)
+
+    def _pick_flows(self, n):
+        # Squared uniform: low indices (hot flows) come up far more often
+        return (self.rng.random(n) ** 2 * len(self.flow_ids)).astype(np.int64)
+
+    def events(self, n, start=None, step=0.0):
+        """n events as dicts; timestamps start at `start` and advance `step` seconds each."""
+        rng = self.rng
+        start = start or datetime.now(timezone.utc)
+        flows = self._pick_flows(n)
+        kinds = rng.random(n)
+        pkts = rng.integers(1, 200, size=(n, 2))
+        sizes = rng.integers(60, 1500, size=(n, 2))
+        ages = rng.exponential(2.0, size=n)
+        for i in range(n):
+            f = flows[i]
+            port, app_proto, proto = SERVICES[self.services[f]]
+            when = start + timedelta(seconds=i * step)
+            event = {
+                "timestamp": _timestamp(when),
+                "flow_id": int(self.flow_ids[f]),
+                "src_ip": self.src_ips[f],
+                "src_port": int(self.src_ports[f]),
+                "dest_ip": self.dest_ips[f],
+                "dest_port": port,
+                "proto": proto,
+                "app_proto": app_proto,
+            }
+            flow = {
+                "pkts_toserver": int(pkts[i, 0]),
+                "pkts_toclient": int(pkts[i, 1]),
+                "bytes_toserver": int(pkts[i, 0] * sizes[i, 0]),
+                "bytes_toclient": int(pkts[i, 1] * sizes[i, 1]),
+                "start": _timestamp(when - timedelta(seconds=float(ages[i]))),
+            }
+            if kinds[i] < self.alert_ratio:
+                signature_id, signature, severity = SIGNATURES[self.signatures[f]]
+                event["event_type"] = "alert"
+                event["alert"] = {"action": "allowed", "gid": 1, "signature_id": signature_id, "rev": 1,
+                                  "signature": signature, "category": "Misc activity", "severity": severity}
+                event["flow"] = flow
+            elif kinds[i] < self.alert_ratio + (1 - self.alert_ratio) * self.flow_ratio:
+                event["event_type"] = "flow"
+                flow["end"] = _timestamp(when)
+                flow["age"] = int(ages[i])
+                flow["state"] = "closed" if proto == "TCP" else "new"
+                flow["reason"] = "timeout"
+                event["flow"] = flow
+            else:
+                event["event_type"] = BACKGROUND_TYPES[i % len(BACKGROUND_TYPES)]
+            yield event
+
+    def lines(self, n, start=None, step=0.0, extra=None):
+        """n encoded EVE lines (bytes, newline-terminated); `extra(i)` adds fields to event i."""
+        for i, event in enumerate(self.events(n, start, step)):
+            if extra is not None:
+                event.update(extra(i))
+            yield json.dumps(event, separators=(",", ":")).encode() + b"\n"
+
+
+def schedule(n, rate, burstiness=0.0, period=1.0):
+    """
+    Send offsets (seconds from the start) for n events at an average `rate`
+    per second. With burstiness b in [0, 1), each `period` is split into an
+    on-phase of (1 - b) * period carrying all of that period's events and a
+    quiet remainder, so b=0 is a steady stream and b=0.9 sends 10x bursts.
+    """
+    per_period = rate * period
+    index = np.arange(n)
+    periods = index // per_period
+    within = (index % per_period) / per_period
+    return (periods + within * (1.0 - burstiness)) * period
+
+
+def write_file(path, n, flows, alert_ratio, seed, step=0.001):
+    generator = EveGenerator(flows=flows, alert_ratio=alert_ratio, seed=seed)
+    with open(path, "wb") as f:
+        for line in generator.lines(n, step=step):
+            f.write(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path")
+    parser.add_argument("--events", type=int, default=100000)
+    parser.add_argument("--flows", type=int, default=10000)
+    parser.add_argument("--alert-ratio", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    write_file(args.path, args.events, args.flows, args.alert_ratio, args.seed)
+    print(f"[+] Wrote {args.events:,} events to {args.path} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
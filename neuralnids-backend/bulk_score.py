@@ -0,0 +1,302 @@
+"""
+Offline bulk scoring of EVE archives (eve.json, eve.json.1, eve.json.2.gz, ...).
+
+The files are streamed in chunks of lines, oldest rotation first. The main
+process pre-filters each line on its raw event_type and keeps the ct_*
+connection window in stream order; worker processes decode, map and score
+the alerts of each chunk. Verdicts are written in input order to JSONL or
+Parquet, each with the source file and the byte offset of its line (in the
+decompressed stream for .gz files), so it can be traced back to the raw event.
+
+At most `workers * 2` chunks are in flight, so memory stays flat however big
+the input is. After every written chunk a checkpoint records how far the
+input was read, how much output was written and the connection window as it
+stood at that point; rerunning the same command resumes from there with the
+same ct_* counts an uninterrupted run would give.
+
+Run from neuralnids-backend/:
+    python bulk_score.py /var/log/suricata/eve.json* -o verdicts.jsonl --workers 8
+    python bulk_score.py archive/ -o verdicts.parquet --format parquet
+"""
+import argparse
+import glob
+import gzip
+import json
+import multiprocessing as mp
+import os
+import re
+import time
+from collections import deque
+
+from eve_decode import event_type_of, loads
+from flow_window import ConnectionWindow, event_window_counts
+from model_registry import FEATURES_PATH
+
+CHUNK_LINES = 100000
+CHECKPOINT_SUFFIX = ".checkpoint"
+VERDICT_FIELDS = ["source", "offset", "timestamp", "flow_id", "src_ip", "dest_ip", "signature", "label",
+                  "probability"]
+
+_ROTATION = re.compile(r"\.(\d+)(\.gz)?$")
+
+
+def rotation_index(path):
+    # eve.json -> 0, eve.json.1 -> 1, eve.json.2.gz -> 2
+    match = _ROTATION.search(path)
+    return int(match.group(1)) if match else 0
+
+
+def expand_inputs(inputs):
+    """Files to score, oldest rotation first (eve.json.3.gz ... eve.json.1, eve.json)."""
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            paths.extend(os.path.join(item, name) for name in os.listdir(item) if name.startswith("eve"))
+        else:
+            paths.extend(sorted(glob.glob(item)) or [item])
+    paths = [path for path in paths if not path.endswith(CHECKPOINT_SUFFIX)]
+    return sorted(dict.fromkeys(paths), key=lambda path: (-rotation_index(path), path))
+
+
+def open_eve(path):
+    return gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")
+
+
+def read_chunks(path, start_offset=0, chunk_lines=CHUNK_LINES):
+    """
+    Yield (lines, offsets, end_offset) for successive chunks of a file,
+    starting at byte `start_offset`. end_offset is where the next chunk begins.
+    """
+    with open_eve(path) as f:
+        if start_offset:
+            f.seek(start_offset)  # gzip seeks forward by decompressing
+        offset = start_offset
+        lines, offsets = [], []
+        for line in f:
+            lines.append(line)
+            offsets.append(offset)
+            offset += len(line)
+            if len(lines) >= chunk_lines:
+                yield lines, offsets, offset
+                lines, offsets = [], []
+        if lines:
+            yield lines, offsets, offset
+
+
+def select_alerts(lines, offsets, window):
+    # Alert lines of a chunk with their offsets and ct_* counts; flow records only go to the window
+    alerts, alert_offsets, counts = [], [], []
+    for line, offset in zip(lines, offsets):
+        event_type = event_type_of(line)
+        if event_type not in ("alert", "flow", None):
+            continue
+        try:
+            event = loads(line)
+        except ValueError:
+            continue
+        if not isinstance(event, dict):
+            continue
+        if event.get("event_type") == "flow":
+            event_window_counts(window, event)
+        elif event.get("event_type") == "alert":
+            alerts.append(line)
+            alert_offsets.append(offset)
+            counts.append(event_window_counts(window, event))
+    return alerts, alert_offsets, counts
+
+
+# --- worker side ---
+_top_features = None
+
+
+def _init_worker(registry_kwargs, features_path):
+    global _top_features
+    from ml_alert_watcher import load_top_features
+    from model_registry import configure_registry, get_registry
+    if registry_kwargs:
+        configure_registry(**registry_kwargs)
+    get_registry().get()
+    _top_features = load_top_features(features_path)
+
+
+def score_chunk(source, lines, offsets, counts):
+    """Decode, map and score one chunk's alert lines; one verdict dict per alert."""
+    import pandas as pd
+    from ml_alert_watcher import fill_feature_matrix
+    from ml_predictor import predict_batch
+
+    if not lines:
+        return []
+    events = [loads(line) for line in lines]
+    matrix = fill_feature_matrix(events, _top_features, counts)
+    results = predict_batch(pd.DataFrame(matrix, columns=_top_features))
+    verdicts = []
+    for event, offset, result in zip(events, offsets, results):
+        verdicts.append({
+            "source": source,
+            "offset": offset,
+            "timestamp": event.get("timestamp"),
+            "flow_id": event.get("flow_id"),
+            "src_ip": event.get("src_ip"),
+            "dest_ip": event.get("dest_ip"),
+            "signature": (event.get("alert") or {}).get("signature"),
+            "label": result.get("Label"),
+            "probability": result.get("Probability"),
+        })
+    return verdicts
+
+
+# --- output ---
+class JsonlSink:
+    def __init__(self, path, resume_bytes=None):
+        self.path = path
+        if resume_bytes is not None and os.path.exists(path):
+            # Drop anything written after the last checkpoint
+            with open(path, "r+b") as f:
+                f.truncate(resume_bytes)
+            self._file = open(path, "ab")
+        else:
+            self._file = open(path, "wb")
+
+    def write(self, verdicts):
+        if verdicts:
+            self._file.write(b"".join(json.dumps(v, separators=(",", ":")).encode() + b"\n" for v in verdicts))
+        self._file.flush()
+        return self._file.tell()
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetSink:
+    """
+    Parquet output as a directory of part files, one per written chunk with
+    verdicts, so a resumed run only ever adds parts. Needs pyarrow.
+    """
+
+    def __init__(self, path, resume_bytes=None):
+        import pyarrow  # noqa: F401  (fail early when it is missing)
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.parts = resume_bytes or 0
+        # Parts past the checkpoint belong to an interrupted chunk
+        for name in os.listdir(path):
+            if name.startswith("part-") and int(name[5:10]) >= self.parts:
+                os.remove(os.path.join(path, name))
+
+    def write(self, verdicts):
+        import pandas as pd
+        if verdicts:
+            frame = pd.DataFrame(verdicts, columns=VERDICT_FIELDS)
+            frame.to_parquet(os.path.join(self.path, f"part-{self.parts:05d}.parquet"), index=False)
+            self.parts += 1
+        return self.parts
+
+    def close(self):
+        pass
+
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_checkpoint(path, state):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+def bulk_score(inputs, output, fmt="jsonl", workers=None, chunk_lines=CHUNK_LINES, registry_kwargs=None,
+               features_path=FEATURES_PATH, resume=True):
+    paths = expand_inputs(inputs)
+    if not paths:
+        raise ValueError("No input files found")
+    checkpoint_path = output.rstrip("/") + CHECKPOINT_SUFFIX
+    state = load_checkpoint(checkpoint_path) if resume else None
+    if state and state.get("inputs") != paths:
+        print("[!] Checkpoint is for a different set of inputs, starting over")
+        state = None
+    if state is None:
+        state = {"inputs": paths, "file": 0, "offset": 0, "written": None, "lines": 0, "alerts": 0, "window": None}
+    else:
+        print(f"[+] Resuming at {paths[state['file']] if state['file'] < len(paths) else 'end'}, "
+              f"byte {state['offset']:,} ({state['alerts']:,} verdicts already written)")
+        if state.get("window") is None and state["lines"]:
+            print("[!] Checkpoint has no connection window; ct_* counts restart empty")
+
+    sink = (ParquetSink if fmt == "parquet" else JsonlSink)(output, state["written"])
+    workers = workers or os.cpu_count() or 1
+    window = ConnectionWindow.restore(state["window"]) if state.get("window") else ConnectionWindow()
+    pending = deque()
+    started = time.perf_counter()
+    lines_at_start = state["lines"]
+
+    def finish_oldest():
+        result, file_index, end_offset, n_lines, window_state = pending.popleft()
+        verdicts = result.get()
+        state["written"] = sink.write(verdicts)
+        state["file"], state["offset"] = file_index, end_offset
+        state["window"] = window_state
+        state["lines"] += n_lines
+        state["alerts"] += len(verdicts)
+        save_checkpoint(checkpoint_path, state)
+
+    with mp.Pool(workers, initializer=_init_worker, initargs=(registry_kwargs, features_path)) as pool:
+        for file_index in range(state["file"], len(paths)):
+            path = paths[file_index]
+            start_offset = state["offset"] if file_index == state["file"] else 0
+            print(f"[+] Scoring {path} from byte {start_offset:,}")
+            for lines, offsets, end_offset in read_chunks(path, start_offset, chunk_lines):
+                alerts, alert_offsets, counts = select_alerts(lines, offsets, window)
+                result = pool.apply_async(score_chunk, (path, alerts, alert_offsets, counts))
+                # The window as of end_offset, for the checkpoint written with this chunk
+                pending.append((result, file_index, end_offset, len(lines), window.state()))
+                while len(pending) >= workers * 2:
+                    finish_oldest()
+            # The next file starts at byte 0 once this one is fully written
+            pending.append((_Done([]), file_index + 1, 0, 0, window.state()))
+        while pending:
+            finish_oldest()
+    sink.close()
+
+    elapsed = time.perf_counter() - started
+    scanned = state["lines"] - lines_at_start
+    print(f"[+] Done: {state['lines']:,} lines, {state['alerts']:,} verdicts -> {output} "
+          f"({scanned / elapsed if elapsed else 0:,.0f} lines/s)")
+    return state
+
+
+class _Done:
+    # A result that is already available (marks the end of a file in the pending queue)
+
+    def __init__(self, value):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="+", help="EVE files, globs or directories (.gz supported)")
+    parser.add_argument("-o", "--output", required=True, help="JSONL file, or Parquet directory")
+    parser.add_argument("--format", choices=["jsonl", "parquet"], default=None,
+                        help="default: parquet if the output ends in .parquet, else jsonl")
+    parser.add_argument("--workers", type=int, default=None, help="scoring processes (default: all CPUs)")
+    parser.add_argument("--chunk-lines", type=int, default=CHUNK_LINES)
+    parser.add_argument("--model", default=None, help="model file (default: the registry's MODEL_PATH)")
+    parser.add_argument("--no-resume", action="store_true", help="ignore an existing checkpoint")
+    args = parser.parse_args()
+
+    fmt = args.format or ("parquet" if args.output.rstrip("/").endswith(".parquet") else "jsonl")
+    registry_kwargs = {"model_path": args.model} if args.model else None
+    bulk_score(args.inputs, args.output, fmt, args.workers, args.chunk_lines, registry_kwargs,
+               resume=not args.no_resume)
+
+
+if __name__ == "__main__":
+    main()
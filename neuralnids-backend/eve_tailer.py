@@ -0,0 +1,241 @@
+import os
+import queue
+import time
+
+from eve_decode import event_type_of, loads, project
+from metrics import STAGE_SECONDS
+
+EVE_LOG = "/var/log/suricata/eve.json"
+POLL_INTERVAL = 0.2
+READ_SIZE = 256 * 1024
+# Upper bound on bytes read per poll so one huge backlog cannot starve subscribers
+MAX_READ_PER_POLL = 8 * 1024 * 1024
+
+
+class Subscription:
+    """
+    One consumer's view of the EVE stream: a bounded queue of parsed events.
+
+    When the consumer falls behind and the queue is full, the oldest queued
+    event is dropped to make room (counted in `dropped`) so a slow consumer
+    never blocks the tailer or the other subscribers.
+
+    With `fields`, the subscriber receives a dict of just those top-level keys
+    instead of the shared event.
+    """
+
+    def __init__(self, name, maxsize=10000, event_types=None, fields=None):
+        self.name = name
+        self.event_types = set(event_types) if event_types else None
+        self.fields = list(fields) if fields else None
+        self.queue = queue.Queue(maxsize)
+        self.delivered = 0
+        self.dropped = 0
+
+    def wants(self, event_type):
+        return self.event_types is None or event_type in self.event_types
+
+    def offer(self, event):
+        if self.fields:
+            event = project(event, self.fields)
+        while True:
+            try:
+                self.queue.put_nowait(event)
+                self.delivered += 1
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout=None):
+        return self.queue.get(timeout=timeout)
+
+    def get_batch(self, max_items, timeout=None):
+        # Block for the first event (up to timeout), then take whatever else is queued
+        events = [self.queue.get(timeout=timeout)]
+        while len(events) < max_items:
+            try:
+                events.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return events
+
+    def depth(self):
+        return self.queue.qsize()
+
+
+class EveTailer:
+    """
+    Follows eve.json once for every consumer in the process.
+
+    Each complete line is read once. Its event_type is picked out of the raw
+    bytes first, and lines no subscription wants (typically the bulk of flow,
+    dns, tls and stats records) are skipped without being decoded. The rest
+    are JSON-decoded once, with orjson when installed, and the parsed dict is
+    handed to every subscription that wants it (consumers must treat it as
+    read-only). Handles:
+      - partially written lines: bytes after the last newline wait for the rest
+      - logrotate (inode change): the old file is drained, then the new one
+        is followed from its start
+      - copytruncate (file shrinks below our offset): reading restarts at 0
+      - the log not existing yet: opening is retried every poll
+    """
+
+    def __init__(self, path=EVE_LOG, poll_interval=POLL_INTERVAL, from_end=True):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.from_end = from_end
+        self.subscriptions = []
+
+        self._file = None
+        self._inode = None
+        self._offset = 0
+        self._partial = b""
+        self._running = False
+
+        self.lines_read = 0
+        self.lines_skipped = 0
+        self.parse_errors = 0
+        self.rotations = 0
+        self.truncations = 0
+
+    def subscribe(self, name, maxsize=10000, event_types=None, fields=None):
+        subscription = Subscription(name, maxsize, event_types, fields)
+        self.subscriptions.append(subscription)
+        return subscription
+
+    def wanted_event_types(self):
+        # Union over subscriptions; None if any of them takes every event type
+        wanted = set()
+        for subscription in self.subscriptions:
+            if subscription.event_types is None:
+                return None
+            wanted |= subscription.event_types
+        return wanted
+
+    def _open(self, seek_end):
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            return False
+        st = os.fstat(f.fileno())
+        if seek_end:
+            f.seek(0, os.SEEK_END)
+        if self._file is not None:
+            self._file.close()
+        self._file = f
+        self._inode = (st.st_dev, st.st_ino)
+        self._offset = f.tell()
+        self._partial = b""
+        return True
+
+    def _check_rotation(self):
+        # Called only once the current handle is at EOF, so a rotated-away
+        # file has already been drained before we switch to the new one
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        if (st.st_dev, st.st_ino) != self._inode:
+            print(f"[+] {self.path} was rotated, following the new file")
+            self.rotations += 1
+            self._open(seek_end=False)
+        elif st.st_size < self._offset:
+            print(f"[+] {self.path} was truncated, reading from the start")
+            self.truncations += 1
+            self._file.seek(0)
+            self._offset = 0
+            self._partial = b""
+
+    def _read_lines(self):
+        chunks = []
+        read = 0
+        while read < MAX_READ_PER_POLL:
+            chunk = self._file.read(READ_SIZE)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            read += len(chunk)
+        if not chunks:
+            return []
+        self._offset += read
+        data = self._partial + b"".join(chunks)
+        lines = data.split(b"\n")
+        self._partial = lines.pop()
+        return lines
+
+    def publish(self, event):
+        event_type = event.get("event_type")
+        for subscription in self.subscriptions:
+            if subscription.wants(event_type):
+                subscription.offer(event)
+
+    def poll_once(self):
+        """Read whatever is new, publish it, and return how many lines were read."""
+        if self._file is None:
+            if not self._open(seek_end=self.from_end):
+                # Created later means everything in it is new: read it from the start
+                self.from_end = False
+                return 0
+
+        start = time.perf_counter()
+        lines = self._read_lines()
+        if not lines:
+            self._check_rotation()
+            return 0
+        parse_start = time.perf_counter()
+        STAGE_SECONDS.observe(parse_start - start, stage="tail")
+
+        wanted = self.wanted_event_types()
+        for line in lines:
+            if not line.strip():
+                continue
+            self.lines_read += 1
+            if wanted is not None:
+                event_type = event_type_of(line)
+                # Unknown means the marker was not found; decode to be sure
+                if event_type is not None and event_type not in wanted:
+                    self.lines_skipped += 1
+                    continue
+            try:
+                event = loads(line)
+            except ValueError:
+                self.parse_errors += 1
+                continue
+            if isinstance(event, dict):
+                self.publish(event)
+        STAGE_SECONDS.observe(time.perf_counter() - parse_start, stage="parse")
+        return len(lines)
+
+    def lag_bytes(self):
+        # How far behind the end of the file we are (0 before the file exists)
+        try:
+            return max(0, os.path.getsize(self.path) - self._offset)
+        except OSError:
+            return 0
+
+    def run(self):
+        self._running = True
+        print(f"[+] Tailing {self.path} for {len(self.subscriptions)} subscriber(s)...")
+        while self._running:
+            if not self.poll_once():
+                time.sleep(self.poll_interval)
+
+    def stop(self):
+        self._running = False
+
+
+def consume(subscription, handler, timeout=1.0):
+    # Run `handler(event)` for each event on a subscription, forever
+    while True:
+        try:
+            event = subscription.get(timeout=timeout)
+        except queue.Empty:
+            continue
+        try:
+            handler(event)
+        except Exception as e:
+            print(f"[X] {subscription.name} subscriber error: {e}")
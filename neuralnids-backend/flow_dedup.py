@@ -0,0 +1,75 @@
+import os
+import time
+from collections import OrderedDict
+
+# A flow that has not alerted for this long may be scored again
+DEDUP_TTL = float(os.getenv("ML_DEDUP_TTL", "3600"))
+# Hard cap on remembered flows. Each entry costs roughly 150 bytes
+# (OrderedDict node + int key + float), so 1M flows is about 150 MB.
+DEDUP_MAX_FLOWS = int(os.getenv("ML_DEDUP_MAX_FLOWS", "500000"))
+
+
+class FlowDeduper:
+    """
+    Bounded "have we already scored this flow?" set.
+
+    Entries are kept in last-seen order in an OrderedDict. Each check expires
+    entries at the old end whose TTL has passed. When the set is full, the
+    least recently seen flow is evicted. Memory therefore stays flat no
+    matter how many flows pass through. An evicted flow that alerts again is
+    scored once more; that is the only cost of the cap.
+    """
+
+    def __init__(self, max_flows=DEDUP_MAX_FLOWS, ttl=DEDUP_TTL, clock=time.monotonic):
+        self.max_flows = max(1, max_flows)
+        self.ttl = ttl
+        self._clock = clock
+        self._flows = OrderedDict()
+        self.duplicates = 0
+        self.inserts = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._flows)
+
+    def _expire(self, now):
+        flows = self._flows
+        while flows:
+            flow_id, expires = next(iter(flows.items()))
+            if expires > now:
+                break
+            flows.popitem(last=False)
+            self.expired += 1
+
+    def seen(self, flow_id):
+        """True if flow_id was seen within the TTL; otherwise remember it and return False."""
+        now = self._clock()
+        self._expire(now)
+        flows = self._flows
+        if flow_id in flows:
+            # Refresh: an active flow stays de-duplicated for as long as it keeps alerting
+            flows.move_to_end(flow_id)
+            flows[flow_id] = now + self.ttl
+            self.duplicates += 1
+            return True
+        flows[flow_id] = now + self.ttl
+        self.inserts += 1
+        if len(flows) > self.max_flows:
+            flows.popitem(last=False)
+            self.evictions += 1
+        return False
+
+    def occupancy(self):
+        return len(self._flows) / self.max_flows
+
+    def stats(self):
+        return {
+            "flows": len(self._flows),
+            "max_flows": self.max_flows,
+            "occupancy": round(self.occupancy(), 4),
+            "inserts": self.inserts,
+            "duplicates": self.duplicates,
+            "expired": self.expired,
+            "evictions": self.evictions,
+        }
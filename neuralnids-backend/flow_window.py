@@ -0,0 +1,154 @@
+import os
+
+import numpy as np
+
+# UNSW-NB15 counts its ct_* features over the last 100 connections
+WINDOW_SIZE = 100
+# Which events are the window's connections. Suricata logs a flow record for
+# every connection and alerts only for some of them, so with flow output on
+# (the eve.json default) flow records feed the window and alerts only look
+# up their counts; feeding both would count an alerted connection twice.
+# Set ML_WINDOW_FROM_FLOWS=0 when flow output is disabled: alerts are then
+# the only connections seen and feed the window themselves.
+WINDOW_FROM_FLOWS = os.getenv("ML_WINDOW_FROM_FLOWS", "1") == "1"
+
+# Connection tuple positions (see connection_from_event)
+SRC, DST, SPORT, DPORT, SERVICE = range(5)
+
+# Feature -> the connection fields a previous connection must share to be counted
+WINDOW_FEATURES = {
+    "ct_srv_src": (SERVICE, SRC),
+    "ct_srv_dst": (SERVICE, DST),
+    "ct_dst_ltm": (DST,),
+    "ct_src_ltm": (SRC,),
+    "ct_src_dport_ltm": (SRC, DPORT),
+    "ct_dst_sport_ltm": (DST, SPORT),
+    "ct_dst_src_ltm": (SRC, DST),
+}
+# UNSW's ct_state_ttl is a category of the connection state and TTL ranges.
+# Suricata events carry no TTLs and name their states differently, so it is
+# not computed: the feature adapter leaves it 0 and flow_assembler does too.
+FEATURE_NAMES = list(WINDOW_FEATURES)
+
+
+def connection_from_event(event):
+    # The fields of a Suricata flow/alert event the window features are keyed on
+    return (
+        event.get("src_ip"),
+        event.get("dest_ip"),
+        event.get("src_port"),
+        event.get("dest_port"),
+        event.get("app_proto") or "-",
+    )
+
+
+class ConnectionWindow:
+    """
+    Incremental ct_* counts over the last `size` connections.
+
+    A ring buffer holds the per-feature keys of the connections in the
+    window and one dict of counts per feature tracks how many of them share
+    each key. Adding a connection decrements the counts for the one that
+    falls out of the ring and increments its own, so every update is O(1)
+    per feature. Memory is bounded by the window size however many distinct
+    hosts pass through, since keys whose count drops to zero are deleted.
+    """
+
+    def __init__(self, size=WINDOW_SIZE):
+        self.size = size
+        self._fields = list(WINDOW_FEATURES.values())
+        self._ring = [None] * size
+        self._pos = 0
+        self._counts = [{} for _ in self._fields]
+        self.updates = 0
+
+    def __len__(self):
+        return min(self.updates, self.size)
+
+    def _keys(self, conn):
+        return tuple(tuple(conn[i] for i in fields) for fields in self._fields)
+
+    def update(self, conn):
+        """Add a connection tuple and return its counts (including itself), in FEATURE_NAMES order."""
+        return self._add_keys(self._keys(conn))
+
+    def _add_keys(self, keys):
+        old = self._ring[self._pos]
+        if old is not None:
+            for counts, key in zip(self._counts, old):
+                remaining = counts[key] - 1
+                if remaining:
+                    counts[key] = remaining
+                else:
+                    del counts[key]
+        self._ring[self._pos] = keys
+        self._pos = (self._pos + 1) % self.size
+        self.updates += 1
+
+        result = []
+        for counts, key in zip(self._counts, keys):
+            n = counts.get(key, 0) + 1
+            counts[key] = n
+            result.append(n)
+        return result
+
+    def state(self):
+        """
+        The connections in the window, oldest first, as JSON-serializable
+        per-feature keys (bulk_score stores this in its checkpoint).
+        """
+        ring = self._ring[self._pos:] + self._ring[:self._pos]
+        return {"size": self.size, "updates": self.updates,
+                "keys": [[list(key) for key in keys] for keys in ring if keys is not None]}
+
+    @classmethod
+    def restore(cls, state):
+        """A window holding the same connections as the one state() was taken from."""
+        window = cls(state["size"])
+        for keys in state["keys"]:
+            # Older checkpoints also carry a trailing ct_state_ttl key
+            window._add_keys(tuple(tuple(key) for key in keys[:len(WINDOW_FEATURES)]))
+        window.updates = state["updates"]
+        return window
+
+    def lookup(self, conn):
+        """Counts the connection would get if added now, without adding it."""
+        keys = self._keys(conn)
+        old = self._ring[self._pos]  # would fall out of the window on update
+        result = []
+        for i, (counts, key) in enumerate(zip(self._counts, keys)):
+            n = counts.get(key, 0) + 1
+            if old is not None and old[i] == key:
+                n -= 1
+            result.append(n)
+        return result
+
+    def update_event(self, event):
+        return self.update(connection_from_event(event))
+
+    def lookup_event(self, event):
+        return self.lookup(connection_from_event(event))
+
+
+def event_window_counts(window, event, from_flows=WINDOW_FROM_FLOWS):
+    """
+    ct_* counts for an alert or flow event, adding it to the window only if
+    it is one of the window's connections (see WINDOW_FROM_FLOWS). Live
+    scoring, bulk_score and incremental_train all go through this, so the
+    same events give the same counts everywhere.
+    """
+    if (event.get("event_type") == "flow") == from_flows:
+        return window.update_event(event)
+    return window.lookup_event(event)
+
+
+def replay_window_features(events, size=WINDOW_SIZE):
+    """
+    Offline replay: ct_* counts for a sequence of connection events, in order.
+    Returns an (n_events, len(FEATURE_NAMES)) int matrix.
+    """
+    window = ConnectionWindow(size)
+    out = np.zeros((len(events), len(FEATURE_NAMES)), dtype=np.int64)
+    for i, event in enumerate(events):
+        out[i] = window.update_event(event)
+    return out
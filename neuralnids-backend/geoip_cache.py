@@ -0,0 +1,95 @@
+import threading
+import time
+from collections import OrderedDict
+
+import geoip2.database
+import geoip2.errors
+from maxminddb import MODE_MMAP
+
+CACHE_SIZE = 50000
+CACHE_TTL = 6 * 3600  # GeoLite2 is refreshed weekly; hours-old answers are fine
+
+
+class GeoLocator:
+    """
+    Long-lived GeoLite2 reader with a bounded LRU/TTL cache of
+    ip -> (lat, lng, city).
+
+    The database is opened once, memory-mapped, and shared by all requests.
+    Addresses the database does not know (private ranges, bogons) are cached
+    as None so they are not looked up again either.
+    """
+
+    def __init__(self, db_path, maxsize=CACHE_SIZE, ttl=CACHE_TTL):
+        self.db_path = db_path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._reader = None
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _get_reader(self):
+        if self._reader is None:
+            self._reader = geoip2.database.Reader(self.db_path, mode=MODE_MMAP)
+        return self._reader
+
+    def _resolve(self, reader, ip):
+        try:
+            response = reader.city(ip)
+        except (geoip2.errors.AddressNotFoundError, ValueError):
+            return None
+        return (response.location.latitude, response.location.longitude, response.city.name)
+
+    def lookup_many(self, ips):
+        """Return {ip: (lat, lng, city) or None} for the distinct addresses in `ips`."""
+        now = time.monotonic()
+        found = {}
+        missing = []
+        with self._lock:
+            for ip in set(ips):
+                entry = self._cache.get(ip)
+                if entry is not None and entry[0] > now:
+                    self._cache.move_to_end(ip)
+                    found[ip] = entry[1]
+                    self.hits += 1
+                else:
+                    missing.append(ip)
+                    self.misses += 1
+
+        if missing:
+            reader = self._get_reader()
+            resolved = {ip: self._resolve(reader, ip) for ip in missing}
+            expires = now + self.ttl
+            with self._lock:
+                for ip, location in resolved.items():
+                    self._cache[ip] = (expires, location)
+                    self._cache.move_to_end(ip)
+                while len(self._cache) > self.maxsize:
+                    self._cache.popitem(last=False)
+                    self.evictions += 1
+            found.update(resolved)
+        return found
+
+    def lookup(self, ip):
+        return self.lookup_many([ip]).get(ip)
+
+    def hit_ratio(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        return {
+            "size": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hit_ratio(), 4),
+        }
+
+    def close(self):
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
@@ -0,0 +1,322 @@
+"""
+Incremental model updates: continue boosting the deployed XGBoost model on
+newly labeled samples instead of retraining from scratch.
+
+Labeled inputs are EVE files whose events carry a label field (0/1, true/
+false or attack/normal, set during triage) or CSV/Parquet feature tables
+with a label column. EVE events go through the same mapping, connection
+window and preprocessing as live scoring (fill_feature_matrix, then
+engineer_features and the model's frozen preprocessor), so the new trees see
+exactly what the model sees in production. A base model without a saved
+preprocessor is refused.
+
+The deployed booster is loaded through ModelRegistry and up to --rounds
+trees are added with the hist tree method on all cores, stopping early when
+AUC on the held-out set (--holdout files, or a stratified --holdout-fraction
+of the new samples) stops improving. The result is written as the next
+numbered version under models/versions/ with its AUCs and timings in the
+manifest, and published over the model path unless its holdout AUC is worse
+than the deployed model's or cannot be computed (a holdout with a single
+class); running registries reload it on their own.
+
+With --history the same data plus the older samples is also used for a full
+retrain with a freshly fitted preprocessor (saved as an unpublished "full"
+version), and the wall-clock time and AUC of both are reported side by side.
+
+Run from neuralnids-backend/:
+    python incremental_train.py labeled/eve-week42.json --holdout labeled/holdout.json
+    python incremental_train.py labeled/new.csv --history labeled/2025.csv --no-publish
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from bulk_score import open_eve
+from eve_decode import loads
+from flow_window import ConnectionWindow, event_window_counts
+from model_registry import (FEATURES_PATH, MODEL_PATH, MODEL_VERSIONS_DIR, PREPROCESSOR_PATH, ModelRegistry,
+                            archive_deployed_model, publish_model_version, read_features, save_model_version)
+
+LABEL_FIELD = "label"
+ROUNDS = 200
+EARLY_STOPPING_ROUNDS = 20
+HOLDOUT_FRACTION = 0.2
+# Holdout AUC the update may lose against the deployed model and still be published
+AUC_TOLERANCE = 0.002
+ATTACK_LABELS = {"1", "true", "attack", "malicious", "yes"}
+NORMAL_LABELS = {"0", "false", "normal", "benign", "no"}
+TABLE_EXTENSIONS = (".csv", ".parquet")
+
+
+def parse_label(value):
+    # 1 / 0 for the label spellings analysts use, None for anything else
+    if isinstance(value, (bool, int, float)) and not isinstance(value, str):
+        return int(bool(value)) if value in (0, 1) else None
+    text = str(value).strip().lower()
+    if text in ATTACK_LABELS:
+        return 1
+    if text in NORMAL_LABELS:
+        return 0
+    return None
+
+
+def read_labeled_events(path, label_field=LABEL_FIELD):
+    """
+    (events, labels, window counts) for the labeled events of an EVE file.
+    Alert and flow records go through the connection window in file order
+    by the same rule as live scoring (flow_window.event_window_counts); only
+    events with a recognizable label are kept.
+    """
+    window = ConnectionWindow()
+    events, labels, counts = [], [], []
+    with open_eve(path) as f:
+        for line in f:
+            try:
+                event = loads(line)
+            except ValueError:
+                continue
+            if not isinstance(event, dict) or event.get("event_type") not in ("alert", "flow"):
+                continue
+            row_counts = event_window_counts(window, event)
+            label = parse_label(event.get(label_field))
+            if label is None:
+                continue
+            events.append(event)
+            labels.append(label)
+            counts.append(row_counts)
+    return events, labels, counts
+
+
+def read_labeled_table(path, label_field=LABEL_FIELD):
+    from training_data import read_csv_typed
+
+    df = pd.read_parquet(path) if path.endswith(".parquet") else read_csv_typed(path)
+    if label_field not in df.columns:
+        raise ValueError(f"{path} has no '{label_field}' column")
+    labels = df[label_field].map(parse_label)
+    df = df[labels.notna()].drop(columns=[label_field]).reset_index(drop=True)
+    return df, labels.dropna().astype(int).tolist()
+
+
+def labeled_frames(paths, top_features, label_field=LABEL_FIELD):
+    """
+    Mapped feature rows (before engineering and scaling) and labels for
+    labeled EVE files and feature tables.
+    """
+    from ml_alert_watcher import fill_feature_matrix
+
+    parts, labels = [], []
+    for path in paths:
+        if path.endswith(TABLE_EXTENSIONS):
+            df, y = read_labeled_table(path, label_field)
+        else:
+            events, y, counts = read_labeled_events(path, label_field)
+            if not events:
+                print(f"[!] No labeled events in {path}")
+                continue
+            df = pd.DataFrame(fill_feature_matrix(events, top_features, counts), columns=top_features)
+        parts.append(df)
+        labels.extend(y)
+        print(f"[+] {path}: {len(y):,} labeled samples ({sum(y):,} attacks)")
+    if not parts:
+        raise ValueError("No labeled samples found")
+    return pd.concat(parts, ignore_index=True), np.asarray(labels, dtype=np.int8)
+
+
+def require_preprocessor(preprocessor, model_path=None):
+    # Without the training-time scaler the new trees would be fit on per-batch
+    # scaling that no other sample ever sees
+    if preprocessor is None:
+        where = f" for {model_path}" if model_path else ""
+        raise ValueError(f"No frozen preprocessor{where}; model updates need the one the model was trained "
+                         f"with (see model_registry.save_model / preprocessor.py)")
+    return preprocessor
+
+
+def model_input(df, preprocessor):
+    """
+    Model input for mapped rows through a frozen preprocessor, as a float32
+    DataFrame (column names kept, the booster checks them). The same steps
+    as ml_predictor.features_for_model, minus its no-preprocessor fallback.
+    """
+    from utils import engineer_features
+
+    require_preprocessor(preprocessor)
+    X = preprocessor.transform(engineer_features(df.copy()))
+    return pd.DataFrame(X.astype(np.float32), columns=preprocessor.features)
+
+
+def fit_preprocessor(df, features):
+    """Fit a new FrozenPreprocessor on mapped rows, selecting `features`."""
+    import tempfile
+    from preprocessor import load_preprocessor
+    from utils import engineer_features, preprocess_data
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "preprocessor.joblib")
+        preprocess_data(engineer_features(df.copy()), for_training=False, selected_features=features,
+                        preprocessor_path=path)
+        return load_preprocessor(path)
+
+
+def holdout_auc(model, X, y):
+    from sklearn.metrics import roc_auc_score
+
+    if len(np.unique(y)) < 2:
+        return float("nan")
+    return float(roc_auc_score(y, model.predict_proba(X)[:, 1]))
+
+
+def publish_blocker(base_auc, new_auc):
+    # Why an update should not replace the deployed model, or None
+    if np.isnan(base_auc) or np.isnan(new_auc):
+        return "holdout AUC is undefined (the holdout needs both classes)"
+    if new_auc + AUC_TOLERANCE < base_auc:
+        return f"holdout AUC dropped ({base_auc:.4f} -> {new_auc:.4f})"
+    return None
+
+
+def _training_params(base_model, rounds, early_stopping_rounds):
+    # The deployed model's hyperparameters, with histogram trees on every core
+    params = base_model.get_params()
+    params.update(n_estimators=rounds, tree_method="hist", n_jobs=os.cpu_count(), eval_metric="auc",
+                  early_stopping_rounds=early_stopping_rounds)
+    return params
+
+
+def continue_training(base_model, preprocessor, X, y, X_val, y_val, rounds=ROUNDS,
+                      early_stopping_rounds=EARLY_STOPPING_ROUNDS):
+    """
+    Add up to `rounds` trees to base_model's booster, early-stopped on
+    (X_val, y_val). X and X_val are mapped rows; they go through the
+    preprocessor base_model was trained with, which is required.
+    """
+    from xgboost import XGBClassifier
+
+    require_preprocessor(preprocessor)
+    model = XGBClassifier(**_training_params(base_model, rounds, early_stopping_rounds))
+    model.fit(model_input(X, preprocessor), y, eval_set=[(model_input(X_val, preprocessor), y_val)],
+              xgb_model=base_model.get_booster(), verbose=False)
+    return model
+
+
+def full_retrain(base_model, preprocessor, X, y, X_val, y_val, rounds=None,
+                 early_stopping_rounds=EARLY_STOPPING_ROUNDS):
+    """
+    A fresh model with base_model's hyperparameters, as the weekly retrain
+    would build it: a new preprocessor is fitted on the mapped rows X (same
+    feature selection as the deployed `preprocessor`, which is required).
+    Returns (model, its preprocessor).
+    """
+    from xgboost import XGBClassifier
+
+    new_preprocessor = fit_preprocessor(X, require_preprocessor(preprocessor).features)
+    rounds = rounds or base_model.get_params().get("n_estimators") or ROUNDS
+    model = XGBClassifier(**_training_params(base_model, rounds, early_stopping_rounds))
+    model.fit(model_input(X, new_preprocessor), y, eval_set=[(model_input(X_val, new_preprocessor), y_val)],
+              verbose=False)
+    return model, new_preprocessor
+
+
+def split_holdout(X, y, fraction=HOLDOUT_FRACTION, seed=42):
+    from sklearn.model_selection import train_test_split
+
+    stratify = y if np.bincount(y).min() >= 2 else None
+    return train_test_split(X, y, test_size=fraction, random_state=seed, stratify=stratify)
+
+
+def trees_of(model):
+    # Trees actually used for prediction (up to the best iteration after early stopping)
+    best = getattr(model, "best_iteration", None)
+    return best + 1 if best is not None else model.get_booster().num_boosted_rounds()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="+", help="labeled EVE files or CSV/Parquet feature tables")
+    parser.add_argument("--base", default=MODEL_PATH, help="deployed model to continue from")
+    parser.add_argument("--features", default=FEATURES_PATH)
+    parser.add_argument("--preprocessor", default=PREPROCESSOR_PATH,
+                        help="used when the base model has no preprocessor saved next to it")
+    parser.add_argument("--label-field", default=LABEL_FIELD)
+    parser.add_argument("--holdout", nargs="+", default=None, help="labeled files to validate on")
+    parser.add_argument("--holdout-fraction", type=float, default=HOLDOUT_FRACTION)
+    parser.add_argument("--rounds", type=int, default=ROUNDS, help="most trees to add")
+    parser.add_argument("--early-stopping", type=int, default=EARLY_STOPPING_ROUNDS)
+    parser.add_argument("--history", nargs="+", default=None,
+                        help="older labeled samples; also time a full retrain on them plus the inputs")
+    parser.add_argument("--versions-dir", default=MODEL_VERSIONS_DIR)
+    parser.add_argument("--no-publish", action="store_true", help="only write the versioned artifact")
+    parser.add_argument("--force", action="store_true",
+                        help="publish even if the holdout AUC dropped or could not be computed")
+    args = parser.parse_args()
+
+    from inference_backend import is_xgboost_model
+
+    bundle = ModelRegistry(model_path=args.base, features_path=args.features,
+                           preprocessor_path=args.preprocessor, backend="sklearn").get()
+    if not is_xgboost_model(bundle.model):
+        raise SystemExit(f"[X] {args.base} is not an XGBoost model; incremental updates need a booster")
+    try:
+        require_preprocessor(bundle.preprocessor, args.base)
+    except ValueError as e:
+        raise SystemExit(f"[X] {e}")
+    top_features = read_features(args.features)
+
+    X, y = labeled_frames(args.inputs, top_features, args.label_field)
+    if args.holdout:
+        X_val, y_val = labeled_frames(args.holdout, top_features, args.label_field)
+    else:
+        X, X_val, y, y_val = split_holdout(X, y, args.holdout_fraction)
+    print(f"[+] Training on {len(y):,} samples, validating on {len(y_val):,}")
+
+    val_input = model_input(X_val, bundle.preprocessor)
+    base_auc = holdout_auc(bundle.model, val_input, y_val)
+    start = time.perf_counter()
+    model = continue_training(bundle.model, bundle.preprocessor, X, y, X_val, y_val, args.rounds,
+                              args.early_stopping)
+    seconds = time.perf_counter() - start
+    new_auc = holdout_auc(model, val_input, y_val)
+    added = trees_of(model) - bundle.model.get_booster().num_boosted_rounds()
+    print(f"[+] Deployed model  : AUC {base_auc:.4f}")
+    print(f"[+] Incremental     : AUC {new_auc:.4f}  {seconds:8.1f}s  (+{added} trees)")
+
+    info = {"base": args.base, "base_version": bundle.version, "rows": int(len(y)), "holdout_rows": int(len(y_val)),
+            "base_auc": base_auc, "auc": new_auc, "seconds": round(seconds, 3), "trees_added": int(added),
+            "inputs": [os.path.abspath(path) for path in args.inputs]}
+
+    archive_deployed_model(args.base, args.versions_dir, args.preprocessor)
+    if args.history:
+        X_old, y_old = labeled_frames(args.history, top_features, args.label_field)
+        start = time.perf_counter()
+        full, full_preprocessor = full_retrain(bundle.model, bundle.preprocessor,
+                                               pd.concat([X_old, X], ignore_index=True), np.concatenate([y_old, y]),
+                                               X_val, y_val, early_stopping_rounds=args.early_stopping)
+        full_seconds = time.perf_counter() - start
+        full_auc = holdout_auc(full, model_input(X_val, full_preprocessor), y_val)
+        print(f"[+] Full retrain    : AUC {full_auc:.4f}  {full_seconds:8.1f}s  ({trees_of(full)} trees, "
+              f"{len(y_old) + len(y):,} samples)  -> incremental {full_seconds / max(seconds, 1e-9):.1f}x faster")
+        # Kept (unpublished) with its own preprocessor, for comparison or a manual publish
+        full_path = save_model_version(full, {"base": args.base, "auc": full_auc, "seconds": round(full_seconds, 3),
+                                              "rows": int(len(y_old) + len(y)), "note": "full retrain"},
+                                       args.versions_dir, stem="full", preprocessor=full_preprocessor)
+        print(f"[+] Wrote {full_path}")
+        info.update(full_retrain_auc=full_auc, full_retrain_seconds=round(full_seconds, 3),
+                    full_retrain_file=os.path.basename(full_path))
+
+    path = save_model_version(model, info, args.versions_dir, preprocessor=bundle.preprocessor)
+    print(f"[+] Wrote {path}")
+    if args.no_publish:
+        return
+    blocker = publish_blocker(base_auc, new_auc)
+    if blocker and not args.force:
+        print(f"[!] The {blocker}; not publishing (use --force)")
+        return
+    publish_model_version(path, args.base, args.versions_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+from collections import Counter
+
+from metrics import STAGE_SECONDS
+
+# How often new ML verdicts / GeoIP count changes are pushed to dashboards (seconds)
+PUSH_INTERVAL = 1.0
+MAX_VERDICTS_PER_PUSH = 500
+
+
+def push_ml_verdicts(socket, store, interval=PUSH_INTERVAL):
+    """
+    Emit 'ml_verdicts' with the rows added to the ML alert store since the
+    last push. Works whether the scorer runs in this process or as
+    ml_alert_watcher.py, and costs one indexed query per interval no matter
+    how many dashboards are connected.
+    """
+    latest = store.latest(1)
+    last_id = latest[-1]["id"] if latest else 0
+    while True:
+        socket.sleep(interval)
+        try:
+            rows = store.since(last_id, MAX_VERDICTS_PER_PUSH)
+        except Exception as e:
+            print(f"[X] Could not read new ML verdicts: {e}")
+            continue
+        if rows:
+            last_id = rows[-1]["id"]
+            with STAGE_SECONDS.time(stage="emit"):
+                socket.emit("ml_verdicts", rows)
+
+
+def location_counts(alerts, locator):
+    """
+    [{ip, lat, lng, city, count}] for the source IPs of `alerts`, count being
+    the number of those alerts each one raised. The /api/locations payload,
+    shared with push_geo_counts so both describe the same alerts.
+    """
+    ip_counts = Counter(a["src_ip"] for a in alerts if a.get("src_ip"))
+    # one batched lookup for the distinct IPs in this window
+    locations = locator.lookup_many(ip_counts.keys())
+    geo_data = []
+    for ip, count in ip_counts.items():
+        location = locations.get(ip)
+        if location is None:
+            continue
+        lat, lng, city = location
+        geo_data.append({"ip": ip, "lat": lat, "lng": lng, "city": city, "count": count})
+    return geo_data
+
+
+def push_geo_counts(socket, load_alerts, locator, interval=PUSH_INTERVAL):
+    """
+    Emit 'geo_counts' with the /api/locations entries that changed since the
+    last push. Counts are absolute, over the same recent alerts
+    /api/locations serves (`load_alerts`), so the dashboard sets them rather
+    than adding them up and its map keeps matching a reload; IPs that fell
+    out of that window are sent with count 0.
+    """
+    previous = {}
+    try:
+        previous = {loc["ip"]: loc for loc in location_counts(load_alerts(), locator)}
+    except Exception as e:
+        print("GeoIP error:", e)
+    while True:
+        socket.sleep(interval)
+        try:
+            current = {loc["ip"]: loc for loc in location_counts(load_alerts(), locator)}
+        except Exception as e:
+            print("GeoIP error:", e)
+            continue
+
+        changed = [loc for ip, loc in current.items() if ip not in previous or previous[ip]["count"] != loc["count"]]
+        changed.extend(dict(loc, count=0) for ip, loc in previous.items() if ip not in current)
+        previous = current
+        if changed:
+            with STAGE_SECONDS.time(stage="emit"):
+                socket.emit("geo_counts", changed)
@@ -1,37 +1,148 @@
+import json
 import os
+import queue
 import time
-import json
+from collections import Counter
+
+from metrics import STAGE_SECONDS
+
 EVE_LOG = "/var/log/suricata/eve.json"
 
-def watcher(socket):
-    alert_batch = []
-    payload = {}
-    last_emission = time.time()
-    with open(EVE_LOG, "r") as f:
-        # Read the last line of the file
-        f.seek(0, os.SEEK_END)
-
-        while True:
-            line = f.readline()
-            if not line:
-                # If no new line, wait a bit and check again
-                time.sleep(0.5)
-                continue
-            # Process the line
-            data = json.loads(line)
-
-            if data.get("event_type") == "alert":
-                if data["alert"]["signature"] in payload:
-                    # If the alert is already in the payload, skip it
-                    payload[data["alert"]["signature"]].append(data)
-                else:
-                    # If the alert is not in the payload, add it
-                    payload[data["alert"]["signature"]] = [data]
-            
-            now = time.time()
-            # If we have enough lines or it's been a while, emit them
-            if len(alert_batch) >= 5 or (now - last_emission) > 10:
-                socket.emit("alert_batch", json.dumps(payload))
-                payload.clear()
-                last_emission = now
-            
\ No newline at end of file
+# Flush pending alerts once this many have arrived, or this many seconds
+# after the first of them arrived, whichever comes first
+FLUSH_MAX_ALERTS = int(os.getenv("ALERT_FLUSH_MAX", "500"))
+FLUSH_INTERVAL = float(os.getenv("ALERT_FLUSH_INTERVAL", "2.0"))
+# Per signature: example alerts shipped to the dashboard and source IPs ranked
+MAX_SAMPLES_PER_SIGNATURE = 10
+TOP_SOURCES = 5
+IDLE_WAIT = 1.0
+# Top-level EVE keys the coalescer reads (the tailer subscription projects to these)
+WATCHER_FIELDS = ("event_type", "timestamp", "src_ip", "dest_ip", "app_proto", "alert")
+
+
+class SignatureAggregate:
+    # Everything the dashboard shows for one signature within a flush window
+
+    __slots__ = ("count", "critical", "first_seen", "last_seen", "severity", "sources", "protocols", "samples")
+
+    def __init__(self):
+        self.count = 0
+        self.critical = 0
+        self.first_seen = None
+        self.last_seen = None
+        self.severity = None
+        self.sources = Counter()
+        self.protocols = Counter()
+        self.samples = []
+
+    def add(self, event, alert):
+        self.count += 1
+        severity = alert.get("severity")
+        if severity is not None:
+            # Suricata severity 1 is the most severe
+            if self.severity is None or severity < self.severity:
+                self.severity = severity
+            if severity <= 2:
+                self.critical += 1
+        timestamp = event.get("timestamp")
+        if timestamp:
+            if self.first_seen is None or timestamp < self.first_seen:
+                self.first_seen = timestamp
+            if self.last_seen is None or timestamp > self.last_seen:
+                self.last_seen = timestamp
+        self.sources[event.get("src_ip")] += 1
+        self.protocols[event.get("app_proto") or "Unknown"] += 1
+        if len(self.samples) < MAX_SAMPLES_PER_SIGNATURE:
+            self.samples.append({
+                "timestamp": timestamp,
+                "src_ip": event.get("src_ip"),
+                "dest_ip": event.get("dest_ip"),
+                "app_proto": event.get("app_proto"),
+                "severity": severity,
+            })
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "critical": self.critical,
+            "first_seen": self.first_seen,
+            "last_seen": self.last_seen,
+            "severity": self.severity,
+            "top_src_ips": self.sources.most_common(TOP_SOURCES),
+            "protocols": dict(self.protocols),
+            "samples": self.samples,
+        }
+
+
+class AlertCoalescer:
+    """
+    Collects alerts into per-signature aggregates until a flush is due:
+    FLUSH_MAX_ALERTS alerts pending, or FLUSH_INTERVAL seconds since the first
+    pending alert arrived. A flood therefore costs one bounded payload per
+    window, whatever the alert rate.
+    """
+
+    def __init__(self, max_alerts=FLUSH_MAX_ALERTS, interval=FLUSH_INTERVAL):
+        self.max_alerts = max(1, max_alerts)
+        self.interval = interval
+        self.signatures = {}
+        self.pending = 0
+        self.first_at = None
+
+    def __len__(self):
+        return self.pending
+
+    def add(self, event):
+        alert = event.get("alert") or {}
+        signature = alert.get("signature") or "Unknown"
+        aggregate = self.signatures.get(signature)
+        if aggregate is None:
+            aggregate = self.signatures[signature] = SignatureAggregate()
+        aggregate.add(event, alert)
+        if not self.pending:
+            self.first_at = time.monotonic()
+        self.pending += 1
+
+    def time_left(self):
+        # Seconds until the deadline flush is due (None when nothing is pending)
+        if not self.pending:
+            return None
+        return max(0.0, self.interval - (time.monotonic() - self.first_at))
+
+    def due(self):
+        return self.pending >= self.max_alerts or (self.pending > 0 and self.time_left() == 0.0)
+
+    def flush(self):
+        payload = {
+            "total": self.pending,
+            "signatures": {signature: aggregate.to_dict() for signature, aggregate in self.signatures.items()},
+        }
+        self.signatures = {}
+        self.pending = 0
+        self.first_at = None
+        return payload
+
+
+def watcher(socket, subscription, max_alerts=FLUSH_MAX_ALERTS, interval=FLUSH_INTERVAL):
+    """
+    Socket.IO emitter: consumes the alert subscription of the shared EveTailer
+    and emits 'alert_batch' whenever the coalescer is due. The deadline is
+    enforced by the wait timeout, so pending alerts go out on time even when
+    eve.json goes quiet. The payload is serialized once per flush and the
+    same string is broadcast to every client.
+    """
+    coalescer = AlertCoalescer(max_alerts, interval)
+    while True:
+        time_left = coalescer.time_left()
+        try:
+            events = subscription.get_batch(coalescer.max_alerts - len(coalescer),
+                                            timeout=IDLE_WAIT if time_left is None else max(time_left, 0.01))
+        except queue.Empty:
+            events = []
+        for event in events:
+            if event.get("event_type") == "alert":
+                coalescer.add(event)
+
+        if coalescer.due():
+            with STAGE_SECONDS.time(stage="emit"):
+                socket.emit("alert_batch", json.dumps(coalescer.flush()))
@@ -0,0 +1,272 @@
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Prometheus text exposition (version 0.0.4), without a client library.
+# Every sample carries a process="..." label so the standalone ML watcher can
+# export to a textfile that the Flask app merges into its own /metrics.
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+METRICS_DIR = os.getenv("METRICS_DIR", "logs/metrics")
+# Textfiles older than this are left out of /metrics (their process is gone)
+TEXTFILE_MAX_AGE = 120
+EXPORT_INTERVAL = 15
+
+# Seconds; from a sub-millisecond parse up to a multi-second model batch
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_process = os.getenv("METRICS_PROCESS", "app")
+_lock = threading.Lock()
+_metrics = []
+_collectors = []
+
+
+def set_process(name):
+    global _process
+    _process = name
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names, values, extra=None):
+    pairs = [("process", _process)] + list(zip(names, values)) + list(extra or [])
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        with _lock:
+            _metrics.append(self)
+
+    def _key(self, labels):
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name, _label_text(self.labelnames, key), value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set_total(self, value, **labels):
+        # For totals another object already keeps (e.g. EveTailer.lines_read)
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0, 0.0]
+            counts = state[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            state[1] += 1
+            state[2] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            items = [(key, (list(state[0]), state[1], state[2])) for key, state in self._values.items()]
+        for key, (counts, total, value_sum) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield self.name + "_bucket", _label_text(self.labelnames, key, [("le", _number(bound))]), cumulative
+            yield self.name + "_bucket", _label_text(self.labelnames, key, [("le", "+Inf")]), total
+            yield self.name + "_count", _label_text(self.labelnames, key), total
+            yield self.name + "_sum", _label_text(self.labelnames, key), value_sum
+
+
+def add_collector(fn):
+    """Run fn() before every render, to copy state other objects keep into gauges/counters."""
+    with _lock:
+        _collectors.append(fn)
+    return fn
+
+
+def collect():
+    with _lock:
+        collectors = list(_collectors)
+        metrics = list(_metrics)
+    for fn in collectors:
+        try:
+            fn()
+        except Exception as e:
+            logging.getLogger(__name__).warning("metrics collector failed: %s", e)
+    families = {}
+    for metric in metrics:
+        family = families.setdefault(metric.name, [metric.help, metric.kind, []])
+        family[2].extend(f"{name}{labels} {_number(value)}" for name, labels, value in metric.samples())
+    return families
+
+
+def _read_textfile(path, families):
+    # Merge samples from an exported file into families, keyed by the HELP/TYPE above them
+    current = None
+    with open(path) as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if line.startswith("# HELP "):
+                name, _, help_text = line[7:].partition(" ")
+                current = families.setdefault(name, [help_text, "untyped", []])
+            elif line.startswith("# TYPE "):
+                name, _, kind = line[7:].partition(" ")
+                current = families.setdefault(name, ["", kind, []])
+                current[1] = kind
+            elif line and current is not None:
+                current[2].append(line)
+
+
+def render(textfile_dir=None):
+    """This process's metrics plus any fresh *.prom files exported by other processes."""
+    families = collect()
+    if textfile_dir and os.path.isdir(textfile_dir):
+        now = time.time()
+        for entry in sorted(os.listdir(textfile_dir)):
+            path = os.path.join(textfile_dir, entry)
+            if not entry.endswith(".prom") or entry == f"{_process}.prom":
+                continue
+            try:
+                if now - os.path.getmtime(path) <= TEXTFILE_MAX_AGE:
+                    _read_textfile(path, families)
+            except OSError:
+                continue
+    lines = []
+    for name, (help_text, kind, samples) in families.items():
+        if not samples:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(samples)
+    return "\n".join(lines) + "\n"
+
+
+def write_textfile(directory=METRICS_DIR):
+    # Atomic replace, so the app never reads a half-written file
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{_process}.prom")
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        f.write(render())
+    os.replace(tmp, path)
+    return path
+
+
+# --- Pipeline metrics shared by every component ---
+STAGE_SECONDS = Histogram(
+    "neuralnids_stage_seconds",
+    "Time spent per call in each pipeline stage (tail, parse, feature, predict, persist, emit).",
+    ["stage"],
+)
+EVENTS_READ = Counter("neuralnids_eve_lines_read_total", "EVE lines read by the tailer.", ["tailer"])
+EVENTS_SKIPPED = Counter("neuralnids_eve_lines_skipped_total",
+                         "EVE lines skipped on their raw event_type without decoding.", ["tailer"])
+PARSE_ERRORS = Counter("neuralnids_eve_parse_errors_total", "EVE lines that failed to decode.", ["tailer"])
+ROTATIONS = Counter("neuralnids_eve_rotations_total", "eve.json rotations and truncations followed.", ["tailer"])
+TAIL_LAG = Gauge("neuralnids_eve_tail_lag_bytes", "Bytes between the tailer's offset and the end of eve.json.",
+                 ["tailer"])
+DELIVERED = Counter("neuralnids_subscription_delivered_total", "Events queued for a subscriber.", ["subscription"])
+DROPPED = Counter("neuralnids_subscription_dropped_total",
+                  "Events dropped because a subscriber's queue was full.", ["subscription"])
+QUEUE_DEPTH = Gauge("neuralnids_subscription_queue_depth", "Events waiting in a subscriber's queue.",
+                    ["subscription"])
+ALERTS_SCORED = Counter("neuralnids_ml_alerts_scored_total", "Alerts scored by the ML model.", ["label"])
+SCORING_FAILURES = Counter("neuralnids_ml_scoring_failures_total", "Alerts the ML model failed to score.")
+FLOWS_DEDUPLICATED = Counter("neuralnids_ml_flows_deduplicated_total",
+                             "Alerts skipped because their flow was already scored.")
+MODEL_LOAD_SECONDS = Gauge("neuralnids_model_load_seconds", "Time taken to load the current model bundle.")
+MODEL_VERSION = Gauge("neuralnids_model_version", "Version counter of the loaded model bundle.")
+GEOIP_HIT_RATIO = Gauge("neuralnids_geoip_cache_hit_ratio", "GeoIP lookup cache hit ratio.")
+GEOIP_ENTRIES = Gauge("neuralnids_geoip_cache_entries", "Addresses held in the GeoIP cache.")
+
+
+def watch_tailer(tailer, name):
+    """Expose an EveTailer's counters and its subscriptions' queues."""
+    def collect_tailer():
+        EVENTS_READ.set_total(tailer.lines_read, tailer=name)
+        EVENTS_SKIPPED.set_total(tailer.lines_skipped, tailer=name)
+        PARSE_ERRORS.set_total(tailer.parse_errors, tailer=name)
+        ROTATIONS.set_total(tailer.rotations + tailer.truncations, tailer=name)
+        TAIL_LAG.set(tailer.lag_bytes(), tailer=name)
+        for subscription in tailer.subscriptions:
+            DELIVERED.set_total(subscription.delivered, subscription=subscription.name)
+            DROPPED.set_total(subscription.dropped, subscription=subscription.name)
+            QUEUE_DEPTH.set(subscription.depth(), subscription=subscription.name)
+    return add_collector(collect_tailer)
+
+
+def watch_registry(registry):
+    def collect_model():
+        bundle = registry.current()
+        if bundle is not None:
+            MODEL_LOAD_SECONDS.set(bundle.load_seconds)
+            MODEL_VERSION.set(bundle.version)
+    return add_collector(collect_model)
+
+
+def watch_geoip(locator):
+    def collect_geoip():
+        GEOIP_HIT_RATIO.set(locator.hit_ratio())
+        GEOIP_ENTRIES.set(locator.stats()["size"])
+    return add_collector(collect_geoip)
+
+
+def export_periodically(directory=METRICS_DIR, interval=EXPORT_INTERVAL, sleep=time.sleep):
+    # For processes without an HTTP server (the standalone ML watcher)
+    while True:
+        try:
+            write_textfile(directory)
+        except OSError as e:
+            logging.getLogger(__name__).warning("could not export metrics: %s", e)
+        sleep(interval)
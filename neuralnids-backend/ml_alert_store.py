@@ -0,0 +1,134 @@
+import os
+import sqlite3
+import threading
+import time
+
+ML_ALERT_DB = "logs/ml_alerts.db"
+# Retention: keep at most this many results, and (when set) nothing older than MAX_AGE seconds
+RETENTION_ROWS = int(os.getenv("ML_ALERT_RETENTION", "100000"))
+RETENTION_MAX_AGE = float(os.getenv("ML_ALERT_MAX_AGE", "0")) or None
+# Prune after this many inserts instead of on every write
+PRUNE_EVERY = 1000
+# Most rows one query returns (a negative SQLite LIMIT means no limit at all)
+MAX_QUERY_ROWS = 10000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ml_alerts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts REAL NOT NULL,
+    timestamp TEXT,
+    label TEXT,
+    confidence REAL,
+    flow_id INTEGER,
+    src_ip TEXT,
+    dest_ip TEXT,
+    signature TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_ml_alerts_ts ON ml_alerts (ts);
+"""
+
+
+def parse_time(value):
+    # Epoch seconds, or a local "YYYY-MM-DDTHH:MM:SS" timestamp like the records use
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return time.mktime(time.strptime(value[:19], "%Y-%m-%dT%H:%M:%S"))
+
+
+def clamp_limit(limit):
+    # Row count for a query, kept within 1..MAX_QUERY_ROWS
+    return max(1, min(int(limit), MAX_QUERY_ROWS))
+
+
+class MLAlertStore:
+    """
+    Bounded, append-friendly store for ML verdicts in SQLite (WAL mode).
+
+    The watcher appends whole batches in one transaction; the API reads the
+    newest N rows or a time range through the primary key / ts index, so
+    neither side ever rewrites or re-parses the whole history. WAL lets the
+    watcher process write while the Flask process reads.
+    """
+
+    def __init__(self, path=ML_ALERT_DB, max_rows=RETENTION_ROWS, max_age=RETENTION_MAX_AGE):
+        self.path = path
+        self.max_rows = max_rows
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._inserts_since_prune = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def append_many(self, records):
+        """Insert result dicts (timestamp, label, confidence and optional flow/ip/signature)."""
+        if not records:
+            return
+        now = time.time()
+        rows = [(
+            record.get("ts", now),
+            record.get("timestamp"),
+            record.get("label"),
+            record.get("confidence"),
+            record.get("flow_id"),
+            record.get("src_ip"),
+            record.get("dest_ip"),
+            record.get("signature"),
+        ) for record in records]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO ml_alerts (ts, timestamp, label, confidence, flow_id, src_ip, dest_ip, signature) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            self._inserts_since_prune += len(rows)
+            if self._inserts_since_prune >= PRUNE_EVERY:
+                self._prune()
+                self._inserts_since_prune = 0
+
+    def append(self, record):
+        self.append_many([record])
+
+    def _prune(self):
+        if self.max_rows:
+            self._conn.execute(
+                "DELETE FROM ml_alerts WHERE id <= (SELECT MAX(id) FROM ml_alerts) - ?", (self.max_rows,)
+            )
+        if self.max_age:
+            self._conn.execute("DELETE FROM ml_alerts WHERE ts < ?", (time.time() - self.max_age,))
+
+    def _query(self, sql, params):
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [dict(row) for row in rows]
+
+    def latest(self, limit=200):
+        """Newest `limit` results (1..MAX_QUERY_ROWS), oldest first."""
+        rows = self._query("SELECT * FROM ml_alerts ORDER BY id DESC LIMIT ?", (clamp_limit(limit),))
+        rows.reverse()
+        return rows
+
+    def between(self, start=None, end=None, limit=1000):
+        """Results with start <= ts <= end (epoch seconds, either bound optional), oldest first."""
+        rows = self._query(
+            "SELECT * FROM ml_alerts WHERE ts >= ? AND ts <= ? ORDER BY ts DESC LIMIT ?",
+            (start if start is not None else 0, end if end is not None else float("inf"), clamp_limit(limit))
+        )
+        rows.reverse()
+        return rows
+
+    def since(self, last_id, limit=1000):
+        """Results inserted after row id `last_id`, oldest first."""
+        return self._query("SELECT * FROM ml_alerts WHERE id > ? ORDER BY id LIMIT ?", (last_id, clamp_limit(limit)))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
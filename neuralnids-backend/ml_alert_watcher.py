@@ -1,90 +1,251 @@
-import json
+import logging
+import numpy as np
 import pandas as pd
+import queue
+import threading
 import time
 import os
-from ml_predictor import predict_event
+from eve_tailer import EveTailer
+from ml_predictor import predict_batch
+from model_registry import get_registry
+from ml_alert_store import MLAlertStore, ML_ALERT_DB
+from flow_dedup import FlowDeduper
+from suricata_feature_adapter import CompiledFeatureMapper
+from flow_window import ConnectionWindow, event_window_counts, FEATURE_NAMES as WINDOW_FEATURE_NAMES
+from scoring_pool import ML_WORKERS, ScoringPool
+import metrics
+from metrics import ALERTS_SCORED, FLOWS_DEDUPLICATED, SCORING_FAILURES, STAGE_SECONDS
+
+log = logging.getLogger("ml_alert_watcher")
 
 EVE_LOG = "/var/log/suricata/eve.json"
-ML_ALERT_LOG = "logs/ml_alerts.jsonl"
 TOP25_FEATURES_PATH = "models/top25_features.txt"
 
+# Micro-batching: score once BATCH_SIZE alerts are pending or the oldest
+# pending alert has waited BATCH_MAX_WAIT seconds, whichever comes first.
+BATCH_SIZE = int(os.getenv("ML_BATCH_SIZE", "256"))
+BATCH_MAX_WAIT = float(os.getenv("ML_BATCH_MAX_WAIT", "0.5"))
+IDLE_SLEEP = 0.2
+# Alerts waiting to be scored; beyond this the oldest are dropped
+ML_QUEUE_SIZE = int(os.getenv("ML_QUEUE_SIZE", "50000"))
+# The scorer needs flow events too, for the ct_* connection window. Flow
+# records are decoded in full: with orjson that costs about 2.8 us per record
+# against 4.3 us for pulling just the window fields out with a regex, so there
+# is no lighter path to take; with flows at half of the stream they are
+# roughly 40% of this subscriber's decode time (benchmarks/bench_eve_decode.py
+# --event-types alert flow --flow-ratio 0.5). A field projection would not
+# help: the time goes into parsing, not into the dict that is kept.
+ML_EVENT_TYPES = ["alert", "flow"]
+# Seconds between flow de-duplication occupancy/eviction reports
+STATS_INTERVAL = 300
+
 def load_top_features(path):
     with open(path, "r") as f:
         return [line.strip() for line in f.readlines()]
 
-def map_suricata_to_features(event, top_features):
-    flat = {}
-    for key, value in event.items():
-        if isinstance(value, dict):
-            for subkey, subvalue in value.items():
-                flat[subkey] = subvalue
+_mappers = {}
+
+def get_feature_mapper(top_features):
+    # Compile the Suricata -> feature mapping once per feature list
+    key = tuple(top_features)
+    if key not in _mappers:
+        _mappers[key] = CompiledFeatureMapper(top_features)
+    return _mappers[key]
+
+def map_suricata_to_features(event, top_features, window_counts=None):
+    return map_suricata_batch([event], top_features, None if window_counts is None else [window_counts])
+
+def fill_feature_matrix(events, top_features, window_counts=None, out=None):
+    # One row per event, columns in top-feature order, missing features as 0.
+    # window_counts[i] holds event i's ct_* counts (FEATURE_NAMES order) from a ConnectionWindow.
+    # With `out`, rows are written into it (e.g. a shared-memory batch slot).
+    matrix = get_feature_mapper(top_features).transform(events, out=out)
+    if window_counts is not None:
+        positions = [(top_features.index(feat), k) for k, feat in enumerate(WINDOW_FEATURE_NAMES)
+                     if feat in top_features]
+        if positions:
+            columns, ks = zip(*positions)
+            matrix[:, list(columns)] = np.asarray(window_counts, dtype=np.float64)[:, list(ks)]
+    return matrix
+
+def map_suricata_batch(events, top_features, window_counts=None):
+    return pd.DataFrame(fill_feature_matrix(events, top_features, window_counts), columns=top_features)
+
+
+class MicroBatcher:
+    """
+    Collects items until `batch_size` are pending or `max_wait` seconds have
+    passed since the first pending item arrived.
+    """
+
+    def __init__(self, batch_size=BATCH_SIZE, max_wait=BATCH_MAX_WAIT):
+        self.batch_size = max(1, batch_size)
+        self.max_wait = max_wait
+        self.items = []
+        self.first_at = None
+
+    def __len__(self):
+        return len(self.items)
+
+    def add(self, item):
+        if not self.items:
+            self.first_at = time.monotonic()
+        self.items.append(item)
+
+    def time_left(self):
+        # Seconds until the deadline flush is due (None when nothing is pending)
+        if not self.items:
+            return None
+        return max(0.0, self.max_wait - (time.monotonic() - self.first_at))
+
+    def ready(self):
+        return len(self.items) >= self.batch_size or (bool(self.items) and self.time_left() == 0.0)
+
+    def drain(self):
+        items, self.items, self.first_at = self.items, [], None
+        return items
+
+
+def score_and_log(items, top_features, store):
+    # Score a whole batch of (alert, window counts) with one predict_proba call,
+    # store one result per alert in order
+    events = [event for event, _ in items]
+    log.debug("Mapping %d Suricata alert(s) to feature vectors...", len(events))
+    with STAGE_SECONDS.time(stage="feature"):
+        df = map_suricata_batch(events, top_features, [counts for _, counts in items])
+
+    log.debug("Sending batch to ML model for prediction...")
+    log_results(events, predict_batch(df), store)
+
+def log_results(events, results, store):
+    # Store one record per successfully scored alert, in batch order
+    timestamp = time.strftime("%Y-%m-%dT%H:%M:%S")
+    records = []
+    debug = log.isEnabledFor(logging.DEBUG)
+    for event, result in zip(events, results):
+        if "Probability" in result and "Label" in result:
+            if debug:
+                log.debug("ML Prediction: %s (Confidence: %s) flow=%s",
+                          result["Label"], result["Probability"], event.get("flow_id"))
+            ALERTS_SCORED.inc(label=result["Label"])
+            records.append({
+                "timestamp": timestamp,
+                "label": result["Label"],
+                "confidence": result["Probability"],
+                "flow_id": event.get("flow_id"),
+                "src_ip": event.get("src_ip"),
+                "dest_ip": event.get("dest_ip"),
+                "signature": event.get("alert", {}).get("signature")
+            })
         else:
-            flat[key] = value
-
-    features = {feat: 0 for feat in top_features}
-    for feat in top_features:
-        if feat in flat:
-            features[feat] = flat[feat]
+            # Counted in the failures metric; predict_batch already reports a failed batch once
+            SCORING_FAILURES.inc()
+            log.debug("ML Prediction failed: %s flow=%s", result.get("Error", "Unknown error"), event.get("flow_id"))
 
-    return pd.DataFrame([features])
+    with STAGE_SECONDS.time(stage="persist"):
+        store.append_many(records)
 
-def trim_log_file(path, max_lines=10):
-    with open(path, "r") as f:
-        lines = f.readlines()[-max_lines:]
-    with open(path, "w") as f:
-        f.writelines(lines)
+def score_events(subscription, batch_size=BATCH_SIZE, max_wait=BATCH_MAX_WAIT, store=None, workers=ML_WORKERS):
+    """
+    ML scorer: consumes the alert subscription of an EveTailer.
 
-def tail_eve_and_predict():
-    print("[+] Watching eve.json for new alerts with ML integration...")
+    With workers > 0, batches are scored by a ScoringPool of that many
+    processes (sharded by flow) and this loop only routes events, builds the
+    feature rows and writes the results.
+    """
     top_features = load_top_features(TOP25_FEATURES_PATH)
-    seen_flows = set()
-
-    with open(EVE_LOG, "r") as f:
-        f.seek(0, 2)
+    store = store or MLAlertStore(ML_ALERT_DB)
+    seen_flows = FlowDeduper()
+    # ct_* connection counts; which events feed it is set by
+    # flow_window.WINDOW_FROM_FLOWS
+    window = ConnectionWindow()
+    next_stats = time.monotonic() + STATS_INTERVAL
+
+    pool = None
+    if workers > 0:
+        pool = ScoringPool(top_features, workers, batch_size).start()
+        print(f"[+] Scoring with {pool.workers} worker process(es)")
+    else:
+        get_registry().get()  # load the model once before the first alert arrives
+    batchers = [MicroBatcher(batch_size, max_wait) for _ in range(pool.workers if pool else 1)]
+
+    def write(items, results):
+        log_results([event for event, _ in items], results, store)
+
+    def flush(index, items):
+        if pool is None:
+            score_and_log(items, top_features, store)
+            return
+        slot, out = pool.acquire(index, write)
+        with STAGE_SECONDS.time(stage="feature"):
+            fill_feature_matrix([event for event, _ in items], top_features,
+                                [counts for _, counts in items], out=out)
+        pool.submit(index, slot, items)
+
+    try:
         while True:
-            line = f.readline()
-            if not line:
-                time.sleep(0.2)
-                continue
+            if time.monotonic() >= next_stats:
+                print(f"[+] Flow dedup: {seen_flows.stats()}")
+                next_stats = time.monotonic() + STATS_INTERVAL
+
+            for index, batcher in enumerate(batchers):
+                if batcher.ready():
+                    try:
+                        flush(index, batcher.drain())
+                    except Exception as e:
+                        print(f"[X] ML Prediction error: {e}")
+            if pool is not None:
+                pool.collect(write)
+
+            waits = [t for t in (batcher.time_left() for batcher in batchers) if t is not None]
+            timeout = min(waits) if waits else IDLE_SLEEP
+            if pool is not None and pool.pending():
+                # Keep picking up finished batches while the stream is quiet
+                timeout = min(timeout, 0.05)
             try:
-                event = json.loads(line.strip())
-                print(f"[DEBUG] New event received at {time.strftime('%X')}")
-                print(f"[DEBUG] Event type: {event.get('event_type')}")
+                event = subscription.get(timeout=timeout)
+            except queue.Empty:
+                continue
+
+            if event.get("event_type") == "flow":
+                event_window_counts(window, event)
+                continue
 
+            try:
                 if event.get("event_type") != "alert":
                     continue
 
                 flow_id = event.get("flow_id")
-                if flow_id in seen_flows:
+                if seen_flows.seen(flow_id):
+                    FLOWS_DEDUPLICATED.inc()
                     continue
-                seen_flows.add(flow_id)
-
-                print(f"[ALERT] {event.get('src_ip')} → {event.get('dest_ip')} | {event.get('proto')} | {event.get('alert', {}).get('signature')}")
-
-                print("[+] Mapping Suricata alert to feature vector...")
-                df = map_suricata_to_features(event, top_features)
-                print("[DEBUG] Feature Vector:", df.to_dict(orient="records")[0])
-
-                print("[+] Sending to ML model for prediction...")
-                result = predict_event(df)
-
-                if "Probability" in result and "Label" in result:
-                    print(f"[+] ML Prediction: {result['Label']} (Confidence: {result['Probability']})")
 
-                    with open(ML_ALERT_LOG, "a") as log:
-                        log.write(json.dumps({
-                            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
-                            "label": result["Label"],
-                            "confidence": result["Probability"]
-                        }) + "\n")
-
-                    trim_log_file(ML_ALERT_LOG, max_lines=10)
-
-                else:
-                    print(f"[X] ML Prediction failed: {result.get('Error', 'Unknown error')}")
+                if log.isEnabledFor(logging.DEBUG):
+                    log.debug("%s → %s | %s | %s", event.get("src_ip"), event.get("dest_ip"),
+                              event.get("proto"), event.get("alert", {}).get("signature"))
+                counts = event_window_counts(window, event)
+                # Same flow, same worker: keeps its verdicts in order
+                batchers[pool.shard(event) if pool else 0].add((event, counts))
 
             except Exception as e:
                 print(f"[X] ML Prediction error: {e}")
+    finally:
+        if pool is not None:
+            pool.close(write)
+
+def tail_eve_and_predict(batch_size=BATCH_SIZE, max_wait=BATCH_MAX_WAIT, workers=ML_WORKERS):
+    # Standalone mode: this process runs its own tailer with the scorer as its only subscriber
+    print("[+] Watching eve.json for new alerts with ML integration...")
+    tailer = EveTailer(EVE_LOG)
+    subscription = tailer.subscribe("ml_scorer", maxsize=ML_QUEUE_SIZE, event_types=ML_EVENT_TYPES)
+    # No HTTP server here: metrics go to a textfile the app's /metrics merges in
+    metrics.set_process("ml_alert_watcher")
+    metrics.watch_tailer(tailer, "ml_alert_watcher")
+    metrics.watch_registry(get_registry())
+    threading.Thread(target=metrics.export_periodically, name="metrics-export", daemon=True).start()
+    threading.Thread(target=tailer.run, name="eve-tailer", daemon=True).start()
+    score_events(subscription, batch_size, max_wait, workers=workers)
 
 if __name__ == "__main__":
-    tail_eve_and_predict()
\ No newline at end of file
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper(), format="[%(levelname)s] %(message)s")
+    tail_eve_and_predict()
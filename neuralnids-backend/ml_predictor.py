@@ -1,13 +1,12 @@
 import json
+import logging
+import time
 import pandas as pd
-from joblib import load
 from utils import preprocess_data, engineer_features
-import os
+from model_registry import MODEL_PATH, FEATURES_PATH, THRESHOLD_PATH, get_registry, read_threshold
+from metrics import STAGE_SECONDS
 
-# --- CONFIG ---
-MODEL_PATH = "models/ensemble_stacking_model.joblib"
-FEATURES_PATH = "models/top25_features.txt"
-THRESHOLD_PATH = "logs/optimal_threshold_stacking.txt"
+log = logging.getLogger(__name__)
 
 def load_sample_event(json_path):
     with open(json_path, "r") as f:
@@ -15,69 +14,105 @@ def load_sample_event(json_path):
     return pd.DataFrame([data])
 
 def load_threshold():
-    if os.path.exists(THRESHOLD_PATH):
-        with open(THRESHOLD_PATH, "r") as f:
-            return float(f.read().strip())
-    return 0.5
+    return read_threshold(THRESHOLD_PATH)
 
 def drop_unhashable_columns(df):
     unhashable_cols = [col for col in df.columns if df[col].apply(lambda x: isinstance(x, dict)).any()]
     if unhashable_cols:
-        print(f"[X] Dropping nested columns: {unhashable_cols}")
+        log.debug("Dropping nested columns: %s", unhashable_cols)
         df = df.drop(columns=unhashable_cols)
     return df
 
-def predict_event(input_data):
+def _error_result(e):
+    return {
+        "Prediction": -1,
+        "Confidence": 0.0,
+        "Label": "Error",
+        "Error": str(e)
+    }
+
+def features_for_model(df, bundle):
+    """
+    The model input for a batch of mapped events: engineer_features, then the
+    bundle's frozen preprocessor. Shared with incremental_train.py, so new
+    training samples go through exactly what scoring does.
+    """
+    log.debug("Engineering new features...")
+    df = engineer_features(df)
+
+    log.debug("Preprocessing features...")
+    if bundle.preprocessor is not None:
+        # Training-time column order, categories and scaler statistics
+        X = bundle.preprocessor.transform(df)
+    else:
+        # No exported preprocessor: fall back to refitting on the batch
+        X, _, _ = preprocess_data(df, selected_features=bundle.features)
+
+        # Keep only numeric columns (this avoids JSON/IP/etc errors)
+        X = X.select_dtypes(include=["number"])
+
+    if X.shape[1] == 0:
+        raise ValueError("No usable features found after preprocessing. Ensure the input matches the expected top25 features.")
+    return X
+
+def predict_batch(df):
+    """
+    Score every row of a DataFrame with one engineer/preprocess/predict_proba pass.
+    Returns one result dict per input row, in the same order as the rows.
+    """
     try:
-        # Ensure input is a DataFrame
-        if isinstance(input_data, dict):
-            df = pd.DataFrame([input_data])
-        elif isinstance(input_data, pd.DataFrame):
-            df = input_data.copy()
-        else:
-            raise ValueError("Input must be a dictionary or DataFrame")
+        if not isinstance(df, pd.DataFrame):
+            raise ValueError("Input must be a DataFrame")
+        if len(df) == 0:
+            return []
+        start = time.perf_counter()
+        df = df.reset_index(drop=True)
 
         # Drop unhashable/nested columns
         unhashable_cols = [col for col in df.columns if df[col].apply(lambda x: isinstance(x, dict)).any()]
         if unhashable_cols:
-            print(f"[!] Dropping nested columns: {unhashable_cols}")
+            log.debug("Dropping nested columns: %s", unhashable_cols)
             df = df.drop(columns=unhashable_cols)
 
-        print("[+] Engineering new features...")
-        df = engineer_features(df)
+        # Resident model/threshold/features, reloaded only when the files change
+        bundle = get_registry().get()
 
-        print("[+] Preprocessing features...")
-        X, _, _ = preprocess_data(df, selected_features_file=FEATURES_PATH)
+        X = features_for_model(df, bundle)
 
-        # Keep only numeric columns (this avoids JSON/IP/etc errors)
-        X = X.select_dtypes(include=["number"])
-
-        if X.shape[1] == 0:
-            raise ValueError("No usable features found after preprocessing. Ensure the input matches the expected top25 features.")
+        threshold = bundle.threshold
 
-        print("[+] Loading model and threshold...")
-        model = load(MODEL_PATH)
-        threshold = load_threshold()
+        log.debug("Making prediction for %d event(s)...", len(X))
+        probs = bundle.backend.predict_proba(X)
 
-        print("[+] Making prediction...")
-        prob = model.predict_proba(X)[0][1]
-        prediction = int(prob >= threshold)
-
-        return {
-            "Probability": round(prob, 4),
-            "Threshold": threshold,
-            "Prediction": prediction,
-            "Label": "ATTACK" if prediction == 1 else "NORMAL"
-        }
+        results = []
+        for prob in probs:
+            prediction = int(prob >= threshold)
+            results.append({
+                "Probability": round(float(prob), 4),
+                "Threshold": threshold,
+                "Prediction": prediction,
+                "Label": "ATTACK" if prediction == 1 else "NORMAL"
+            })
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage="predict")
+        return results
 
     except Exception as e:
         print(f"[X] ML Prediction error: {e}")
-        return {
-            "Prediction": -1,
-            "Confidence": 0.0,
-            "Label": "Error",
-            "Error": str(e)
-        }
+        rows = len(df) if isinstance(df, pd.DataFrame) else 1
+        return [_error_result(e) for _ in range(max(rows, 1))]
+
+def predict_event(input_data):
+    # Ensure input is a DataFrame
+    if isinstance(input_data, dict):
+        df = pd.DataFrame([input_data])
+    elif isinstance(input_data, pd.DataFrame):
+        df = input_data.copy()
+    else:
+        print("[X] ML Prediction error: Input must be a dictionary or DataFrame")
+        return _error_result("Input must be a dictionary or DataFrame")
+
+    results = predict_batch(df)
+    return results[0] if results else _error_result("No rows to score")
 
 if __name__ == "__main__":
     import sys
@@ -0,0 +1,337 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from joblib import dump, load
+
+from inference_backend import INFERENCE_BACKEND, make_backend, onnx_path_for
+
+# --- CONFIG ---
+MODEL_PATH = "models/ensemble_stacking_model.joblib"
+FEATURES_PATH = "models/top25_features.txt"
+THRESHOLD_PATH = "logs/optimal_threshold_stacking.txt"
+PREPROCESSOR_PATH = "models/preprocessor.joblib"
+DEFAULT_THRESHOLD = 0.5
+# Numbered model artifacts written by incremental_train.py, with a manifest
+MODEL_VERSIONS_DIR = "models/versions"
+MANIFEST_NAME = "manifest.json"
+
+# How often (seconds) the registry stats the model files looking for changes
+RELOAD_CHECK_INTERVAL = 2.0
+
+
+def read_threshold(path=THRESHOLD_PATH):
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            return float(f.read().strip())
+    return DEFAULT_THRESHOLD
+
+
+def read_features(path=FEATURES_PATH):
+    with open(path, "r") as f:
+        return [line.strip() for line in f.readlines() if line.strip()]
+
+
+def preprocessor_path_for(model_path):
+    # The FrozenPreprocessor a model was trained with is saved next to it
+    return os.path.splitext(model_path)[0] + ".preprocessor.joblib"
+
+
+def resolve_preprocessor_path(model_path, fallback=PREPROCESSOR_PATH):
+    """The model's own preprocessor file if it has one, else `fallback` if that exists, else None."""
+    for path in (preprocessor_path_for(model_path), fallback):
+        if path and os.path.exists(path):
+            return path
+    return None
+
+
+def save_model(model, model_path, preprocessor):
+    """
+    Write a trained model and the FrozenPreprocessor its training data went
+    through (an instance or the path preprocess_data exported it to) side by
+    side, so the registry always scores it with the training-time scaling.
+    """
+    if isinstance(preprocessor, str):
+        from preprocessor import load_preprocessor
+        preprocessor = load_preprocessor(preprocessor) if os.path.exists(preprocessor) else None
+    if preprocessor is None:
+        raise ValueError(f"Refusing to save {model_path} without its preprocessor: export one with "
+                         f"preprocess_data(..., preprocessor_path=...) and pass it along")
+    dump(model, model_path + ".tmp")
+    os.replace(model_path + ".tmp", model_path)
+    preprocessor.save(preprocessor_path_for(model_path))
+    print(f"[+] Saved {model_path} with its preprocessor")
+    return model_path
+
+
+class ModelBundle:
+    """
+    Immutable snapshot of everything needed to score events: the model and
+    the inference backend that runs it, its decision threshold, the ordered
+    feature list it was trained on and, when one was exported at training
+    time, the FrozenPreprocessor (None for models saved without one; those
+    fall back to rescaling every batch, and the registry warns when loading
+    them).
+
+    A prediction grabs one bundle and uses it from start to finish, so a
+    reload that swaps in a newer bundle never changes the model under a
+    prediction that is already running.
+    """
+
+    __slots__ = ("model", "backend", "threshold", "features", "preprocessor", "version", "loaded_at",
+                 "load_seconds")
+
+    def __init__(self, model, backend, threshold, features, preprocessor, version, loaded_at, load_seconds):
+        self.model = model
+        self.backend = backend
+        self.threshold = threshold
+        self.features = features
+        self.preprocessor = preprocessor
+        self.version = version
+        self.loaded_at = loaded_at
+        self.load_seconds = load_seconds
+
+
+class ModelRegistry:
+    """
+    Process-wide holder for the resident model.
+
+    The model, threshold and feature list are loaded once on first use.
+    Afterwards the registry checks the files' mtime/size at most every
+    `check_interval` seconds and, when something changed, loads the new
+    files off to the side and swaps the bundle reference in one assignment.
+    If the reload fails (e.g. the model is still being copied into place)
+    the current bundle keeps serving and the reload is retried later.
+
+    The preprocessor saved next to the model (preprocessor_path_for) takes
+    precedence over `preprocessor_path`, which serves models exported before
+    the two were kept together.
+    """
+
+    def __init__(self, model_path=MODEL_PATH, threshold_path=THRESHOLD_PATH,
+                 features_path=FEATURES_PATH, preprocessor_path=PREPROCESSOR_PATH,
+                 check_interval=RELOAD_CHECK_INTERVAL, backend=INFERENCE_BACKEND):
+        self.model_path = model_path
+        self.threshold_path = threshold_path
+        self.features_path = features_path
+        self.preprocessor_path = preprocessor_path
+        self.check_interval = check_interval
+        self.backend = backend
+
+        self._lock = threading.Lock()
+        self._bundle = None
+        self._signature = None
+        self._last_check = 0.0
+        self._version = 0
+
+    def _file_signature(self):
+        signature = []
+        paths = (self.model_path, onnx_path_for(self.model_path), self.threshold_path, self.features_path,
+                 preprocessor_path_for(self.model_path), self.preprocessor_path)
+        for path in paths:
+            if not path:
+                signature.append(None)
+                continue
+            try:
+                st = os.stat(path)
+                signature.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def _load(self):
+        start = time.perf_counter()
+        model = load(self.model_path)
+        threshold = read_threshold(self.threshold_path)
+        features = read_features(self.features_path)
+        preprocessor = None
+        preprocessor_path = resolve_preprocessor_path(self.model_path, self.preprocessor_path)
+        if preprocessor_path:
+            from preprocessor import load_preprocessor
+            preprocessor = load_preprocessor(preprocessor_path)
+            features = preprocessor.features
+        else:
+            print(f"[!] No preprocessor for {self.model_path}: features will be rescaled per batch, "
+                  f"which does not match training. Save models with model_registry.save_model.")
+        backend = make_backend(model, self.backend, self.model_path)
+        elapsed = time.perf_counter() - start
+        return ModelBundle(
+            model=model,
+            backend=backend,
+            threshold=threshold,
+            features=features,
+            preprocessor=preprocessor,
+            version=self._version + 1,
+            loaded_at=time.time(),
+            load_seconds=elapsed,
+        )
+
+    def get(self):
+        """Return the current ModelBundle, loading or reloading it if needed."""
+        bundle = self._bundle
+        if bundle is not None and time.monotonic() - self._last_check < self.check_interval:
+            return bundle
+
+        with self._lock:
+            now = time.monotonic()
+            if self._bundle is not None and now - self._last_check < self.check_interval:
+                return self._bundle
+            self._last_check = now
+
+            signature = self._file_signature()
+            if self._bundle is not None and signature == self._signature:
+                return self._bundle
+
+            try:
+                new_bundle = self._load()
+            except Exception as e:
+                if self._bundle is None:
+                    raise
+                print(f"[!] Model reload failed, keeping version {self._bundle.version}: {e}")
+                return self._bundle
+
+            # Re-check the signature: if the files moved while we were
+            # loading, leave the old signature so the next check reloads.
+            if signature == self._file_signature():
+                self._signature = signature
+            self._version = new_bundle.version
+            self._bundle = new_bundle
+            print(f"[+] Loaded model version {new_bundle.version} in {new_bundle.load_seconds:.3f}s "
+                  f"({new_bundle.backend.name} backend)")
+            return new_bundle
+
+    def current(self):
+        """The loaded bundle, or None; never triggers a load."""
+        return self._bundle
+
+    def reload(self):
+        """Force a reload on the next get()."""
+        with self._lock:
+            self._signature = None
+            self._last_check = 0.0
+        return self.get()
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """Return the process-wide ModelRegistry, creating it on first use."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ModelRegistry()
+    return _registry
+
+
+def configure_registry(**kwargs):
+    """Replace the process-wide registry with one using non-default paths (see ModelRegistry)."""
+    global _registry
+    with _registry_lock:
+        _registry = ModelRegistry(**kwargs)
+    return _registry
+
+
+# --- Versioned artifacts ---
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_manifest(versions_dir=MODEL_VERSIONS_DIR):
+    path = os.path.join(versions_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_manifest(manifest, versions_dir):
+    path = os.path.join(versions_dir, MANIFEST_NAME)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def _add_version(source, info, versions_dir, stem, copy, preprocessor=None):
+    # Next version number, file under versions_dir (plus its preprocessor:
+    # a FrozenPreprocessor to save or a file to copy) and a manifest entry
+    os.makedirs(versions_dir, exist_ok=True)
+    manifest = read_manifest(versions_dir)
+    version = max((entry["version"] for entry in manifest), default=0) + 1
+    name = f"{stem}-v{version:04d}-{time.strftime('%Y%m%d-%H%M%S')}.joblib"
+    path = os.path.join(versions_dir, name)
+    if copy:
+        shutil.copyfile(source, path + ".tmp")
+    else:
+        dump(source, path + ".tmp")
+    os.replace(path + ".tmp", path)
+    info = dict(info or {})
+    if preprocessor is not None:
+        if isinstance(preprocessor, str):
+            shutil.copyfile(preprocessor, preprocessor_path_for(path))
+        else:
+            preprocessor.save(preprocessor_path_for(path))
+        info["preprocessor"] = os.path.basename(preprocessor_path_for(path))
+    manifest.append(dict(info, version=version, file=name, sha256=file_sha256(path),
+                         created=time.strftime("%Y-%m-%dT%H:%M:%S")))
+    _write_manifest(manifest, versions_dir)
+    return path
+
+
+def save_model_version(model, info=None, versions_dir=MODEL_VERSIONS_DIR, stem="xgb", preprocessor=None):
+    """
+    Write a model and its FrozenPreprocessor as the next numbered version and
+    record `info` for it in the manifest. A version saved without a
+    preprocessor cannot be published.
+    """
+    return _add_version(model, info, versions_dir, stem, copy=False, preprocessor=preprocessor)
+
+
+def archive_deployed_model(model_path=MODEL_PATH, versions_dir=MODEL_VERSIONS_DIR,
+                           preprocessor_path=PREPROCESSOR_PATH):
+    """Record the deployed model as a version unless it already is one, so it can be published back."""
+    if not os.path.exists(model_path):
+        return None
+    known = {entry.get("sha256") for entry in read_manifest(versions_dir)}
+    if file_sha256(model_path) in known:
+        return None
+    archived = _add_version(model_path, {"note": f"previously deployed {model_path}"}, versions_dir,
+                            "previous", copy=True,
+                            preprocessor=resolve_preprocessor_path(model_path, preprocessor_path))
+    print(f"[+] Archived the deployed model as {archived}")
+    return archived
+
+
+def publish_model_version(path, model_path=MODEL_PATH, versions_dir=MODEL_VERSIONS_DIR):
+    """
+    Install a saved version and its preprocessor as model_path with atomic
+    replaces, so every running ModelRegistry picks them up on its next file
+    check. The model it replaces is archived first if it is not a version
+    yet. Versions without a preprocessor are refused.
+    """
+    version_preprocessor = preprocessor_path_for(path)
+    if not os.path.exists(version_preprocessor):
+        raise ValueError(f"{path} has no preprocessor ({version_preprocessor}); refusing to publish it")
+    archive_deployed_model(model_path, versions_dir)
+    # Preprocessor first: a registry reloading in between rechecks the files and reloads again
+    tmp = preprocessor_path_for(model_path) + ".tmp"
+    shutil.copyfile(version_preprocessor, tmp)
+    os.replace(tmp, preprocessor_path_for(model_path))
+    tmp = model_path + ".tmp"
+    shutil.copyfile(path, tmp)
+    os.replace(tmp, model_path)
+    # An ONNX export of the old model would fail its parity check; drop it
+    onnx_path = onnx_path_for(model_path)
+    if os.path.exists(onnx_path):
+        os.remove(onnx_path)
+        print(f"[!] Removed stale ONNX export {onnx_path}")
+    print(f"[+] Published {path} as {model_path}")
+    return model_path
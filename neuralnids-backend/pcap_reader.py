@@ -0,0 +1,357 @@
+"""
+Streaming PCAP / pcapng reader.
+
+Packets are decoded straight from the raw frame bytes (Ethernet, 802.1Q,
+Linux cooked, BSD loopback or raw IP links) and packed into a preallocated
+record buffer of CHUNK_PACKETS rows. Each full buffer is handed out as one
+chunk of typed columns (a DataFrame, or a pyarrow RecordBatch), and the
+buffer is reused for the next one, so memory stays flat however big the
+capture is.
+
+Columns: timestamp (float64 seconds), src_ip / dst_ip (uint32), protocol,
+pkt_len (IP total length), sport / dport (0 when not TCP/UDP or for
+non-first fragments), tcp_flags and ttl.
+
+Non-IPv4 frames are counted as skipped; frames too short for the headers
+they announce, and a final record cut off by the end of the file, as
+malformed. A directory of captures can be read in parallel, one capture
+per process.
+
+Run from neuralnids-backend/:
+    python pcap_reader.py captures/ -o packets/ --workers 4
+"""
+import argparse
+import multiprocessing as mp
+import os
+import struct
+import time
+
+import dpkt
+import numpy as np
+import pandas as pd
+
+CHUNK_PACKETS = 262144
+PCAP_EXTENSIONS = (".pcap", ".pcapng", ".cap")
+
+COLUMNS = ["timestamp", "src_ip", "dst_ip", "protocol", "pkt_len", "sport", "dport", "tcp_flags", "ttl"]
+# One packed row per packet; the struct format and the dtype describe the same bytes
+_RECORD = struct.Struct("<dIIBHHHBB")
+RECORD_DTYPE = np.dtype([("timestamp", "<f8"), ("src_ip", "<u4"), ("dst_ip", "<u4"), ("protocol", "u1"),
+                         ("pkt_len", "<u2"), ("sport", "<u2"), ("dport", "<u2"), ("tcp_flags", "u1"),
+                         ("ttl", "u1")])
+assert RECORD_DTYPE.itemsize == _RECORD.size
+
+# version/ihl, ttl, protocol at fixed offsets; addresses as big-endian ints
+_IPV4 = struct.Struct("!BxHxxHBBxxII")
+_PORTS = struct.Struct("!HH")
+
+ETH_P_IP = 0x0800
+VLAN_TYPES = (0x8100, 0x88A8, 0x9100)
+PCAPNG_MAGIC = b"\x0a\x0d\x0d\x0a"
+PCAP_MAGIC_LE, PCAP_MAGIC_BE = b"\xd4\xc3\xb2\xa1", b"\xa1\xb2\xc3\xd4"
+PCAP_NANO_MAGIC_LE, PCAP_NANO_MAGIC_BE = b"\x4d\x3c\xb2\xa1", b"\xa1\xb2\x3c\x4d"
+READ_BLOCK = 1 << 20
+# Longest record accepted when the file's snaplen is smaller: some writers
+# leave the snaplen below the frames they store. Anything longer is corrupt.
+MAX_CAPTURED = 256 * 1024
+
+# Link types decoded; anything else is counted as skipped
+DLT_NULL, DLT_EN10MB, DLT_RAW, DLT_LINUX_SLL, DLT_IPV4 = 0, 1, 101, 113, 228
+_RAW_LINKS = (DLT_RAW, 12, 14, DLT_IPV4)
+
+
+class PcapStats:
+    """Packet counts for one or more captures."""
+
+    __slots__ = ("packets", "parsed", "skipped", "malformed")
+
+    def __init__(self, packets=0, parsed=0, skipped=0, malformed=0):
+        self.packets = packets
+        self.parsed = parsed
+        self.skipped = skipped
+        self.malformed = malformed
+
+    def add(self, other):
+        self.packets += other.packets
+        self.parsed += other.parsed
+        self.skipped += other.skipped
+        self.malformed += other.malformed
+        return self
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        return (f"PcapStats(packets={self.packets}, parsed={self.parsed}, "
+                f"skipped={self.skipped}, malformed={self.malformed})")
+
+
+def _pcap_records(f, header, stats=None):
+    # Classic pcap records parsed from large reads: dpkt.pcap.Reader builds a
+    # header object per packet and costs more than decoding the packet itself.
+    # A record cut off by the end of the file counts as a malformed packet.
+    # So does a record longer than the snaplen (and MAX_CAPTURED): its length
+    # is corrupt, so the records after it cannot be found and the file ends
+    # there.
+    magic = header[:4]
+    endian = "<" if magic in (PCAP_MAGIC_LE, PCAP_NANO_MAGIC_LE) else ">"
+    scale = 1e-9 if magic in (PCAP_NANO_MAGIC_LE, PCAP_NANO_MAGIC_BE) else 1e-6
+    unpack = struct.Struct(endian + "IIII").unpack_from
+    max_captured = max(struct.unpack_from(endian + "I", header, 16)[0], MAX_CAPTURED)
+    data, pos = bytearray(), 0
+    while True:
+        block = f.read(READ_BLOCK)
+        if not block:
+            if pos < len(data) and stats is not None:
+                stats.packets += 1
+                stats.malformed += 1
+            return
+        # The leftover is at most one record, so this stays linear
+        del data[:pos]
+        data += block
+        pos = 0
+        end = len(data)
+        while pos + 16 <= end:
+            sec, frac, captured, _ = unpack(data, pos)
+            if captured > max_captured:
+                if stats is not None:
+                    stats.packets += 1
+                    stats.malformed += 1
+                return
+            stop = pos + 16 + captured
+            if stop > end:
+                break
+            yield sec + frac * scale, data[pos + 16:stop]
+            pos = stop
+
+
+def _pcapng_records(reader, stats=None):
+    # dpkt raises on a block cut off by the end of the file; count it and stop
+    try:
+        yield from reader
+    except (dpkt.NeedData, dpkt.UnpackError):
+        if stats is not None:
+            stats.packets += 1
+            stats.malformed += 1
+
+
+def open_capture(f, stats=None):
+    """
+    (packets, link type) for an open capture file, pcap or pcapng by its
+    magic. A truncated final record is counted in `stats`.
+    """
+    header = f.read(24)
+    magic = header[:4]
+    if magic in (PCAP_MAGIC_LE, PCAP_MAGIC_BE, PCAP_NANO_MAGIC_LE, PCAP_NANO_MAGIC_BE):
+        if len(header) < 24:
+            raise ValueError("Truncated pcap header")
+        link = struct.unpack_from("<I" if magic in (PCAP_MAGIC_LE, PCAP_NANO_MAGIC_LE) else ">I", header, 20)[0]
+        return _pcap_records(f, header, stats), link & 0xFFFF
+    f.seek(0)
+    if magic == PCAPNG_MAGIC:
+        reader = dpkt.pcapng.Reader(f)
+        return _pcapng_records(reader, stats), reader.datalink()
+    raise ValueError("Not a pcap or pcapng file")
+
+
+def _chunk(records, n, label, arrow):
+    # Contiguous copies of the first n rows, so the record buffer can be refilled
+    columns = {name: np.ascontiguousarray(records[name][:n]) for name in COLUMNS}
+    if label is not None:
+        columns["label"] = np.full(n, label)
+    if arrow:
+        import pyarrow as pa
+        return pa.RecordBatch.from_arrays([pa.array(values) for values in columns.values()], names=list(columns))
+    return pd.DataFrame(columns, copy=False)
+
+
+def iter_pcap(path, chunk_packets=CHUNK_PACKETS, label=None, arrow=False, stats=None):
+    """
+    Yield the packets of a pcap/pcapng file as chunks of at most
+    `chunk_packets` rows: DataFrames, or pyarrow RecordBatches with
+    arrow=True. Counts go into `stats` (a PcapStats) when given.
+    """
+    stats = stats if stats is not None else PcapStats()
+    buffer = bytearray(chunk_packets * _RECORD.size)
+    records = np.frombuffer(buffer, dtype=RECORD_DTYPE)
+    pack_into, size = _RECORD.pack_into, _RECORD.size
+    unpack_ipv4, unpack_ports = _IPV4.unpack_from, _PORTS.unpack_from
+
+    with open(path, "rb") as f:
+        packets, link = open_capture(f, stats)
+        n = 0
+        for ts, buf in packets:
+            stats.packets += 1
+            # --- link layer ---
+            if link == DLT_EN10MB:
+                if len(buf) < 14:
+                    stats.malformed += 1
+                    continue
+                off = 14
+                ethertype = buf[12] << 8 | buf[13]
+                while ethertype in VLAN_TYPES and len(buf) >= off + 4:
+                    ethertype = buf[off + 2] << 8 | buf[off + 3]
+                    off += 4
+                if ethertype != ETH_P_IP:
+                    stats.skipped += 1
+                    continue
+            elif link == DLT_LINUX_SLL:
+                if len(buf) < 16:
+                    stats.malformed += 1
+                    continue
+                if buf[14] << 8 | buf[15] != ETH_P_IP:
+                    stats.skipped += 1
+                    continue
+                off = 16
+            elif link == DLT_NULL:
+                # Address family in host byte order of the capturing machine
+                if len(buf) < 4:
+                    stats.malformed += 1
+                    continue
+                if buf[0] != 2 and buf[3] != 2:
+                    stats.skipped += 1
+                    continue
+                off = 4
+            elif link in _RAW_LINKS:
+                if not buf or buf[0] >> 4 != 4:
+                    stats.skipped += 1
+                    continue
+                off = 0
+            else:
+                stats.skipped += 1
+                continue
+
+            # --- IPv4 ---
+            if len(buf) < off + 20:
+                stats.malformed += 1
+                continue
+            version_ihl, total_len, fragment, ttl, protocol, src, dst = unpack_ipv4(buf, off)
+            ihl = (version_ihl & 0x0F) * 4
+            if version_ihl >> 4 != 4 or ihl < 20 or len(buf) < off + ihl:
+                stats.malformed += 1
+                continue
+
+            # --- ports and TCP flags (first fragment only) ---
+            sport = dport = flags = 0
+            if not fragment & 0x1FFF and (protocol == 6 or protocol == 17):
+                l4 = off + ihl
+                if len(buf) < l4 + (14 if protocol == 6 else 4):
+                    stats.malformed += 1
+                    continue
+                sport, dport = unpack_ports(buf, l4)
+                if protocol == 6:
+                    flags = buf[l4 + 13]
+
+            pack_into(buffer, n * size, ts, src, dst, protocol, total_len, sport, dport, flags, ttl)
+            n += 1
+            if n == chunk_packets:
+                stats.parsed += n
+                yield _chunk(records, n, label, arrow)
+                n = 0
+        if n:
+            stats.parsed += n
+            yield _chunk(records, n, label, arrow)
+
+
+def read_pcap(path, label=None, stats=None, chunk_packets=CHUNK_PACKETS):
+    """Whole capture as one DataFrame (the chunks concatenated)."""
+    chunks = list(iter_pcap(path, chunk_packets, label, stats=stats))
+    if not chunks:
+        frame = pd.DataFrame({name: np.empty(0, dtype=RECORD_DTYPE[name]) for name in COLUMNS})
+        if label is not None:
+            frame["label"] = pd.Series(dtype=object)
+        return frame
+    return chunks[0] if len(chunks) == 1 else pd.concat(chunks, ignore_index=True)
+
+
+def expand_captures(inputs):
+    """Capture files from files, globs and directories, in sorted order."""
+    import glob
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            paths.extend(os.path.join(item, name) for name in os.listdir(item)
+                         if name.lower().endswith(PCAP_EXTENSIONS))
+        else:
+            paths.extend(sorted(glob.glob(item)) or [item])
+    return sorted(dict.fromkeys(paths))
+
+
+def _read_one(args):
+    path, label = args
+    stats = PcapStats()
+    return path, read_pcap(path, label, stats), stats
+
+
+def _convert_one(args):
+    # Stream one capture into a Parquet file, chunk by chunk
+    import pyarrow.parquet as pq
+    path, output_dir, label, chunk_packets = args
+    stats = PcapStats()
+    target = os.path.join(output_dir, os.path.basename(path) + ".parquet")
+    writer = None
+    try:
+        for batch in iter_pcap(path, chunk_packets, label, arrow=True, stats=stats):
+            if writer is None:
+                writer = pq.ParquetWriter(target + ".tmp", batch.schema)
+            writer.write_batch(batch)
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is not None:
+        os.replace(target + ".tmp", target)
+    return path, target if writer is not None else None, stats
+
+
+def _pool_map(fn, jobs, workers):
+    # One capture per task, results in input order; no pool for a single worker
+    if workers <= 1 or len(jobs) <= 1:
+        yield from map(fn, jobs)
+        return
+    with mp.get_context("spawn").Pool(min(workers, len(jobs))) as pool:
+        yield from pool.imap(fn, jobs)
+
+
+def iter_pcaps(inputs, workers=None, label=None):
+    """
+    Read many captures in parallel, one per process. Yields
+    (path, DataFrame, PcapStats) in input order.
+    """
+    paths = expand_captures(inputs)
+    yield from _pool_map(_read_one, [(path, label) for path in paths], workers or os.cpu_count() or 1)
+
+
+def convert_pcaps(inputs, output_dir, workers=None, label=None, chunk_packets=CHUNK_PACKETS):
+    """
+    Convert captures to one Parquet file each under output_dir, in parallel.
+    Only a chunk per worker is ever in memory. Returns the total PcapStats.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    paths = expand_captures(inputs)
+    jobs = [(path, output_dir, label, chunk_packets) for path in paths]
+    total = PcapStats()
+    for path, target, stats in _pool_map(_convert_one, jobs, workers or os.cpu_count() or 1):
+        print(f"[+] {path}: {stats.parsed:,} packets -> {target} "
+              f"({stats.skipped:,} skipped, {stats.malformed:,} malformed)")
+        total.add(stats)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="+", help="capture files, globs or directories")
+    parser.add_argument("-o", "--output", required=True, help="directory for the Parquet files")
+    parser.add_argument("--workers", type=int, default=None, help="reader processes (default: all CPUs)")
+    parser.add_argument("--label", default=None, help="label column value for every packet")
+    parser.add_argument("--chunk-packets", type=int, default=CHUNK_PACKETS)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    total = convert_pcaps(args.inputs, args.output, args.workers, args.label, args.chunk_packets)
+    elapsed = time.perf_counter() - started
+    print(f"[+] Done: {total.packets:,} packets, {total.parsed:,} parsed, {total.skipped:,} skipped, "
+          f"{total.malformed:,} malformed ({total.packets / elapsed if elapsed else 0:,.0f} packets/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+import numpy as np
+import pandas as pd
+from joblib import dump, load
+
+from utils import ip_to_int_array
+
+PREPROCESSOR_PATH = "models/preprocessor.joblib"
+
+# Plan step kinds
+NUMERIC = 0
+ONE_HOT = 1
+IP = 2
+
+
+class FrozenPreprocessor:
+    """
+    The training-time preprocessing of utils.preprocess_data, frozen.
+
+    Holds the selected output features in model order, where each one comes
+    from (a numeric column, an IP column, or a one-hot category of a column),
+    and the StandardScaler mean/scale fitted on the training data. transform()
+    fills a preallocated float matrix column by column and scales it in place,
+    so scoring never refits a scaler or re-runs get_dummies.
+
+    `categories` holds the full category set fitted for every one-hot encoded
+    column. A value outside it (a protocol never seen in training) sets none
+    of that column's indicators, i.e. it encodes as all zeros.
+    """
+
+    def __init__(self, features, sources, mean, scale, categories=None):
+        # sources[i] is (kind, column, category) for features[i]
+        self.features = list(features)
+        self.sources = [tuple(src) for src in sources]
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        if categories is None:
+            # Artifacts from before categories were stored: the selected indicators are all we know
+            categories = {}
+            for kind, name, category in self.sources:
+                if kind == ONE_HOT:
+                    categories.setdefault(name, []).append(category)
+        self.categories = {name: list(values) for name, values in categories.items()}
+
+    @classmethod
+    def from_fitted(cls, scaler, fitted_columns, selected_columns, one_hot=None, ip_columns=(), categories=None):
+        one_hot = one_hot or {}
+        index = {col: i for i, col in enumerate(fitted_columns)}
+        sources = []
+        for col in selected_columns:
+            if col in one_hot:
+                source_col, category = one_hot[col]
+                sources.append((ONE_HOT, source_col, category))
+            elif col in ip_columns:
+                sources.append((IP, col, None))
+            else:
+                sources.append((NUMERIC, col, None))
+        positions = [index[col] for col in selected_columns]
+        # StandardScaler already stores 1.0 for zero-variance columns
+        return cls(selected_columns, sources, scaler.mean_[positions], scaler.scale_[positions], categories)
+
+    def to_dict(self):
+        return {
+            "features": self.features,
+            "sources": self.sources,
+            "mean": self.mean.tolist(),
+            "scale": self.scale.tolist(),
+            "categories": self.categories,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["features"], data["sources"], data["mean"], data["scale"], data.get("categories"))
+
+    def save(self, path=PREPROCESSOR_PATH):
+        # Stored as a plain dict so the artifact does not pin this class's import path
+        dump(self.to_dict(), path)
+
+    @classmethod
+    def load(cls, path=PREPROCESSOR_PATH):
+        return cls.from_dict(load(path))
+
+    @staticmethod
+    def _column(data, name):
+        # Raw values for one input column; absent columns read as 0 like the feature mappers
+        if isinstance(data, pd.DataFrame):
+            if name in data.columns:
+                return data[name].to_numpy()
+            return None
+        if isinstance(data, dict):
+            return np.asarray(data[name]) if name in data else None
+        return np.array([row.get(name, 0) for row in data], dtype=object)
+
+    @staticmethod
+    def _as_float(values):
+        try:
+            return values.astype(np.float64, copy=False)
+        except (TypeError, ValueError):
+            out = np.empty(len(values), dtype=np.float64)
+            for i, v in enumerate(values):
+                try:
+                    out[i] = float(v)
+                except (TypeError, ValueError):
+                    out[i] = np.nan
+            return out
+
+    def transform(self, data, out=None):
+        """
+        Turn a DataFrame, a dict of columns or a list of dict records into the
+        scaled (n_rows, n_features) float64 matrix the model expects.
+        """
+        n_rows = len(data) if not isinstance(data, dict) else len(next(iter(data.values()), ()))
+        if out is None:
+            out = np.empty((n_rows, len(self.features)), dtype=np.float64)
+
+        # Category codes per one-hot column, computed once; unseen values get -1
+        codes = {}
+        for j, (kind, name, category) in enumerate(self.sources):
+            values = self._column(data, name)
+            if values is None:
+                out[:, j] = 0.0
+            elif kind == ONE_HOT:
+                if name not in codes:
+                    codes[name] = pd.Index(self.categories[name]).get_indexer(values)
+                out[:, j] = codes[name] == self.categories[name].index(category)
+            elif kind == IP and values.dtype == object:
+                out[:, j] = ip_to_int_array(values)
+            else:
+                out[:, j] = self._as_float(values)
+
+        out -= self.mean
+        out /= self.scale
+        return out
+
+
+def load_preprocessor(path=PREPROCESSOR_PATH):
+    return FrozenPreprocessor.load(path)
+
+
+if __name__ == "__main__":
+    # Export the frozen preprocessor from a training CSV:
+    #   python preprocessor.py <training.csv> [features_file] [output_path]
+    # To pair it with an already trained model, write it to
+    # model_registry.preprocessor_path_for(<model path>).
+    import sys
+    from utils import load_data, engineer_features, preprocess_data
+
+    if len(sys.argv) < 2:
+        print("Usage: python preprocessor.py <training.csv> [features_file] [output_path]")
+        exit(1)
+
+    csv_path = sys.argv[1]
+    features_file = sys.argv[2] if len(sys.argv) > 2 else "models/top25_features.txt"
+    output_path = sys.argv[3] if len(sys.argv) > 3 else PREPROCESSOR_PATH
+
+    df = engineer_features(load_data(csv_path))
+    preprocess_data(df, selected_features_file=features_file, preprocessor_path=output_path)
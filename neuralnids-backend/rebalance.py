@@ -0,0 +1,186 @@
+"""
+Class rebalancing for training under an explicit memory budget.
+
+SMOTE over the whole training matrix (what train_model used to do) fits a
+k-NN index on the minority class and materializes a fully balanced copy of
+the data; on large training sets that copy is what runs out of memory.
+rebalance() offers cheaper modes and keeps its extra memory within
+REBALANCE_MEMORY_MB:
+
+    smote          SMOTE on everything (the previous behaviour)
+    chunked_smote  SMOTE per stratified chunk, written into one preallocated
+                   output; the majority is undersampled first when a
+                   balanced copy would not fit the budget
+    undersample    every minority row plus a random sample of the majority,
+                   gathered by index, so a memory-mapped matrix (see
+                   training_data.py) is never read in full
+    weights        no resampling at all; the model gets
+                   scale_pos_weight = negatives / positives instead
+    auto           smote when its estimated footprint fits the budget,
+                   chunked_smote otherwise
+
+Labels are expected to be binary (0 = normal, 1 = attack), as everywhere
+else in the pipeline.
+"""
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+REBALANCE_MODE = os.getenv("TRAINING_REBALANCE", "auto")
+REBALANCE_MEMORY_MB = float(os.getenv("TRAINING_REBALANCE_MEMORY_MB", "2048"))
+MODES = ("auto", "smote", "chunked_smote", "undersample", "weights")
+SMOTE_NEIGHBORS = 5
+# Majority rows kept per minority row by undersample
+UNDERSAMPLE_RATIO = 1.0
+# Share of the budget chunked_smote spends on its output; the rest is per-chunk working memory
+OUTPUT_SHARE = 0.75
+
+
+def class_counts(y):
+    # (minority class, its count, majority class, its count)
+    classes, counts = np.unique(np.asarray(y), return_counts=True)
+    if len(classes) != 2:
+        raise ValueError(f"rebalancing needs exactly two classes, got {list(classes)}")
+    lo, hi = np.argmin(counts), np.argmax(counts)
+    return classes[lo], int(counts[lo]), classes[hi], int(counts[hi])
+
+
+def smote_footprint(n_rows, n_features, n_min, n_maj, itemsize=8, k=SMOTE_NEIGHBORS):
+    """
+    Rough peak extra bytes of SMOTE on the whole matrix: a validated copy of
+    the input, the balanced output, the synthetic rows and their
+    interpolation temporaries (all in the input dtype), and the minority
+    k-NN results.
+    """
+    synthetic = n_maj - n_min
+    return (n_rows + 2 * n_maj + 2 * synthetic) * n_features * itemsize + n_min * (k + 1) * 16
+
+
+def _take(X, idx):
+    # Rows by index in file order (sequential reads on a memory map)
+    return X[np.sort(idx)] if len(idx) else X[:0]
+
+
+def weights(X, y):
+    minority, n_min, _, n_maj = class_counts(y)
+    if minority != 1:
+        # Attacks outnumber normal traffic: weighting positives up would make it worse
+        return X, y, 1.0
+    return X, y, n_maj / n_min
+
+
+def smote(X, y, k=SMOTE_NEIGHBORS, seed=42):
+    from imblearn.over_sampling import SMOTE
+
+    X, y = SMOTE(k_neighbors=k, random_state=seed).fit_resample(X, y)
+    return X, y, 1.0
+
+
+def undersample(X, y, budget_bytes, ratio=UNDERSAMPLE_RATIO, seed=42):
+    """
+    All minority rows and `ratio` majority rows per minority row, both cut
+    down proportionally if that many rows would not fit in budget_bytes.
+    """
+    rng = np.random.default_rng(seed)
+    minority, n_min, majority, n_maj = class_counts(y)
+    max_rows = max(2, int(budget_bytes // (X.shape[1] * X.dtype.itemsize)))
+    keep_min = min(n_min, int(max_rows / (1 + ratio)))
+    if keep_min < n_min:
+        print(f"[!] Memory budget holds {max_rows:,} rows; sampling {keep_min:,} of {n_min:,} minority rows too")
+    keep_maj = min(n_maj, max(1, int(keep_min * ratio)))
+
+    min_idx = np.flatnonzero(y == minority)
+    maj_idx = np.flatnonzero(y == majority)
+    if keep_min < n_min:
+        min_idx = rng.choice(min_idx, keep_min, replace=False)
+    if keep_maj < n_maj:
+        maj_idx = rng.choice(maj_idx, keep_maj, replace=False)
+    idx = np.sort(np.concatenate([min_idx, maj_idx]))
+    return X[idx], y[idx], 1.0
+
+
+def chunked_smote(X, y, budget_bytes, k=SMOTE_NEIGHBORS, seed=42):
+    """
+    SMOTE on stratified chunks: the majority rows to keep and the minority
+    rows are shuffled and split into the same number of chunks, and each
+    chunk is balanced on its own, so the k-NN index and temporaries only
+    ever cover one chunk. Results go straight into a preallocated output
+    sized to the budget.
+    """
+    from imblearn.over_sampling import SMOTE
+
+    rng = np.random.default_rng(seed)
+    minority, n_min, majority, n_maj = class_counts(y)
+    n_features = X.shape[1]
+    row_bytes = n_features * X.dtype.itemsize
+    per_class = min(n_maj, int(budget_bytes * OUTPUT_SHARE // (2 * row_bytes)))
+    if n_min >= per_class or n_min <= 1:
+        # Nothing to synthesize within the budget (or nothing to interpolate between)
+        return undersample(X, y, budget_bytes * OUTPUT_SHARE, seed=seed)
+    k = min(k, n_min - 1)
+    if per_class < n_maj:
+        print(f"[!] Memory budget holds {2 * per_class:,} balanced rows; undersampling the majority first")
+
+    # Chunk size from the working share of the budget; SMOTE holds about eight
+    # float64 row-sized buffers per chunk row (validated copy, neighbours, steps, output)
+    work_rows = max(4 * (k + 1), int(budget_bytes * (1 - OUTPUT_SHARE) // (n_features * 8 * 8)))
+    chunks = max(1, min(math.ceil(2 * per_class / work_rows), n_min // (k + 1)))
+
+    maj_idx = np.flatnonzero(y == majority)
+    maj_idx = rng.choice(maj_idx, per_class, replace=False) if per_class < n_maj else rng.permutation(maj_idx)
+    min_idx = rng.permutation(np.flatnonzero(y == minority))
+    maj_parts, min_parts = np.array_split(maj_idx, chunks), np.array_split(min_idx, chunks)
+
+    total = sum(len(a) + max(len(a), len(b)) for a, b in zip(maj_parts, min_parts))
+    X_out = np.empty((total, n_features), dtype=X.dtype)
+    y_out = np.empty(total, dtype=y.dtype)
+    pos = 0
+    for i, (maj_part, min_part) in enumerate(zip(maj_parts, min_parts)):
+        idx = np.concatenate([maj_part, min_part])
+        X_chunk, y_chunk = _take(X, idx), y[np.sort(idx)]
+        if len(min_part) < len(maj_part):
+            sampler = SMOTE(sampling_strategy={minority: len(maj_part)}, k_neighbors=min(k, len(min_part) - 1),
+                            random_state=seed + i)
+            X_chunk, y_chunk = sampler.fit_resample(X_chunk, y_chunk)
+        X_out[pos:pos + len(y_chunk)] = X_chunk
+        y_out[pos:pos + len(y_chunk)] = y_chunk
+        pos += len(y_chunk)
+    return X_out[:pos], y_out[:pos], 1.0
+
+
+def rebalance(X, y, mode=REBALANCE_MODE, memory_mb=REBALANCE_MEMORY_MB, seed=42):
+    """
+    (X, y, scale_pos_weight) rebalanced with `mode`, using at most about
+    memory_mb of extra memory. DataFrame/Series inputs come back as
+    DataFrame/Series with the same columns and name.
+    """
+    if mode not in MODES:
+        raise ValueError(f"unknown rebalance mode '{mode}' (expected one of {', '.join(MODES)})")
+    columns = X.columns if isinstance(X, pd.DataFrame) else None
+    name = getattr(y, "name", None)
+    values = X.to_numpy() if columns is not None else np.asarray(X)
+    labels = np.asarray(y)
+    budget = memory_mb * 1024 * 1024
+
+    if mode == "auto":
+        _, n_min, _, n_maj = class_counts(labels)
+        needed = smote_footprint(len(labels), values.shape[1], n_min, n_maj, values.dtype.itemsize)
+        mode = "smote" if needed <= budget else "chunked_smote"
+        print(f"[+] SMOTE would need ~{needed / 2**20:,.0f} MB of {memory_mb:,.0f} MB; using {mode}")
+
+    if mode == "smote":
+        values, labels, scale_pos_weight = smote(values, labels, seed=seed)
+    elif mode == "chunked_smote":
+        values, labels, scale_pos_weight = chunked_smote(values, labels, budget, seed=seed)
+    elif mode == "undersample":
+        values, labels, scale_pos_weight = undersample(values, labels, budget, seed=seed)
+    else:
+        values, labels, scale_pos_weight = weights(values, labels)
+
+    if columns is not None:
+        values = pd.DataFrame(values, columns=columns, copy=False)
+        labels = pd.Series(labels, name=name)
+    print(f"[+] Rebalanced with {mode}: {len(labels):,} rows, scale_pos_weight={scale_pos_weight:.2f}")
+    return values, labels, scale_pos_weight
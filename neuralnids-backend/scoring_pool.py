@@ -0,0 +1,207 @@
+import multiprocessing as mp
+import os
+import queue
+import zlib
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+# Worker processes for ML scoring; 0 scores in the watcher process itself
+ML_WORKERS = int(os.getenv("ML_WORKERS", "0"))
+# Batches each worker can have in flight (being filled, scored or written)
+SLOTS_PER_WORKER = 4
+# Seconds to wait for a free slot before checking the workers are still alive
+ACQUIRE_TIMEOUT = 1.0
+
+# Result row columns in shared memory
+PROBABILITY, PREDICTION = 0, 1
+
+
+def shard_of(event, workers):
+    """Worker index for an event: by flow_id, or by source IP when there is none."""
+    key = event.get("flow_id")
+    if isinstance(key, int):
+        return key % workers
+    key = key or event.get("src_ip") or ""
+    # crc32 rather than hash(): str hashes are salted per process
+    return zlib.crc32(str(key).encode()) % workers
+
+
+class SharedBatches:
+    """
+    One worker's batch slots in a single shared-memory block:
+    features[slot, row, column] written by the router and
+    results[slot, row] = (probability, prediction) written by the worker.
+    """
+
+    def __init__(self, slots, batch_size, n_features, name=None):
+        features_shape = (slots, batch_size, n_features)
+        results_shape = (slots, batch_size, 2)
+        features_bytes = int(np.prod(features_shape)) * 8
+        if name is None:
+            size = features_bytes + int(np.prod(results_shape)) * 8
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+        self.features = np.ndarray(features_shape, dtype=np.float64, buffer=self.shm.buf)
+        self.results = np.ndarray(results_shape, dtype=np.float64, buffer=self.shm.buf, offset=features_bytes)
+
+    def close(self, unlink=False):
+        # The array views must go before the mapping can be closed
+        self.features = self.results = None
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+def _worker_main(index, shm_name, slots, batch_size, features, tasks, done, registry_kwargs):
+    # Runs in a spawned process: score each (slot, n) batch and report it back
+    from ml_predictor import predict_batch
+    from model_registry import configure_registry, get_registry
+
+    if registry_kwargs:
+        configure_registry(**registry_kwargs)
+    get_registry().get()
+    buffers = SharedBatches(slots, batch_size, len(features), shm_name)
+    print(f"[+] Scoring worker {index} ready (pid {os.getpid()})")
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            slot, n = task
+            df = pd.DataFrame(buffers.features[slot, :n], columns=features)
+            out = buffers.results[slot, :n]
+            out[:, PREDICTION] = -1
+            for i, result in enumerate(predict_batch(df)):
+                if "Probability" in result:
+                    out[i] = (result["Probability"], result["Prediction"])
+            done.put((index, slot, n))
+    finally:
+        buffers.close()
+
+
+class ScoringPool:
+    """
+    ML scoring spread over worker processes.
+
+    The router (the watcher process) keeps the flow de-duplication set and the
+    ct_* connection window, because both are defined over the whole event
+    stream, and writes each batch's feature rows straight into a slot of a
+    worker's shared-memory block. Only (slot, n) tuples cross the process
+    boundary; workers read the rows, run predict_batch with their own
+    resident model, and write probabilities back into the same slot.
+
+    Events are sharded by flow_id, so every alert of a flow goes to the same
+    worker, whose queue is FIFO. Results come back through one queue to a
+    single writer callback in the router, so output stays ordered per flow
+    and the store has one writer.
+    """
+
+    def __init__(self, features, workers=ML_WORKERS, batch_size=256, slots=SLOTS_PER_WORKER,
+                 registry_kwargs=None):
+        self.features = list(features)
+        self.workers = max(1, workers)
+        self.batch_size = batch_size
+        self.slots = slots
+        self.registry_kwargs = registry_kwargs
+        self._context = mp.get_context("spawn")
+        self._done = self._context.Queue()
+        self._buffers = []
+        self._tasks = []
+        self._free = []
+        self._inflight = {}
+        self._processes = []
+        self.batches = 0
+        self.scored = 0
+
+    def start(self):
+        for index in range(self.workers):
+            buffers = SharedBatches(self.slots, self.batch_size, len(self.features))
+            tasks = self._context.Queue()
+            process = self._context.Process(
+                target=_worker_main,
+                args=(index, buffers.name, self.slots, self.batch_size, self.features,
+                      tasks, self._done, self.registry_kwargs),
+                name=f"ml-scorer-{index}",
+                daemon=True,
+            )
+            process.start()
+            self._buffers.append(buffers)
+            self._tasks.append(tasks)
+            self._free.append(list(range(self.slots)))
+            self._processes.append(process)
+        return self
+
+    def shard(self, event):
+        return shard_of(event, self.workers)
+
+    def acquire(self, worker, on_result):
+        """
+        A free slot of `worker` and its (batch_size, n_features) feature view.
+        While the worker has no free slot, finished batches are handed to
+        on_result, which is what frees them.
+        """
+        while not self._free[worker]:
+            if not self.collect(on_result, timeout=ACQUIRE_TIMEOUT) and not self._processes[worker].is_alive():
+                raise RuntimeError(f"ML scoring worker {worker} exited "
+                                   f"(exit code {self._processes[worker].exitcode})")
+        slot = self._free[worker].pop()
+        return slot, self._buffers[worker].features[slot]
+
+    def submit(self, worker, slot, items):
+        # The first len(items) rows of the slot hold the items' features
+        self._inflight[(worker, slot)] = items
+        self._tasks[worker].put((slot, len(items)))
+        self.batches += 1
+
+    def collect(self, on_result, timeout=0):
+        """
+        Hand finished batches to on_result(items, results), where results
+        follows predict_batch's result dicts. Returns how many were handed over.
+        """
+        handled = 0
+        while True:
+            try:
+                if timeout and not handled:
+                    worker, slot, n = self._done.get(timeout=timeout)
+                else:
+                    worker, slot, n = self._done.get_nowait()
+            except queue.Empty:
+                return handled
+            rows = self._buffers[worker].results[slot, :n].copy()
+            items = self._inflight.pop((worker, slot))
+            self._free[worker].append(slot)
+            results = []
+            for probability, prediction in rows:
+                if prediction < 0:
+                    results.append({"Label": "Error", "Error": "scoring worker failed"})
+                else:
+                    results.append({
+                        "Probability": float(probability),
+                        "Prediction": int(prediction),
+                        "Label": "ATTACK" if prediction == 1 else "NORMAL",
+                    })
+            self.scored += n
+            handled += 1
+            on_result(items, results)
+
+    def pending(self):
+        return len(self._inflight)
+
+    def close(self, on_result=None, timeout=10.0):
+        # Let in-flight batches finish, stop the workers and release the shared memory
+        while self._inflight and on_result is not None:
+            if not self.collect(on_result, timeout=timeout):
+                break
+        for tasks in self._tasks:
+            tasks.put(None)
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        for buffers in self._buffers:
+            buffers.close(unlink=True)
+        self._buffers = []
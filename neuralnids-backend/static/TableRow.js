@@ -1,10 +1,11 @@
 /**
- * Represents a table row that contains a signature, alerts, and expandable details.
+ * Represents a table row for one signature's alert aggregate, with expandable
+ * details (top source IPs and a sample of the alerts).
  */
 export class TableRow {
-    constructor(signature, alerts) {
+    constructor(signature, aggregate) {
         this.signature = signature;
-        this.alerts = alerts;
+        this.aggregate = aggregate;
         this.subRows = [];
         this.expanded = false;
         this.subTable = document.createElement("table");
@@ -12,15 +13,20 @@ export class TableRow {
 
     render(table) {
         const row = document.createElement("tr");
-        row.innerHTML = `<td>${this.signature}</td><td>${this.alerts.length}</td>`;
+        row.innerHTML = `<td>${this.signature}</td><td>${this.aggregate.count}</td>`;
+
+        const sources = this.aggregate.top_src_ips.map(([ip, count]) => `${ip} (${count})`).join(", ");
+        let summary = this.subTable.insertRow();
+        summary.innerHTML = `<td colspan="3">Top sources: ${sources}<br>` +
+            `${formatTimestamp(this.aggregate.first_seen)} – ${formatTimestamp(this.aggregate.last_seen)}</td>`;
 
         let header = this.subTable.insertRow();
         header.innerHTML = `<th>Timestamp</th><th>IP Address</th><th>Severity</th>`;
 
 
-        this.alerts.forEach((alert) => {
+        this.aggregate.samples.forEach((alert) => {
             const subRow = document.createElement("tr");
-            subRow.innerHTML = `<td>${formatTimestamp(alert["timestamp"])}</td><td>${alert["src_ip"]}</td><td>${alert["alert"]["severity"]}</td>`;
+            subRow.innerHTML = `<td>${formatTimestamp(alert["timestamp"])}</td><td>${alert["src_ip"]}</td><td>${alert["severity"]}</td>`;
             this.subTable.appendChild(subRow);
         });
 
@@ -4,7 +4,6 @@ import { TableRow } from "./TableRow.js";
 let isDarkMode = false;
 let chart;
 let map;
-let mapMarkers = [];
 let alertActive = false;
 
 const BASE_URL = "http://10.10.10.100:5000"; // Change this when you need to change all URLs
@@ -12,67 +11,71 @@ const socket = io(BASE_URL);
 let alertCount = 0, critical = 0, warning = 0;
 let protocolCounts = {};
 
-let previousMLTimestamps = new Set();  // Keep track of unique timestamps
+let mlAlerts = [];                 // Most recent ML verdicts, oldest first
+let seenMLIds = new Set();        // Store row ids already shown
+let markersByIp = {};             // ip -> { marker, count }
 
 /**
- * Fetches machine learning alerts from a remote API, processes the data to filter out previously seen alerts,
- * and updates the corresponding table in the DOM with the latest alerts.
- * The table is cleared and updated to display only the 10 most recent alerts.
- * If no new alerts are found, a message is displayed in the table.
+ * Adds ML verdicts to the dashboard, skipping any that are already shown,
+ * and re-renders the ML alert table with the 10 most recent verdicts.
+ * Used both for the initial REST snapshot and for verdicts pushed over Socket.IO.
  *
- * @return {Promise<void>} A promise that resolves when the alerts have been fetched, processed, and rendered in the DOM.
- * The function logs errors to the console if the fetch operation fails or if issues occur during processing.
+ * @param {Array<Object>} alerts - ML verdicts ({ id, timestamp, label, confidence, ... }), oldest first.
+ * @return {void}
  */
-async function fetchMLAlerts() {
-    try {
-        const res = await fetch(`${BASE_URL}/api/live-alerts`);
-        const alerts = await res.json();
-
-        const mlTable = document.getElementById("ml-alert-table");
-        if (!mlTable) {
-            console.warn("Could not find #ml-alert-table");
+function addMLAlerts(alerts) {
+    alerts.forEach(entry => {
+        if (seenMLIds.has(entry.id)) {
             return;
         }
+        seenMLIds.add(entry.id);
+        mlAlerts.push(entry);
+    });
+    mlAlerts = mlAlerts.slice(-10);
+    seenMLIds = new Set(mlAlerts.map(entry => entry.id));
 
-        // Filter out previously seen alerts (by timestamp + confidence)
-        const newAlerts = alerts.filter(entry => {
-            const uniqueKey = `${entry.timestamp}_${entry.confidence}`;
-            if (previousMLTimestamps.has(uniqueKey)) {
-                return false;
-            } else {
-                previousMLTimestamps.add(uniqueKey);
-                return true;
-            }
-        });
-
-        // Only show last 10 alerts (clear and re-render)
-        const last10 = Array.from(previousMLTimestamps).slice(-10).reverse();
-        mlTable.innerHTML = "";
+    const mlTable = document.getElementById("ml-alert-table");
+    if (!mlTable) {
+        console.warn("Could not find #ml-alert-table");
+        return;
+    }
+    mlTable.innerHTML = "";
 
-        if (last10.length === 0) {
-            const row = document.createElement("tr");
-            row.innerHTML = `<td colspan="3">No new ML alerts detected yet.</td>`;
-            mlTable.appendChild(row);
-            return;
-        }
+    if (mlAlerts.length === 0) {
+        const row = document.createElement("tr");
+        row.innerHTML = `<td colspan="3">No new ML alerts detected yet.</td>`;
+        mlTable.appendChild(row);
+        return;
+    }
 
-        last10.forEach(key => {
-            const [timestamp, confidence] = key.split("_");
-            const row = document.createElement("tr");
-            const formattedTime = new Date(timestamp).toLocaleString(undefined, {
-                year: "numeric", month: "2-digit", day: "2-digit",
-                hour: "2-digit", minute: "2-digit", second: "2-digit",
-                hour12: false
-            });
-
-            row.innerHTML = `
-                <td>${formattedTime}</td>
-                <td>ATTACK</td>
-                <td>${parseFloat(confidence).toFixed(4)}</td>
-            `;
-            mlTable.appendChild(row);
+    mlAlerts.slice().reverse().forEach(entry => {
+        const row = document.createElement("tr");
+        const formattedTime = new Date(entry.timestamp).toLocaleString(undefined, {
+            year: "numeric", month: "2-digit", day: "2-digit",
+            hour: "2-digit", minute: "2-digit", second: "2-digit",
+            hour12: false
         });
 
+        row.innerHTML = `
+            <td>${formattedTime}</td>
+            <td>${entry.label}</td>
+            <td>${parseFloat(entry.confidence).toFixed(4)}</td>
+        `;
+        mlTable.appendChild(row);
+    });
+}
+
+/**
+ * Fetches the current ML verdicts from the REST API once, as the starting
+ * snapshot. Later verdicts arrive through the 'ml_verdicts' Socket.IO event.
+ *
+ * @return {Promise<void>} A promise that resolves when the alerts have been fetched and rendered.
+ * The function logs errors to the console if the fetch operation fails.
+ */
+async function fetchMLAlerts() {
+    try {
+        const res = await fetch(`${BASE_URL}/api/ml_alerts?limit=10`);
+        addMLAlerts(await res.json());
     } catch (err) {
         console.error("[x] Error fetching ML alerts:", err);
     }
@@ -162,10 +165,38 @@ async function fetchDashboardData() {
     window.scrollTo({ top: scrollY });      // Restore scroll position
 }
 
+/**
+ * Sets the hit count of a location's marker, adding the marker if it is new
+ * and removing it when the count drops to 0.
+ *
+ * @param {Object} loc - { ip, lat, lng, count } where count is the IP's total over the recent alerts.
+ * @return {void}
+ */
+function setMarkerCount(loc) {
+    const existing = markersByIp[loc.ip];
+    if (loc.count <= 0) {
+        if (existing) {
+            map.removeLayer(existing.marker);
+            delete markersByIp[loc.ip];
+        }
+        return;
+    }
+    if (existing) {
+        existing.count = loc.count;
+        existing.marker.setPopupContent(`${loc.ip} (${existing.count} hits)`);
+        return;
+    }
+    const marker = L.circle([loc.lat, loc.lng], { radius: 40000 })
+        .addTo(map)
+        .bindPopup(`${loc.ip} (${loc.count} hits)`);
+    markersByIp[loc.ip] = { marker, count: loc.count };
+}
+
 /**
  * Loads and initializes the map view with markers based on location data retrieved from an API.
  * If the map has not been initialized, it creates the map, sets its view, and applies a tile layer.
- * It then clears existing markers, fetches location data, and adds new markers to the map.
+ * It then clears existing markers, fetches the location snapshot, and adds new markers to the map.
+ * Later count changes arrive through the 'geo_counts' Socket.IO event.
  *
  * @return {Promise<void>} A promise that resolves when the map and markers have been loaded completely.
  */
@@ -174,17 +205,12 @@ async function loadMap() {
         map = L.map('map').setView([20, 0], 2);
         L.tileLayer('https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png').addTo(map);
     }
-    mapMarkers.forEach(marker => map.removeLayer(marker));
-    mapMarkers = [];
+    Object.values(markersByIp).forEach(entry => map.removeLayer(entry.marker));
+    markersByIp = {};
 
     const geoRes = await fetch(`${BASE_URL}/api/locations`);
     const geoData = await geoRes.json();
-    geoData.forEach(loc => {
-        const marker = L.circle([loc.lat, loc.lng], { radius: 40000 })
-            .addTo(map)
-            .bindPopup(`${loc.ip} (${loc.count} hits)`);
-        mapMarkers.push(marker);
-    });
+    geoData.forEach(setMarkerCount);
 }
 
 /**
@@ -216,8 +242,8 @@ async function sendEmailAlert(alerts) {
  * - Logs a confirmation message to the console when the DOM is ready.
  * - Establishes a WebSocket connection and logs its status.
  * - Initializes data structures for protocol counting.
- * - Loads the initial map view and machine learning alerts.
- * - Sets recurring intervals to refresh the map and ML alerts every 5 seconds.
+ * - Loads the map and machine learning alert snapshots on every (re)connect;
+ *   after that both are kept current by Socket.IO pushes instead of polling.
  * - Sets a recurring interval to automatically clear active alerts every 5 seconds if applicable.
  *
  * @return {void} This function runs automatically after the DOM is ready and performs initialization side effects.
@@ -233,16 +259,13 @@ document.addEventListener("DOMContentLoaded", () => {
 
     socket.on('connect', () => {
         console.log("✅ Connected to WebSocket server.");
+        // Resync from REST in case pushes were missed while disconnected
+        loadMap();
+        fetchMLAlerts();
     });
 
     protocolCounts = {};
 
-    loadMap();
-    fetchMLAlerts();
-
-    setInterval(loadMap, 5000);
-    setInterval(fetchMLAlerts, 5000);
-
     setInterval(() => {
         if (alertActive) {
             alertActive = false;
@@ -253,45 +276,42 @@ document.addEventListener("DOMContentLoaded", () => {
 
 /**
  * Handles incoming alert batches received via a WebSocket event ('alert_batch').
- * This function:
- * - Parses the incoming JSON batch of alerts.
+ * The server coalesces alerts per signature over a short window, so a batch
+ * carries aggregates rather than raw EVE events. This function:
+ * - Parses the incoming JSON batch.
  * - Invokes a UI alert notification to inform the user of new threats.
- * - Iterates over each alert key and its associated alerts:
- *    - Creates and appends a new table row for the alerts.
+ * - For each signature aggregate:
+ *    - Creates and appends a new table row (count, top sources and sample alerts).
  *    - Updates global counters for total alerts, critical alerts, and warnings.
  *    - Updates the protocol count histogram.
  * - Updates the dashboard's alert counters displayed in the UI.
  * - Regenerates the protocol pie chart to reflect updated protocol counts.
- * - Logs the parsed alert batch and individual alerts to the console for debugging.
  *
- * @param {string} batch - A JSON string representing a batch of alerts grouped by a key (e.g., timestamp or source IP).
+ * @param {string} batch - A JSON string: {total, signatures: {signature: {count, critical,
+ *     first_seen, last_seen, severity, top_src_ips, protocols, samples}}}.
  * @return {void} This function updates the DOM and internal state in response to receiving new alerts.
  */
 socket.on('alert_batch', (batch) => {
     const table = document.getElementById("threat-table");
     let parsedBatch = JSON.parse(batch);
-    if (Object.keys(parsedBatch).length > 0) {
+    const signatures = parsedBatch.signatures || {};
+    if (Object.keys(signatures).length > 0) {
         invokeAlert();
         alertActive = true;
-        for (const key in parsedBatch) {
-            let individualAlerts = parsedBatch[key];
-            //sendEmailAlert(individualAlerts);
+        for (const signature in signatures) {
+            const aggregate = signatures[signature];
+            //sendEmailAlert(aggregate.samples);
 
-            let newRow = new TableRow(key, individualAlerts);
+            let newRow = new TableRow(signature, aggregate);
             let renderedRow = newRow.render(table);
             table.appendChild(renderedRow);
 
-            individualAlerts.forEach(alert => {
-                console.log(alert);
-                alertCount++;
-                if (alert["alert"]["severity"] <= 2) {
-                    critical++;
-                } else {
-                    warning++;
-                }
-                const proto = alert["app_proto"] || 'Unknown';
-                protocolCounts[proto] = (protocolCounts[proto] || 0) + 1;
-            });
+            alertCount += aggregate.count;
+            critical += aggregate.critical;
+            warning += aggregate.count - aggregate.critical;
+            for (const proto in aggregate.protocols) {
+                protocolCounts[proto] = (protocolCounts[proto] || 0) + aggregate.protocols[proto];
+            }
         }
 
         document.getElementById("alert-count").innerText = alertCount;
@@ -332,3 +352,28 @@ socket.on('alert_batch', (batch) => {
         console.log(batch);
     }
 });
+
+/**
+ * Handles ML verdicts pushed by the server ('ml_verdicts') as they are stored.
+ *
+ * @param {Array<Object>} verdicts - New ML verdicts, oldest first.
+ * @return {void}
+ */
+socket.on('ml_verdicts', (verdicts) => {
+    addMLAlerts(verdicts);
+});
+
+/**
+ * Handles GeoIP count changes pushed by the server ('geo_counts'). Each entry
+ * carries an IP's absolute hit count over the same recent alerts
+ * /api/locations covers; 0 means the IP left that window.
+ *
+ * @param {Array<Object>} changes - [{ ip, lat, lng, city, count }].
+ * @return {void}
+ */
+socket.on('geo_counts', (changes) => {
+    if (!map) {
+        return;
+    }
+    changes.forEach(setMarkerCount);
+});
@@ -1,5 +1,6 @@
 import pandas as pd
 import numpy as np
+from datetime import datetime
 
 # Map Suricata fields to UNSW-NB15 top 25 features
 # Use None or a lambda for derived or unavailable fields
@@ -15,6 +16,9 @@ SURICATA_TO_UNSW_MAPPING = {
     # The rest will be filled in with 0s or left as NaN to handle
 }
 
+# Features computed from the flow counters, duration and endpoints (see _derive)
+DERIVED_FEATURES = ("dur", "rate", "sload", "dload", "smean", "dmean", "sinpkt", "dinpkt", "is_sm_ips_ports")
+
 # Load top features file
 TOP_FEATURES_FILE = "models/top25_features.txt"
 
@@ -36,25 +40,138 @@ def flatten_suricata_alert(alert):
     return flat
 
 
-def build_feature_vector(suricata_event):
-    flat_event = flatten_suricata_alert(suricata_event)
+def _parse_time(value):
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def flow_duration(event):
+    # Seconds between flow.start and flow.end (flow events), else flow.age, else 0
+    flow = event.get("flow") or {}
+    if "duration" in flow:
+        return flow["duration"]
+    start, end = _parse_time(flow.get("start")), _parse_time(flow.get("end"))
+    if start is not None and end is not None:
+        return max(end - start, 0.0)
+    return flow.get("age", 0)
+
+
+def _get_path(event, path):
+    value = event
+    for key in path:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+class CompiledFeatureMapper:
+    """
+    The Suricata -> UNSW mapping, resolved once for a fixed feature order.
+
+    Each output column becomes a key path into the event dict (e.g.
+    ("flow", "bytes_toserver")), a derived flow statistic, or a top-level
+    key of the same name. transform() walks those paths for a whole batch,
+    writing straight into a preallocated float matrix, then computes the
+    derived columns with array arithmetic over the batch.
+    """
+
+    # Counters the derived features are computed from
+    _BASE = {
+        "spkts": ("flow", "pkts_toserver"),
+        "dpkts": ("flow", "pkts_toclient"),
+        "sbytes": ("flow", "bytes_toserver"),
+        "dbytes": ("flow", "bytes_toclient"),
+    }
+
+    def __init__(self, features, mapping=SURICATA_TO_UNSW_MAPPING):
+        self.features = list(features)
+        reverse = {feature: tuple(path.split(".")) for path, feature in mapping.items()}
+        self._direct = []   # (column, path) read straight from the event
+        self._derived = []  # (column, feature) computed in _derive
+        for column, feature in enumerate(self.features):
+            if feature in DERIVED_FEATURES:
+                self._derived.append((column, feature))
+            elif feature in reverse:
+                self._direct.append((column, reverse[feature]))
+            else:
+                self._direct.append((column, (feature,)))
+
+    def _derive(self, events, out):
+        n = len(events)
+        base = {name: np.zeros(n) for name in self._BASE}
+        dur = np.zeros(n)
+        same_endpoints = np.zeros(n, dtype=bool)
+        for i, event in enumerate(events):
+            for name, path in self._BASE.items():
+                value = _get_path(event, path)
+                if value is not None:
+                    base[name][i] = value
+            dur[i] = flow_duration(event) or 0.0
+            same_endpoints[i] = (event.get("src_ip") is not None
+                                 and event.get("src_ip") == event.get("dest_ip")
+                                 and event.get("src_port") == event.get("dest_port"))
+
+        spkts, dpkts, sbytes, dbytes = base["spkts"], base["dpkts"], base["sbytes"], base["dbytes"]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            has_dur = dur > 0
+            values = {
+                "dur": dur,
+                "rate": np.where(has_dur, (spkts + dpkts) / dur, 0.0),
+                "sload": np.where(has_dur, sbytes * 8.0 / dur, 0.0),
+                "dload": np.where(has_dur, dbytes * 8.0 / dur, 0.0),
+                "smean": np.where(spkts > 0, sbytes / spkts, 0.0),
+                "dmean": np.where(dpkts > 0, dbytes / dpkts, 0.0),
+                # Milliseconds per inter-packet gap over the whole flow duration;
+                # flow_assembler uses the same definition
+                "sinpkt": np.where(spkts > 1, dur * 1000.0 / (spkts - 1), 0.0),
+                "dinpkt": np.where(dpkts > 1, dur * 1000.0 / (dpkts - 1), 0.0),
+                "is_sm_ips_ports": same_endpoints.astype(np.float64),
+            }
+        for column, feature in self._derived:
+            out[:, column] = values[feature]
+
+    def transform(self, events, out=None):
+        """Map a list of Suricata event dicts to an (n_events, n_features) float matrix."""
+        n = len(events)
+        if out is None:
+            out = np.zeros((n, len(self.features)), dtype=np.float64)
+        else:
+            out = out[:n]
+            out[:] = 0.0
+        for column, path in self._direct:
+            for i, event in enumerate(events):
+                value = _get_path(event, path)
+                if value is not None:
+                    try:
+                        out[i, column] = value
+                    except (TypeError, ValueError):
+                        pass  # non-numeric (e.g. proto strings) stays 0
+        if self._derived and n:
+            self._derive(events, out)
+        return out
 
-    feature_row = {}
-    top_features = load_top_features()
 
-    for feature in top_features:
-        matched = None
-        for key, mapped_feature in SURICATA_TO_UNSW_MAPPING.items():
-            if mapped_feature == feature:
-                matched = key
-                break
+_mapper = None
 
-        if matched and matched in flat_event:
-            feature_row[feature] = flat_event[matched]
-        else:
-            feature_row[feature] = 0.0  # default for missing/unavailable
 
-    return pd.DataFrame([feature_row])
+def get_mapper():
+    # Compiled once per process from the top features file
+    global _mapper
+    if _mapper is None:
+        _mapper = CompiledFeatureMapper(load_top_features())
+    return _mapper
+
+
+def build_feature_matrix(suricata_events):
+    return get_mapper().transform(suricata_events)
+
+
+def build_feature_vector(suricata_event):
+    mapper = get_mapper()
+    return pd.DataFrame(mapper.transform([suricata_event]), columns=mapper.features)
 
 
 # Example usage:
@@ -65,4 +182,4 @@ if __name__ == "__main__":
         alert = json.load(f)
 
     df = build_feature_vector(alert)
-    print(df.head())
\ No newline at end of file
+    print(df.head())
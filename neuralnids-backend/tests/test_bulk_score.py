@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+import ml_alert_watcher
+from bulk_score import select_alerts
+from flow_window import FEATURE_NAMES, ConnectionWindow
+
+
+class ListSubscription:
+    def __init__(self, events):
+        self.events = list(events)
+
+    def get(self, timeout=None):
+        if not self.events:
+            raise StopIteration
+        return self.events.pop(0)
+
+
+def alert_and_flow_events(n):
+    # Each connection logs an alert and, when it ends, its flow record
+    events = []
+    for i in range(n):
+        conn = {"flow_id": i, "src_ip": f"10.0.0.{i % 3}", "dest_ip": "192.168.0.9", "src_port": 40000 + i,
+                "dest_port": 80, "app_proto": "http", "flow": {"state": "closed"}}
+        events.append(dict(conn, event_type="alert", alert={"signature": "test"}))
+        events.append(dict(conn, event_type="flow"))
+    return events
+
+
+def bulk_counts(events):
+    lines = [json.dumps(e).encode() + b"\n" for e in events]
+    _, _, counts = select_alerts(lines, list(range(len(lines))), ConnectionWindow())
+    return counts
+
+
+def live_counts(events, monkeypatch):
+    scored = []
+    monkeypatch.setattr(ml_alert_watcher, "load_top_features", lambda path: FEATURE_NAMES)
+    monkeypatch.setattr(ml_alert_watcher, "get_registry", lambda: type("Registry", (), {"get": lambda self: None})())
+    monkeypatch.setattr(ml_alert_watcher, "score_and_log", lambda items, features, store: scored.extend(items))
+    with pytest.raises(StopIteration):
+        ml_alert_watcher.score_events(ListSubscription(events), batch_size=1, store=object(), workers=0)
+    return [counts for _, counts in scored]
+
+
+def test_bulk_and_live_scoring_give_alerts_the_same_window_counts(monkeypatch):
+    events = alert_and_flow_events(5)
+    bulk = bulk_counts(events)
+    assert bulk == live_counts(events, monkeypatch)
+    # Each connection is counted once, by its flow record
+    assert [row[FEATURE_NAMES.index("ct_dst_ltm")] for row in bulk] == [1, 2, 3, 4, 5]
@@ -0,0 +1,80 @@
+import json
+import os
+import queue
+
+from eve_tailer import EveTailer
+
+
+def line(event_type, n):
+    return (json.dumps({"event_type": event_type, "n": n}) + "\n").encode()
+
+
+def append(path, *lines):
+    with open(path, "ab") as f:
+        f.write(b"".join(lines))
+
+
+def drain(tailer, subscription, polls=3):
+    for _ in range(polls):
+        tailer.poll_once()
+    events = []
+    while True:
+        try:
+            events.append(subscription.get(timeout=0))
+        except queue.Empty:
+            return [event["n"] for event in events]
+
+
+def test_filters_event_types_and_waits_for_partial_lines(tmp_path):
+    path = str(tmp_path / "eve.json")
+    append(path, line("alert", 1), line("flow", 2), line("dns", 3))
+    tailer = EveTailer(path, from_end=False)
+    alerts = tailer.subscribe("alerts", event_types=["alert"])
+    flows = tailer.subscribe("flows", event_types=["flow"], fields=["n"])
+    assert drain(tailer, alerts) == [1]
+    assert flows.get(timeout=0) == {"n": 2}
+    assert tailer.lines_skipped == 1
+
+    partial = line("alert", 4)
+    append(path, partial[:10])
+    assert drain(tailer, alerts) == []
+    append(path, partial[10:])
+    assert drain(tailer, alerts) == [4]
+
+
+def test_follows_logrotate_after_draining_the_old_file(tmp_path):
+    path = str(tmp_path / "eve.json")
+    append(path, line("alert", 1))
+    tailer = EveTailer(path, from_end=False)
+    alerts = tailer.subscribe("alerts", event_types=["alert"])
+    assert drain(tailer, alerts) == [1]
+
+    os.rename(path, path + ".1")
+    append(path + ".1", line("alert", 2))  # written by Suricata before it reopened its log
+    append(path, line("alert", 3), line("alert", 4))
+    assert drain(tailer, alerts) == [2, 3, 4]
+    assert tailer.rotations == 1
+
+
+def test_restarts_from_the_top_after_copytruncate(tmp_path):
+    path = str(tmp_path / "eve.json")
+    append(path, line("alert", 1), line("alert", 2), line("alert", 3))
+    tailer = EveTailer(path, from_end=False)
+    alerts = tailer.subscribe("alerts", event_types=["alert"])
+    assert drain(tailer, alerts) == [1, 2, 3]
+
+    with open(path, "r+b") as f:
+        f.truncate(0)
+    append(path, line("alert", 5))
+    assert drain(tailer, alerts) == [5]
+    assert tailer.truncations == 1
+    assert tailer.rotations == 0
+
+
+def test_slow_subscriber_drops_its_oldest_events(tmp_path):
+    path = str(tmp_path / "eve.json")
+    append(path, *(line("alert", n) for n in range(5)))
+    tailer = EveTailer(path, from_end=False)
+    small = tailer.subscribe("small", maxsize=2)
+    assert drain(tailer, small) == [3, 4]
+    assert small.dropped == 3
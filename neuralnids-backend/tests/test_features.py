@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+
+from flow_assembler import assemble_flows
+from suricata_feature_adapter import CompiledFeatureMapper
+from utils import engineer_features, preprocess_data
+
+
+def test_total_pkts_does_not_overflow_downcast_counts():
+    df = pd.DataFrame({"spkts": np.array([200, 255], np.uint8), "dpkts": np.array([100, 255], np.uint8)})
+    out = engineer_features(df)
+    assert out["total_pkts"].tolist() == [300, 510]
+    assert out["packet_ratio"].dtype == np.float64
+
+
+def test_scaler_statistics_are_fitted_in_float64():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame({"big": 1e9 + rng.random(1000) * 1e3, "small": rng.random(1000)})
+    scaled, _, _ = preprocess_data(X.copy(), for_training=False)
+    assert scaled.dtypes.unique().tolist() == [np.float32]
+    np.testing.assert_allclose(scaled.to_numpy(), StandardScaler().fit_transform(X.to_numpy()), atol=1e-5)
+
+
+def test_assembled_inter_packet_times_match_the_live_adapter():
+    # Client sends at 0, 1, 2 s; server answers at 0.5 and 4 s
+    sent = [(0.0, True), (0.5, False), (1.0, True), (2.0, True), (4.0, False)]
+    packets = pd.DataFrame({
+        "timestamp": [t for t, _ in sent],
+        "src_ip": [1 if fwd else 2 for _, fwd in sent], "dst_ip": [2 if fwd else 1 for _, fwd in sent],
+        "protocol": 17, "pkt_len": 100,
+        "sport": [5000 if fwd else 53 for _, fwd in sent], "dport": [53 if fwd else 5000 for _, fwd in sent],
+        "tcp_flags": 0, "ttl": 64,
+    })
+    flow = assemble_flows(packets).iloc[0]
+    event = {"flow": {"pkts_toserver": int(flow["spkts"]), "pkts_toclient": int(flow["dpkts"]),
+                      "duration": float(flow["dur"])}}
+    live = CompiledFeatureMapper(["sinpkt", "dinpkt"]).transform([event])[0]
+    np.testing.assert_allclose([flow["sinpkt"], flow["dinpkt"]], live)
+    np.testing.assert_allclose(live, [2000.0, 4000.0])
@@ -0,0 +1,48 @@
+from flow_dedup import FlowDeduper
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_duplicates_within_ttl_and_expiry_after_it():
+    clock = FakeClock()
+    dedup = FlowDeduper(max_flows=10, ttl=60, clock=clock)
+    assert not dedup.seen(1)
+    clock.now = 30
+    assert dedup.seen(1)
+    # The duplicate refreshed the TTL, so 1 is still remembered at 80
+    clock.now = 80
+    assert dedup.seen(1)
+    clock.now = 141
+    assert not dedup.seen(1)
+    assert dedup.expired == 1
+    assert (dedup.inserts, dedup.duplicates) == (2, 2)
+
+
+def test_expired_flows_are_dropped_from_memory():
+    clock = FakeClock()
+    dedup = FlowDeduper(max_flows=100, ttl=10, clock=clock)
+    for flow_id in range(50):
+        dedup.seen(flow_id)
+    clock.now = 11
+    dedup.seen(1000)
+    assert len(dedup) == 1
+
+
+def test_cap_evicts_the_least_recently_seen_flow():
+    clock = FakeClock()
+    dedup = FlowDeduper(max_flows=3, ttl=1000, clock=clock)
+    for flow_id in (1, 2, 3):
+        dedup.seen(flow_id)
+    dedup.seen(1)  # 1 is now the most recent; 2 is the oldest
+    dedup.seen(4)
+    assert len(dedup) == 3
+    assert dedup.evictions == 1
+    assert dedup.seen(1) and dedup.seen(3) and dedup.seen(4)
+    assert not dedup.seen(2)
+    assert dedup.stats()["occupancy"] == 1.0
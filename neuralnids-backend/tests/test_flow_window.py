@@ -0,0 +1,72 @@
+import json
+
+import numpy as np
+
+from flow_assembler import window_counts
+from flow_window import FEATURE_NAMES, WINDOW_FEATURES, ConnectionWindow, connection_from_event, event_window_counts
+
+
+def random_events(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return [{
+        "src_ip": f"10.0.0.{rng.integers(0, 6)}",
+        "dest_ip": f"192.168.0.{rng.integers(0, 4)}",
+        "src_port": int(rng.integers(1024, 1030)),
+        "dest_port": int(rng.choice([22, 80, 443])),
+        "app_proto": str(rng.choice(["http", "tls", "ssh"])),
+        "flow": {"state": str(rng.choice(["new", "established", "closed"]))},
+    } for _ in range(n)]
+
+
+def test_restored_window_continues_like_an_uninterrupted_one():
+    events = random_events(400)
+    uninterrupted = ConnectionWindow(size=50)
+    expected = [uninterrupted.update_event(e) for e in events]
+
+    first = ConnectionWindow(size=50)
+    counts = [first.update_event(e) for e in events[:170]]
+    # Through JSON, as bulk_score's checkpoint stores it
+    resumed = ConnectionWindow.restore(json.loads(json.dumps(first.state())))
+    counts += [resumed.update_event(e) for e in events[170:]]
+
+    assert counts == expected
+    assert resumed.updates == uninterrupted.updates
+    assert resumed.lookup(connection_from_event(events[0])) == uninterrupted.lookup(connection_from_event(events[0]))
+
+
+def test_state_of_a_partly_filled_window():
+    window = ConnectionWindow(size=10)
+    for event in random_events(3):
+        window.update_event(event)
+    restored = ConnectionWindow.restore(window.state())
+    assert len(restored) == 3
+    assert len(window.state()["keys"]) == 3
+
+
+def test_window_counts_matches_the_incremental_window():
+    # flow_assembler's sort/searchsorted pass and ConnectionWindow must agree row for row
+    events = random_events(1000, seed=1)
+    conns = [connection_from_event(e) for e in events]
+    window = ConnectionWindow(size=100)
+    incremental = np.array([window.update(conn) for conn in conns])
+
+    for j, name in enumerate(FEATURE_NAMES):
+        keys = [str(tuple(conn[i] for i in WINDOW_FEATURES[name])) for conn in conns]
+        codes = np.unique(keys, return_inverse=True)[1]
+        np.testing.assert_array_equal(window_counts(codes, 100), incremental[:, j], err_msg=name)
+
+
+def test_window_counts_edge_sizes():
+    codes = np.array([0, 0, 1, 0, 0])
+    assert window_counts(codes, 1).tolist() == [1, 1, 1, 1, 1]
+    assert window_counts(codes, 2).tolist() == [1, 2, 1, 1, 2]
+    assert window_counts(codes, 100).tolist() == [1, 2, 1, 3, 4]
+    assert window_counts(np.array([], dtype=np.int64)).tolist() == []
+
+
+def test_alerts_feed_the_window_only_without_flow_output():
+    alert, flow = ({"event_type": kind, "src_ip": "10.0.0.1", "dest_ip": "10.0.0.2"} for kind in ("alert", "flow"))
+    window = ConnectionWindow()
+    assert [event_window_counts(window, e)[0] for e in (alert, flow, alert, flow)] == [1, 1, 2, 2]
+    window = ConnectionWindow()
+    assert [event_window_counts(window, e, from_flows=False)[0] for e in (alert, flow, alert, flow)] == [1, 2, 2, 3]
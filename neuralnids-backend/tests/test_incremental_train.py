@@ -0,0 +1,84 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+from xgboost import XGBClassifier
+
+from bulk_score import select_alerts
+from flow_window import ConnectionWindow
+from incremental_train import (continue_training, fit_preprocessor, full_retrain, holdout_auc, model_input,
+                               publish_blocker, read_labeled_events, trees_of)
+
+BASE_TREES = 10
+
+
+def samples(rows, seed, shift=0.0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(rows, 4))
+    X[:, 0] += shift
+    y = (X[:, 0] + X[:, 1] > 0.5).astype(np.int8)
+    return pd.DataFrame(X, columns=["f0", "f1", "f2", "f3"]), y
+
+
+@pytest.fixture(scope="module")
+def deployed():
+    X, y = samples(2000, 0)
+    pre = fit_preprocessor(X, list(X.columns))
+    model = XGBClassifier(n_estimators=BASE_TREES, max_depth=3, tree_method="hist", random_state=0)
+    return model.fit(model_input(X, pre), y), pre
+
+
+def test_continue_training_adds_trees_to_the_deployed_booster(deployed):
+    base, pre = deployed
+    X, y = samples(500, 1, shift=0.5)
+    X_val, y_val = samples(300, 2, shift=0.5)
+    model = continue_training(base, pre, X, y, X_val, y_val, rounds=5, early_stopping_rounds=50)
+    assert model.get_booster().num_boosted_rounds() == BASE_TREES + 5
+    assert BASE_TREES < trees_of(model) <= BASE_TREES + 5
+    # The base model is left as it was
+    assert base.get_booster().num_boosted_rounds() == BASE_TREES
+
+
+def test_updates_require_a_preprocessor(deployed):
+    base, _ = deployed
+    X, y = samples(200, 3)
+    with pytest.raises(ValueError, match="preprocessor"):
+        continue_training(base, None, X, y, X, y, rounds=2)
+    with pytest.raises(ValueError, match="preprocessor"):
+        full_retrain(base, None, X, y, X, y, rounds=2)
+
+
+def test_full_retrain_fits_its_own_preprocessor(deployed):
+    base, pre = deployed
+    X, y = samples(1000, 4, shift=2.0)
+    model, new_pre = full_retrain(base, pre, X, y, X, y, rounds=3)
+    assert new_pre.features == pre.features
+    assert not np.allclose(new_pre.mean, pre.mean)
+    assert model.get_booster().num_boosted_rounds() <= 3
+
+
+def test_labeled_events_get_the_window_counts_bulk_scoring_gives(tmp_path):
+    events = []
+    for i in range(6):
+        conn = {"flow_id": i, "src_ip": "10.0.0.1", "dest_ip": "192.168.0.9", "src_port": 40000 + i,
+                "dest_port": 80, "flow": {"state": "closed"}}
+        events += [dict(conn, event_type="alert", label=i % 2), dict(conn, event_type="flow")]
+    lines = [json.dumps(e).encode() + b"\n" for e in events]
+    path = tmp_path / "eve.json"
+    path.write_bytes(b"".join(lines))
+
+    labeled, labels, counts = read_labeled_events(str(path))
+    assert [e["event_type"] for e in labeled] == ["alert"] * 6
+    assert labels == [0, 1, 0, 1, 0, 1]
+    assert counts == select_alerts(lines, list(range(len(lines))), ConnectionWindow())[2]
+
+
+def test_single_class_holdout_blocks_publishing(deployed):
+    base, pre = deployed
+    X, y = samples(200, 5)
+    auc = holdout_auc(base, model_input(X, pre), np.zeros_like(y))
+    assert np.isnan(auc)
+    assert "undefined" in publish_blocker(auc, auc)
+    assert "dropped" in publish_blocker(0.9, 0.8)
+    assert publish_blocker(0.9, 0.899) is None
@@ -0,0 +1,44 @@
+import pytest
+
+from live_push import location_counts, push_geo_counts
+
+
+class FakeLocator:
+    def lookup_many(self, ips):
+        return {ip: (1.0, 2.0, "City") for ip in ips if not ip.startswith("10.")}
+
+
+class FakeSocket:
+    def __init__(self, pushes):
+        self.pushes = pushes
+        self.emitted = []
+
+    def sleep(self, seconds):
+        if not self.pushes:
+            raise StopIteration
+        self.pushes -= 1
+
+    def emit(self, event, data):
+        self.emitted.append((event, data))
+
+
+def test_location_counts_skips_unlocated_ips():
+    alerts = [{"src_ip": "1.1.1.1"}, {"src_ip": "1.1.1.1"}, {"src_ip": "10.0.0.1"}, {}]
+    assert location_counts(alerts, FakeLocator()) == [
+        {"ip": "1.1.1.1", "lat": 1.0, "lng": 2.0, "city": "City", "count": 2}]
+
+
+def test_pushes_absolute_counts_over_the_same_window():
+    windows = iter([
+        [{"src_ip": "1.1.1.1"}, {"src_ip": "2.2.2.2"}],  # what the dashboard loaded
+        [{"src_ip": "1.1.1.1"}, {"src_ip": "2.2.2.2"}],  # unchanged: nothing pushed
+        [{"src_ip": "1.1.1.1"}, {"src_ip": "1.1.1.1"}],  # 2.2.2.2 fell out of the window
+    ])
+    socket = FakeSocket(pushes=2)
+    with pytest.raises(StopIteration):
+        push_geo_counts(socket, lambda: next(windows), FakeLocator())
+
+    assert len(socket.emitted) == 1
+    event, changes = socket.emitted[0]
+    assert event == "geo_counts"
+    assert {c["ip"]: c["count"] for c in changes} == {"1.1.1.1": 2, "2.2.2.2": 0}
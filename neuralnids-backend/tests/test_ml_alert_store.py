@@ -0,0 +1,30 @@
+import pytest
+
+import app as nids_app
+from ml_alert_store import MLAlertStore
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = MLAlertStore(str(tmp_path / "ml_alerts.db"))
+    store.append_many([{"timestamp": str(i), "label": "NORMAL", "confidence": 0.1, "ts": 1000.0 + i}
+                       for i in range(5)])
+    monkeypatch.setattr("ml_alert_store.MAX_QUERY_ROWS", 3)
+    yield store
+    store.close()
+
+
+def test_limits_are_clamped_to_a_positive_bound(store):
+    # SQLite treats a negative LIMIT as no limit at all
+    assert [row["timestamp"] for row in store.latest(-1)] == ["4"]
+    assert [row["timestamp"] for row in store.latest(0)] == ["4"]
+    assert len(store.latest(100)) == 3
+    assert len(store.between(None, None, -1)) == 1
+    assert len(store.since(0, -1)) == 1
+
+
+def test_ml_alerts_endpoint_clamps_negative_limits(store, monkeypatch):
+    monkeypatch.setattr(nids_app, "ml_alert_store", store)
+    client = nids_app.app.test_client()
+    assert len(client.get("/api/ml_alerts?limit=-1").get_json()) == 1
+    assert client.get("/api/ml_alerts?limit=abc").status_code == 400
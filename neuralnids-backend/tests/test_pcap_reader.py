@@ -0,0 +1,69 @@
+import dpkt
+import pandas as pd
+import pytest
+
+from flow_assembler import assemble_flows
+from pcap_reader import PcapStats, iter_pcap
+from utils import ip_to_int_array, load_data, parse_pcap
+
+
+def udp_frame(src, dst):
+    ip = dpkt.ip.IP(src=bytes(src), dst=bytes(dst), p=17, ttl=64, data=dpkt.udp.UDP(sport=1234, dport=53))
+    ip.len = len(ip)
+    return bytes(dpkt.ethernet.Ethernet(data=ip))
+
+
+def write_capture(path, kind, n=5, cut=0):
+    with open(path, "wb") as f:
+        writer = (dpkt.pcap.Writer if kind == "pcap" else dpkt.pcapng.Writer)(f)
+        for i in range(n):
+            writer.writepkt(udp_frame([10, 0, 0, 1 + i % 2], [192, 168, 1, 9]), ts=1000.0 + i)
+    if cut:
+        with open(path, "r+b") as f:
+            f.truncate(f.seek(0, 2) - cut)
+    return str(path)
+
+
+@pytest.mark.parametrize("kind", ["pcap", "pcapng"])
+def test_truncated_final_record_is_counted_as_malformed(tmp_path, kind):
+    path = write_capture(tmp_path / f"cut.{kind}", kind, n=5, cut=5)
+    stats = PcapStats()
+    rows = sum(len(chunk) for chunk in iter_pcap(path, stats=stats))
+    assert rows == 4
+    assert (stats.packets, stats.parsed, stats.malformed) == (5, 4, 1)
+
+
+def test_parse_pcap_keeps_dotted_quad_addresses(tmp_path):
+    path = write_capture(tmp_path / "small.pcap", "pcap", n=6)
+    df = parse_pcap(path, label=1)
+    assert df["src_ip"].astype(str).tolist()[:2] == ["10.0.0.1", "10.0.0.2"]
+    assert set(df["dst_ip"].astype(str)) == {"192.168.1.9"}
+    assert ip_to_int_array(df["dst_ip"]).tolist() == [3232235785] * 6
+
+
+def test_load_data_streams_chunks_into_flows(tmp_path):
+    path = write_capture(tmp_path / "flows.pcap", "pcap", n=6)
+    flows = load_data(path, label=1, flows=True)
+    assert len(flows) == 2
+    assert (flows["label"] == 1).all()
+
+
+def test_parse_pcap_output_assembles_into_flows(tmp_path):
+    path = write_capture(tmp_path / "e2e.pcap", "pcap", n=6)
+    from_chunks = load_data(path, label=1, flows=True)
+    flows = assemble_flows(parse_pcap(path, label=1))
+    assert len(flows) == 2
+    pd.testing.assert_frame_equal(flows, from_chunks)
+
+
+def test_corrupt_record_length_ends_the_capture(tmp_path):
+    path = write_capture(tmp_path / "corrupt.pcap", "pcap", n=5)
+    record = 16 + len(udp_frame([10, 0, 0, 1], [192, 168, 1, 9]))
+    with open(path, "r+b") as f:
+        # captured length of the third record
+        f.seek(24 + 2 * record + 8)
+        f.write((1 << 31).to_bytes(4, "little"))
+    stats = PcapStats()
+    rows = sum(len(chunk) for chunk in iter_pcap(path, stats=stats))
+    assert rows == 2
+    assert (stats.packets, stats.parsed, stats.malformed) == (3, 2, 1)
@@ -0,0 +1,111 @@
+import json
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import app as nids_app
+import ml_predictor
+
+
+def fake_predict_batch(df):
+    return [{"Probability": 0.9, "Prediction": 1, "Label": "ATTACK", "id": int(i)} for i in df["id"]]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(nids_app, "predict_batch", fake_predict_batch)
+    return nids_app.app.test_client()
+
+
+def ndjson_lines(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines() if line]
+
+
+def test_single_event_returns_one_json_result(client):
+    response = client.post("/api/predict", json={"id": 7})
+    assert response.status_code == 200
+    assert response.get_json()["id"] == 7
+
+
+def test_array_streams_one_result_per_event_then_timing(client):
+    response = client.post("/api/predict", json=[{"id": i} for i in range(3)])
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    lines = ndjson_lines(response)
+    assert [line["id"] for line in lines[:-1]] == [0, 1, 2]
+    assert lines[-1]["timing"]["count"] == 3
+
+
+def test_ndjson_body_is_scored_in_order(client):
+    body = "\n".join(json.dumps({"id": i}) for i in range(4)) + "\n\n"
+    response = client.post("/api/predict", data=body, content_type="application/x-ndjson")
+    assert response.status_code == 200
+    lines = ndjson_lines(response)
+    assert [line["id"] for line in lines[:-1]] == [0, 1, 2, 3]
+
+
+def test_invalid_ndjson_is_a_400(client):
+    response = client.post("/api/predict", data='{"id": 1}\n{not json\n', content_type="application/x-ndjson")
+    assert response.status_code == 400
+    assert "Invalid JSON" in response.get_json()["Error"]
+
+
+def test_invalid_json_array_is_a_400(client):
+    response = client.post("/api/predict", data='[{"id": 1}, {not json', content_type="application/json")
+    assert response.status_code == 400
+    assert "Invalid JSON" in response.get_json()["Error"]
+
+
+def test_empty_input_is_a_400_in_both_formats(client):
+    assert client.post("/api/predict", json=[]).status_code == 400
+    assert client.post("/api/predict", data="", content_type="application/json").status_code == 400
+    assert client.post("/api/predict", data="\n\n", content_type="application/x-ndjson").status_code == 400
+
+
+def test_oversized_bodies_are_413_before_parsing(client, monkeypatch):
+    monkeypatch.setitem(nids_app.app.config, "MAX_CONTENT_LENGTH", 64)
+    body = json.dumps([{"id": i} for i in range(20)])
+    for content_type in ("application/json", "application/x-ndjson"):
+        response = client.post("/api/predict", data=body, content_type=content_type)
+        assert response.status_code == 413
+        assert "larger than 64 bytes" in response.get_json()["Error"]
+
+
+def test_non_object_event_is_a_400(client):
+    response = client.post("/api/predict", json=[{"id": 1}, 5])
+    assert response.status_code == 400
+
+
+def test_oversized_batches_are_413(client, monkeypatch):
+    monkeypatch.setattr(nids_app, "PREDICT_MAX_BATCH", 2)
+    assert client.post("/api/predict", json=[{"id": i} for i in range(3)]).status_code == 413
+    body = "\n".join(json.dumps({"id": i}) for i in range(3))
+    assert client.post("/api/predict", data=body, content_type="application/x-ndjson").status_code == 413
+
+
+def test_scoring_failure_on_single_event_is_not_a_json_error(client, monkeypatch):
+    def broken(df):
+        return [{"Prediction": -1, "Confidence": 0.0, "Label": "Error", "Error": "feature mismatch"}] * len(df)
+
+    monkeypatch.setattr(nids_app, "predict_batch", broken)
+    response = client.post("/api/predict", json={"id": 1})
+    assert response.status_code == 500
+    assert "Invalid JSON" not in response.get_data(as_text=True)
+
+
+def test_events_are_scored_by_ml_predictor(monkeypatch):
+    # A nested Suricata field is dropped and the labels are ml_predictor's
+    bundle = SimpleNamespace(
+        threshold=0.5,
+        preprocessor=SimpleNamespace(transform=lambda df: df[["sbytes"]]),
+        backend=SimpleNamespace(predict_proba=lambda X: np.where(X["sbytes"].to_numpy() > 100, 0.9, 0.1)),
+    )
+    monkeypatch.setattr(ml_predictor, "get_registry", lambda: SimpleNamespace(get=lambda: bundle))
+    client = nids_app.app.test_client()
+
+    response = client.post("/api/predict", json={"sbytes": 500, "flow": {"state": "new"}})
+    assert response.status_code == 200
+    assert response.get_json()["Label"] == "ATTACK"
+    response = client.post("/api/predict", json=[{"sbytes": 500, "flow": {}}, {"sbytes": 5, "flow": {}}])
+    assert [line.get("Label") for line in ndjson_lines(response)[:-1]] == ["ATTACK", "NORMAL"]
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from model_registry import (ModelRegistry, preprocessor_path_for, publish_model_version, save_model,
+                            save_model_version)
+from preprocessor import FrozenPreprocessor, load_preprocessor
+from utils import preprocess_data
+
+
+def training_frame(rows=200, seed=0):
+    rng = np.random.default_rng(seed)
+    proto = pd.Categorical(rng.choice(["tcp", "udp"], rows), categories=["icmp", "tcp", "udp"])
+    return pd.DataFrame({
+        "proto": proto,
+        "sbytes": rng.integers(0, 5000, rows),
+        "dur": rng.random(rows),
+        "src_ip": rng.choice(["10.0.0.1", "10.0.0.2", "192.168.1.9"], rows),
+        "label": rng.integers(0, 2, rows),
+    })
+
+
+def test_round_trip_matches_training_scaling(tmp_path):
+    path = str(tmp_path / "pre.joblib")
+    df = training_frame()
+    X, _, columns = preprocess_data(df.copy(), preprocessor_path=path)
+
+    frozen = load_preprocessor(path)
+    assert frozen.features == columns
+    np.testing.assert_allclose(frozen.transform(df.drop(columns=["label"])), X.to_numpy(), rtol=1e-5, atol=1e-5)
+
+    copy = FrozenPreprocessor.from_dict(frozen.to_dict())
+    np.testing.assert_array_equal(copy.transform(df), frozen.transform(df))
+
+
+def test_records_full_category_set_and_zeroes_unseen_values(tmp_path):
+    path = str(tmp_path / "pre.joblib")
+    preprocess_data(training_frame(), preprocessor_path=path)
+    frozen = load_preprocessor(path)
+    assert frozen.categories["proto"] == ["icmp", "tcp", "udp"]
+    assert "proto_icmp" in frozen.features
+
+    raw = frozen.transform(pd.DataFrame({"proto": ["icmp", "sctp"], "sbytes": [1, 1], "dur": [0.0, 0.0]}))
+    raw = raw * frozen.scale + frozen.mean  # undo the scaling
+    proto_cols = [j for j, f in enumerate(frozen.features) if f.startswith("proto_")]
+    assert raw[0, proto_cols].sum() == pytest.approx(1.0)
+    assert raw[1, proto_cols] == pytest.approx(np.zeros(len(proto_cols)))
+
+
+def test_saved_model_is_loaded_with_its_preprocessor(tmp_path):
+    from sklearn.linear_model import LogisticRegression
+
+    pre_path = str(tmp_path / "pre.joblib")
+    X, y, _ = preprocess_data(training_frame(), preprocessor_path=pre_path)
+    model = LogisticRegression().fit(X, y)
+    model_path = str(tmp_path / "model.joblib")
+    features_path = tmp_path / "features.txt"
+    features_path.write_text("\n".join(X.columns))
+
+    with pytest.raises(ValueError):
+        save_model(model, model_path, None)
+    save_model(model, model_path, pre_path)
+    bundle = ModelRegistry(model_path=model_path, threshold_path=str(tmp_path / "none"),
+                           features_path=str(features_path), preprocessor_path=None, backend="sklearn").get()
+    assert bundle.preprocessor is not None
+    assert bundle.features == list(X.columns)
+
+
+def test_versions_without_preprocessor_are_not_published(tmp_path):
+    from sklearn.linear_model import LogisticRegression
+
+    versions = str(tmp_path / "versions")
+    model = LogisticRegression().fit([[0.0], [1.0]], [0, 1])
+    path = save_model_version(model, versions_dir=versions)
+    with pytest.raises(ValueError):
+        publish_model_version(path, str(tmp_path / "deployed.joblib"), versions)
+
+    frozen = FrozenPreprocessor(["x"], [(0, "x", None)], [0.0], [1.0])
+    path = save_model_version(model, versions_dir=versions, preprocessor=frozen)
+    deployed = str(tmp_path / "deployed.joblib")
+    publish_model_version(path, deployed, versions)
+    assert load_preprocessor(preprocessor_path_for(deployed)).features == ["x"]
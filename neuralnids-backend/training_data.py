@@ -0,0 +1,229 @@
+"""
+Out-of-core training data: typed chunked CSV loading and a cached,
+memory-mapped feature matrix.
+
+read_csv_typed() streams a CSV in chunks of CSV_CHUNK_ROWS rows and
+downcasts each chunk as it arrives: integers to the smallest type that
+holds them, floats to float32, and text columns with few distinct values
+(proto, service, state, ...) to categoricals. Only one raw chunk is ever in
+memory next to the already-compact parts.
+
+load_training_matrix() runs load_data -> engineer_features ->
+preprocess_data once per distinct input and saves the resulting feature
+matrix as .npy files (plus the frozen preprocessor) under
+CACHE_DIR/<key>. The key hashes the input file contents, the feature
+selection and the preprocessing code itself, so any change to those
+rebuilds it. Later runs memory-map the cached matrix instead of parsing
+and preprocessing again.
+
+Run from neuralnids-backend/:
+    python training_data.py UNSW_NB15_training-set.csv inhouse_flows.csv --features models/top25_features.txt
+"""
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+CSV_CHUNK_ROWS = 100000
+# Rows read up front to choose the parser dtypes (see sniff_dtypes)
+SNIFF_ROWS = 10000
+CACHE_DIR = os.getenv("TRAINING_CACHE_DIR", "cache/training")
+# Text columns with at most this many distinct values become categoricals
+CATEGORY_MAX_UNIQUE = 1000
+# Columns always read as categoricals (UNSW-NB15 and the in-house datasets)
+CATEGORICAL_COLUMNS = ("proto", "service", "state", "attack_cat", "protocol_type", "encryption_used",
+                       "browser_type")
+# Bump when the cache layout changes
+CACHE_FORMAT = 1
+HASH_BLOCK = 8 << 20
+
+
+def _downcast_column(series, name):
+    if pd.api.types.is_bool_dtype(series) or isinstance(series.dtype, pd.CategoricalDtype):
+        return series
+    if pd.api.types.is_integer_dtype(series):
+        return pd.to_numeric(series, downcast="integer")
+    if pd.api.types.is_float_dtype(series):
+        return series.astype(np.float32)
+    if name in CATEGORICAL_COLUMNS or series.nunique(dropna=True) <= CATEGORY_MAX_UNIQUE:
+        return series.astype("category")
+    return series
+
+
+def downcast_frame(df):
+    """Smallest integer types, float32 and categoricals, column by column."""
+    return pd.DataFrame({col: _downcast_column(df[col], col) for col in df.columns}, index=df.index)
+
+
+def concat_typed(parts):
+    """
+    Concatenate downcast frames in one copy. Categoricals get the union of
+    their categories first, so they stay categoricals instead of falling
+    back to object; integer columns widen to the largest part's type.
+    """
+    if not parts:
+        return pd.DataFrame()
+    if len(parts) == 1:
+        return parts[0].reset_index(drop=True)
+    columns = dict.fromkeys(col for part in parts for col in part.columns)
+    mixed = []
+    for col in columns:
+        pieces = [part[col] for part in parts if col in part.columns]
+        if not any(isinstance(piece.dtype, pd.CategoricalDtype) for piece in pieces):
+            continue
+        if len(pieces) == len(parts) and all(isinstance(piece.dtype, pd.CategoricalDtype) for piece in pieces):
+            categories = list(dict.fromkeys(value for piece in pieces for value in piece.cat.categories))
+            for part in parts:
+                part[col] = part[col].cat.set_categories(categories)
+        else:
+            # A part saw too many values to categorize: merge as text and decide again
+            mixed.append(col)
+            for part in parts:
+                if col in part.columns:
+                    part[col] = part[col].astype(object)
+    result = pd.concat(parts, ignore_index=True)
+    for col in mixed:
+        result[col] = _downcast_column(result[col], col)
+    return result
+
+
+def sniff_dtypes(path, rows=SNIFF_ROWS):
+    """
+    Parser dtypes from the first rows: float32 for float columns and
+    category for text columns that will be categoricals, so the full read
+    never materializes float64 or per-row strings for them.
+    """
+    sample = pd.read_csv(path, nrows=rows, low_memory=False)
+    dtypes = {}
+    for col in sample.columns:
+        kind = _downcast_column(sample[col], col).dtype
+        if kind == np.float32 or isinstance(kind, pd.CategoricalDtype):
+            dtypes[col] = "float32" if kind == np.float32 else "category"
+    return dtypes
+
+
+def read_csv_typed(path, chunksize=CSV_CHUNK_ROWS):
+    """A CSV as a compact DataFrame, read and downcast chunk by chunk."""
+    try:
+        dtypes = sniff_dtypes(path)
+        parts = [downcast_frame(chunk) for chunk in pd.read_csv(path, chunksize=chunksize, dtype=dtypes,
+                                                                 low_memory=False)]
+    except ValueError:
+        # A column changed kind after the sniffed rows: read without parser dtypes
+        parts = [downcast_frame(chunk) for chunk in pd.read_csv(path, chunksize=chunksize, low_memory=False)]
+    return concat_typed(parts)
+
+
+def file_digest(path):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_key(paths, label=None, selected_features=None, flows=False):
+    # Input contents, options and the preprocessing code, in one digest
+    import utils
+    digest = hashlib.blake2b(digest_size=16)
+    parts = {
+        "format": CACHE_FORMAT,
+        "inputs": [file_digest(path) for path in paths],
+        "label": label,
+        "features": list(selected_features) if selected_features is not None else None,
+        "flows": flows,
+        "code": [inspect.getsource(fn) for fn in (utils.load_data, utils.engineer_features,
+                                                  utils.preprocess_data, downcast_frame, _downcast_column)],
+    }
+    digest.update(json.dumps(parts, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def _open_entry(entry):
+    # Memory-mapped matrix; pandas wraps it without copying
+    with open(os.path.join(entry, "meta.json")) as f:
+        meta = json.load(f)
+    X = np.load(os.path.join(entry, "X.npy"), mmap_mode="r")
+    X = pd.DataFrame(X, columns=meta["features"], copy=False)
+    y = None
+    if meta["has_target"]:
+        y = pd.Series(np.load(os.path.join(entry, "y.npy"), mmap_mode="r"), name=meta["target"], copy=False)
+    return X, y, meta["features"]
+
+
+def _build_entry(entry, paths, label, selected_features, flows):
+    from utils import engineer_features, load_data, preprocess_data
+
+    tmp = entry + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    df = concat_typed([load_data(path, label, flows=flows) for path in paths])
+    df = engineer_features(df)
+    X, y, features = preprocess_data(df, selected_features=selected_features,
+                                     preprocessor_path=os.path.join(tmp, "preprocessor.joblib"))
+    del df
+    np.save(os.path.join(tmp, "X.npy"), np.ascontiguousarray(X.to_numpy()))
+    if y is not None:
+        np.save(os.path.join(tmp, "y.npy"), np.asarray(y))
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump({"features": features, "inputs": [os.path.abspath(p) for p in paths], "rows": len(X),
+                   "has_target": y is not None, "target": getattr(y, "name", None),
+                   "created": time.strftime("%Y-%m-%dT%H:%M:%S")}, f, indent=2)
+    shutil.rmtree(entry, ignore_errors=True)
+    os.replace(tmp, entry)
+
+
+def load_training_matrix(paths, label=None, selected_features_file=None, selected_features=None,
+                         preprocessor_path=None, cache_dir=CACHE_DIR, flows=False, rebuild=False):
+    """
+    (X, y, feature names) for one or more training files, from the cache
+    when the same inputs were preprocessed before. X and y are backed by
+    read-only memory maps on a cache hit. With preprocessor_path the frozen
+    preprocessor fitted on this data is copied there as well.
+    """
+    if isinstance(paths, str):
+        paths = [paths]
+    if selected_features is None and selected_features_file:
+        with open(selected_features_file) as f:
+            selected_features = [line.strip() for line in f if line.strip()]
+
+    key = cache_key(paths, label, selected_features, flows)
+    entry = os.path.join(cache_dir, key)
+    if rebuild or not os.path.exists(os.path.join(entry, "meta.json")):
+        print(f"[+] Preprocessing {len(paths)} file(s) into cache entry {key}")
+        started = time.perf_counter()
+        _build_entry(entry, paths, label, selected_features, flows)
+        print(f"[+] Cached feature matrix in {time.perf_counter() - started:.1f}s")
+    else:
+        print(f"[+] Using cached feature matrix {key}")
+
+    if preprocessor_path:
+        shutil.copyfile(os.path.join(entry, "preprocessor.joblib"), preprocessor_path)
+    return _open_entry(entry)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="+", help="training CSVs (or captures with --flows and --label)")
+    parser.add_argument("--features", default=None, help="selected features file")
+    parser.add_argument("--label", default=None)
+    parser.add_argument("--flows", action="store_true", help="assemble captures into flow rows")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--rebuild", action="store_true")
+    args = parser.parse_args()
+
+    label = int(args.label) if args.label is not None and args.label.isdigit() else args.label
+    X, y, features = load_training_matrix(args.inputs, label, args.features, cache_dir=args.cache_dir,
+                                          flows=args.flows, rebuild=args.rebuild)
+    print(f"[+] {X.shape[0]:,} rows x {X.shape[1]} features ({X.to_numpy().dtype}, "
+          f"{X.to_numpy().nbytes / 1e6:,.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
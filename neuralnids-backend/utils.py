@@ -1,6 +1,6 @@
+import logging
 import os
 import struct
-import dpkt
 import socket
 import pandas as pd
 import matplotlib.pyplot as plt
@@ -15,49 +15,47 @@ from xgboost import plot_importance
 from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
 from sklearn.preprocessing import StandardScaler, LabelEncoder
 from joblib import dump, load
-from imblearn.over_sampling import SMOTE
 
-def parse_pcap(file_path, label):
-    # Parse a PCAP file and extract basic features for each packet.
-
-    records = []
-    with open(file_path, 'rb') as f:
-        pcap = dpkt.pcap.Reader(f)
-        for ts, buf in pcap:
-            try:
-                eth = dpkt.ethernet.Ethernet(buf)
-                # Process only IP packets
-                if not isinstance(eth.data, dpkt.ip.IP):
-                    continue
-                ip = eth.data
-
-                # Extract source and destination IPs
-                src_ip = socket.inet_ntoa(ip.src)
-                dst_ip = socket.inet_ntoa(ip.dst)
-
-                # Basic features: timestamp, protocol, packet length
-                protocol = ip.p
-                pkt_len = ip.len
-
-                # More features (TCP flags, ports, etc.)
-                records.append({
-                    'timestamp': ts,
-                    'src_ip': src_ip,
-                    'dst_ip': dst_ip,
-                    'protocol': protocol,
-                    'pkt_len': pkt_len,
-                    'label': label
-                })
-            except Exception as e:
-                # Skip malformed packets
-                continue
-    return pd.DataFrame(records)
+from flow_assembler import assemble_flows
+from pcap_reader import PcapStats, iter_pcap
+from rebalance import REBALANCE_MEMORY_MB, REBALANCE_MODE, rebalance
+from training_data import concat_typed, read_csv_typed
+
+# engineer_features / preprocess_data also run per scoring batch, so their
+# progress messages are debug logs rather than prints
+log = logging.getLogger(__name__)
+
+# Rows per float64 slice when fitting and applying the scaler
+SCALER_CHUNK_ROWS = 100_000
 
 
-def load_data(file_path, label=None):
+def parse_pcap(file_path, label):
+    # Parse a PCAP/pcapng file into one row per IPv4 packet: timestamp, src_ip,
+    # dst_ip (dotted-quad strings, as categoricals), protocol, pkt_len, ports,
+    # TCP flags, TTL and label. pcap_reader streams the capture in fixed-size
+    # chunks with integer addresses; each chunk's addresses are formatted
+    # before the chunks are joined, so no full-size integer copy is kept.
+    stats = PcapStats()
+    parts = []
+    for chunk in iter_pcap(file_path, label=label, stats=stats):
+        for col in ('src_ip', 'dst_ip'):
+            chunk[col] = int_to_ip_array(chunk[col])
+        parts.append(chunk)
+    print(f"[+] {file_path}: {stats.parsed} packets parsed")
+    if stats.skipped or stats.malformed:
+        print(f"[!] Skipped {stats.skipped} non-IPv4 and {stats.malformed} malformed packets")
+    if not parts:
+        return pd.DataFrame(columns=['timestamp', 'src_ip', 'dst_ip', 'protocol', 'pkt_len', 'label'])
+    return concat_typed(parts)
+
+
+def load_data(file_path, label=None, flows=False):
+    # flows=True turns a capture into UNSW-style flow rows (flow_assembler)
+    # instead of one row per packet
     ext = os.path.splitext(file_path)[1].lower()
     if ext == '.csv':
-        df = pd.read_csv(file_path)
+        # Chunked, with downcast numeric columns and categorical text columns
+        df = read_csv_typed(file_path)
         # Only add the forced label if no target column exists.
         # Need to research if dynamic label detection is possible
         # for various attack types rather than hard coding column labels
@@ -66,7 +64,13 @@ def load_data(file_path, label=None):
     elif ext in ['.pcap', '.pcapng']:
         if label is None:
             raise ValueError("For PCAP files, please provide a label.")
-        df = parse_pcap(file_path, label)
+        if flows:
+            # Straight from the reader's chunks: flow assembly works on integer addresses
+            stats = PcapStats()
+            df = assemble_flows(iter_pcap(file_path, label=label, stats=stats))
+            print(f"[+] Assembled {len(df)} flows from {stats.parsed} packets")
+        else:
+            df = parse_pcap(file_path, label)
     else:
         raise ValueError("Unsupported file type: " + ext)
     return df
@@ -78,16 +82,83 @@ def encode_categorical_features(df, categorical_columns):
     return pd.get_dummies(df, columns=categorical_columns)
 
 
-def preprocess_data(df, selected_features_file=None, for_training=True):
-    import struct
-    import socket
-    from sklearn.preprocessing import LabelEncoder, StandardScaler
+def ip_to_int(ip_str):
+    try:
+        return struct.unpack("!I", socket.inet_aton(ip_str))[0]
+    except:
+        return 0
+
+
+def ip_to_int_array(values):
+    # Vectorized dotted-quad -> integer. Addresses repeat heavily, so the
+    # column is factorized, each distinct address is parsed once, and the
+    # results are gathered back to every row by code.
+    # Non-strings and malformed addresses become 0; integer columns (as from
+    # pcap_reader) are already converted.
+    dtype = getattr(values, "dtype", None)
+    if pd.api.types.is_integer_dtype(dtype):
+        return np.asarray(values, dtype=np.int64)
+    if isinstance(dtype, pd.CategoricalDtype):
+        # Already factorized (parse_pcap, read_csv_typed): only the categories are parsed
+        categorical = pd.Categorical(values)
+        codes, uniques = categorical.codes, categorical.categories
+    else:
+        codes, uniques = pd.factorize(pd.Series(values, dtype=object))
+    table = np.zeros(len(uniques) + 1, dtype=np.int64)  # last slot catches NaN (code -1)
+    table[:-1] = np.fromiter(
+        (ip_to_int(u) if isinstance(u, str) else 0 for u in uniques),
+        dtype=np.int64, count=len(uniques)
+    )
+    return table[codes]
+
+
+def int_to_ip_array(values):
+    # Integer addresses (pcap_reader's uint32 columns) -> dotted-quad strings
+    # as a categorical; each distinct address is formatted once
+    uniques, codes = np.unique(np.asarray(values, dtype=np.uint32), return_inverse=True)
+    names = [socket.inet_ntoa(struct.pack("!I", int(u))) for u in uniques]
+    return pd.Categorical.from_codes(codes, categories=names)
+
+
+# Connection states seen in UNSW-NB15 and Suricata flow records, with their
+# flags_combined value (sum of character codes) computed once up front
+STATE_FLAG_SUMS = {
+    state: sum(ord(c) for c in state)
+    for state in ('FIN', 'INT', 'CON', 'REQ', 'RST', 'ECO', 'CLO', 'ACC', 'PAR', 'URN',
+                  'URH', 'ECR', 'TST', 'MAS', 'TXD', 'no', 'new', 'established',
+                  'closed', 'bypassed', 'nan')
+}
+
+
+def state_to_flag_sum(values):
+    # Look up each distinct state once; unseen states are hashed the same way
+    codes, uniques = pd.factorize(pd.Series(values).astype(str))
+    table = np.fromiter(
+        (STATE_FLAG_SUMS[u] if u in STATE_FLAG_SUMS else sum(ord(c) for c in u) for u in uniques),
+        dtype=np.int64, count=len(uniques)
+    )
+    return table[codes]
+
 
-    def ip_to_int(ip_str):
-        try:
-            return struct.unpack("!I", socket.inet_aton(ip_str))[0]
-        except:
-            return 0
+def is_text(series):
+    # object, string or categorical columns (anything that needs encoding)
+    return not pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series)
+
+
+def fitted_categories(series):
+    # Every category get_dummies makes a column for: the declared categories of
+    # a categorical column (even ones absent from this frame), else the values seen
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return list(series.cat.categories)
+    return list(series.dropna().unique())
+
+
+def preprocess_data(df, selected_features_file=None, for_training=True, selected_features=None,
+                    preprocessor_path=None):
+    # preprocessor_path: when given, the fitted column order, one-hot categories,
+    # scaler statistics and feature selection are exported there as a
+    # FrozenPreprocessor so inference can replay them without refitting.
+    from sklearn.preprocessing import LabelEncoder, StandardScaler
 
     # Identify target column
     target_column = 'attack_detected' if 'attack_detected' in df.columns else 'label'
@@ -98,33 +169,45 @@ def preprocess_data(df, selected_features_file=None, for_training=True):
         if col in df.columns:
             df = df.drop(columns=[col])
 
-    # Convert IP columns to ints
+    # Convert IP columns to ints (engineer_features may already have done it)
     ip_cols = ['src_ip', 'dst_ip']
     for col in ip_cols:
-        if col in df.columns:
-            df[col] = df[col].apply(ip_to_int)
+        if col in df.columns and is_text(df[col]):
+            df[col] = ip_to_int_array(df[col])
+
+    # Remember which dummy column came from which (column, category), and the
+    # full category set of each encoded column. Dummies are uint8: pandas >= 2
+    # makes them bool, which the numeric-only filter below would drop.
+    one_hot = {}
+    categories = {}
 
     # Force one-hot encoding for important categorical features
     force_encode = ['proto']
     for col in df.columns:
         if col in force_encode and col in df.columns:
-            print(f"[+] One-hot encoding important feature: {col}")
-            df = pd.get_dummies(df, columns=[col])
+            log.debug("One-hot encoding important feature: %s", col)
+            categories[col] = fitted_categories(df[col])
+            for value in categories[col]:
+                one_hot[f"{col}_{value}"] = (col, value)
+            df = pd.get_dummies(df, columns=[col], dtype=np.uint8)
 
     # Encode all other safe categorical features
     for col in df.columns:
-        if df[col].dtype == object and col not in force_encode:
+        if is_text(df[col]) and col not in force_encode:
             if for_training and col == target_column:
                 continue
             if df[col].nunique() > 20:
-                print(f"[!] Dropping high-cardinality column: {col}")
+                log.warning("Dropping high-cardinality column: %s", col)
                 df = df.drop(columns=[col])
             else:
-                print(f"[+] One-hot encoding safe column: {col}")
-                df = pd.get_dummies(df, columns=[col])
+                log.debug("One-hot encoding safe column: %s", col)
+                categories[col] = fitted_categories(df[col])
+                for value in categories[col]:
+                    one_hot[f"{col}_{value}"] = (col, value)
+                df = pd.get_dummies(df, columns=[col], dtype=np.uint8)
 
     # Encode label (only during training)
-    if for_training and target_column in df.columns and df[target_column].dtype == object:
+    if for_training and target_column in df.columns and is_text(df[target_column]):
         encoder = LabelEncoder()
         df[target_column] = encoder.fit_transform(df[target_column])
 
@@ -136,40 +219,67 @@ def preprocess_data(df, selected_features_file=None, for_training=True):
         X = df
         y = None
 
-    # Ensure numeric only
-    X = X.select_dtypes(include=['int64', 'float64'])
+    # Ensure numeric only (any width, so downcast columns from read_csv_typed stay)
+    X = X.select_dtypes(include=[np.number])
 
-    # Scale
+    # Statistics are fitted in float64 (a float32 fit shifts mean/scale on
+    # large or wide-ranged columns), one slice at a time so no full float64
+    # copy is made; the output is float32, half the memory, and XGBoost
+    # trains on float32 internally anyway
     scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X)
-    X_scaled_df = pd.DataFrame(X_scaled, columns=X.columns)
-
-    # Optional: Select only top features
-    if selected_features_file:
-        with open(selected_features_file, 'r') as f:
-            top_features = [line.strip() for line in f.readlines()]
+    for start in range(0, len(X), SCALER_CHUNK_ROWS):
+        scaler.partial_fit(X.iloc[start:start + SCALER_CHUNK_ROWS].to_numpy(np.float64))
+    X_scaled = np.empty(X.shape, dtype=np.float32)
+    for start in range(0, len(X), SCALER_CHUNK_ROWS):
+        X_scaled[start:start + SCALER_CHUNK_ROWS] = scaler.transform(
+            X.iloc[start:start + SCALER_CHUNK_ROWS].to_numpy(np.float64))
+    X_scaled_df = pd.DataFrame(X_scaled, columns=X.columns, copy=False)
+
+    # Optional: Select only top features (an already-loaded list skips the file read)
+    if selected_features is not None or selected_features_file:
+        if selected_features is not None:
+            top_features = list(selected_features)
+        else:
+            with open(selected_features_file, 'r') as f:
+                top_features = [line.strip() for line in f.readlines()]
         missing = [feat for feat in top_features if feat not in X_scaled_df.columns]
         if missing:
-            print(f"[!] Warning: Missing features from selection: {missing}")
+            log.warning("Missing features from selection: %s", missing)
         X_scaled_df = X_scaled_df[[f for f in top_features if f in X_scaled_df.columns]]
-        print(f"[+] Using top {len(X_scaled_df.columns)} features.")
+        log.debug("Using top %d features.", len(X_scaled_df.columns))
 
-    print(f"[+] Preprocessing complete. Features shape: {X_scaled_df.shape}")
+    if preprocessor_path:
+        from preprocessor import FrozenPreprocessor
+        frozen = FrozenPreprocessor.from_fitted(
+            scaler, list(X.columns), list(X_scaled_df.columns),
+            one_hot=one_hot, ip_columns=[c for c in ip_cols if c in X.columns], categories=categories
+        )
+        frozen.save(preprocessor_path)
+        print(f"[+] Exported frozen preprocessor to {preprocessor_path}")
+
+    log.debug("Preprocessing complete. Features shape: %s", X_scaled_df.shape)
     return X_scaled_df, y, list(X_scaled_df.columns)
 
 
 
 
-def train_model(X, y, X_val=None, y_val=None):
+def train_model(X, y, X_val=None, y_val=None, rebalance_mode=REBALANCE_MODE, memory_mb=REBALANCE_MEMORY_MB,
+                model_path=None, preprocessor=None):
+    # model_path: also save the model there, with the FrozenPreprocessor X went
+    # through (an instance or the preprocessor_path given to preprocess_data)
+    # next to it; refused without one, see model_registry.save_model
+    if model_path and preprocessor is None:
+        raise ValueError("train_model(model_path=...) needs the preprocessor exported by preprocess_data")
 
-    # Apply SMOTE to the training data
-    print("Applying SMOTE to rebalance classes...")
-    smote = SMOTE(random_state=42)
-    X, y = smote.fit_resample(X, y)
+    # Rebalance classes within the memory budget (see rebalance.py for the modes)
+    print(f"Rebalancing classes ({rebalance_mode}, {memory_mb:,.0f} MB budget)...")
+    X, y, scale_pos_weight = rebalance(X, y, rebalance_mode, memory_mb)
 
-    print("Label distribution after SMOTE:")
+    print("Label distribution after rebalancing:")
     print(pd.Series(y).value_counts())
 
+    validate = X_val is not None and y_val is not None
+
     # Train the model using resampled data
     model = XGBClassifier(
         n_estimators=200,
@@ -178,25 +288,32 @@ def train_model(X, y, X_val=None, y_val=None):
         subsample=0.8,
         colsample_bytree=0.8,
         #booster='gbtree',
-        use_label_encoder=False,
+        tree_method='hist',
+        n_jobs=-1,
         eval_metric='logloss',
+        scale_pos_weight=scale_pos_weight,
+        # xgboost >= 2 takes this here rather than in fit()
+        early_stopping_rounds=10 if validate else None,
         random_state=42
     )
 
     # model = RandomForestClassifier(n_estimators=100, random_state=42)
     # model.fit(X_train_res, y_train_res)
 
-    if X_val is not None and y_val is not None:
+    if validate:
         model.fit(
             X, y,
             eval_set=[(X_val, y_val)],
-            early_stopping_rounds=10,
             verbose=True
         )
     else:
         model.fit(X, y)
 
-        return model
+    if model_path:
+        from model_registry import save_model
+        save_model(model, model_path, preprocessor)
+
+    return model
 
 def evaluate_model(model, X_test, y_test):
     y_pred = model.predict(X_test)
@@ -262,18 +379,26 @@ def check_feature_alignment(X_test, test_features, train_features):
     return X_test, test_features
 
 
+def widen(series):
+    # int64/float64 copy of a count column, so arithmetic on the narrow
+    # dtypes read_csv_typed downcasts to (uint8 spkts + dpkts) cannot overflow
+    if pd.api.types.is_integer_dtype(series.dtype) or pd.api.types.is_bool_dtype(series.dtype):
+        return series.astype(np.int64)
+    return pd.to_numeric(series, errors='coerce').astype(np.float64)
+
+
 def engineer_features(df):
-    print("[+] Engineering new features...")
+    log.debug("Engineering new features...")
 
     # Convert IP addresses if present
     ip_cols = ['src_ip', 'dst_ip']
     for col in ip_cols:
         if col in df.columns:
-            df[col] = df[col].apply(lambda x: struct.unpack("!I", socket.inet_aton(x))[0] if isinstance(x, str) else 0)
+            df[col] = ip_to_int_array(df[col])
 
     # Add protocol_category if 'proto' exists
     if 'proto' in df.columns:
-        df['protocol_category'] = df['proto'].map({
+        df['protocol_category'] = df['proto'].astype(object).map({
             'tcp': 1,
             'udp': 2,
             'icmp': 3
@@ -281,23 +406,19 @@ def engineer_features(df):
 
     # Add byte_ratio if 'sbytes' and 'dbytes' exist
     if 'sbytes' in df.columns and 'dbytes' in df.columns:
-        df['byte_ratio'] = df.apply(
-            lambda row: row['sbytes'] / (row['dbytes'] + 1e-5), axis=1
-        )
+        df['byte_ratio'] = widen(df['sbytes']) / (widen(df['dbytes']) + 1e-5)
 
     # Add packet_ratio if 'spkts' and 'dpkts' exist
     if 'spkts' in df.columns and 'dpkts' in df.columns:
-        df['packet_ratio'] = df.apply(
-            lambda row: row['spkts'] / (row['dpkts'] + 1e-5), axis=1
-        )
+        df['packet_ratio'] = widen(df['spkts']) / (widen(df['dpkts']) + 1e-5)
 
     # Add total_pkts
     if 'spkts' in df.columns and 'dpkts' in df.columns:
-        df['total_pkts'] = df['spkts'] + df['dpkts']
+        df['total_pkts'] = widen(df['spkts']) + widen(df['dpkts'])
 
     # Add flags_combined if 'state' exists
     if 'state' in df.columns:
-        df['flags_combined'] = df['state'].astype(str).apply(lambda x: sum([ord(c) for c in x]))
+        df['flags_combined'] = state_to_flag_sum(df['state'])
 
     return df
 